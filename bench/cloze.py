@@ -0,0 +1,71 @@
+# Benchmark ocloze's Throughput
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Pipe a synthetic corpus through ocloze and report its throughput.  The
+# corpus consists of passages of several lengths with a cloze deletion every
+# few words (some of them nested and some of them containing escaped braces)
+# and lines without clozes.  Additional ocloze arguments can follow "--".
+
+import argparse, os, random, subprocess, sys, tempfile, time
+
+def Corpus(lines, words, density, seed):
+  rng = random.Random(seed)
+  vocabulary = ["word" + str(word) for word in range(5000)] + ["日本語", "\\{literal\\}", "back\\\\slash"]
+  corpus = []
+  for line in range(lines):
+    if line % 10 == 9:
+      corpus.append(" ".join(rng.choice(vocabulary) for word in range(words)) + "\n")
+      continue
+    tokens = []
+    depth = 0
+    for word in range(words):
+      if rng.random() < density:
+        tokens.append("{")
+        depth += 1
+      tokens.append(rng.choice(vocabulary))
+      while depth and rng.random() < 0.6:
+        tokens.append("}")
+        depth -= 1
+      tokens.append(" ")
+    tokens.append("}" * depth)
+    corpus.append("".join(tokens) + "\n")
+  return "".join(corpus).encode("UTF-8")
+
+def Main(output, lines, words, density, seed, repeat, ocloze_args):
+  corpus = Corpus(lines, words, density, seed)
+  with tempfile.TemporaryDirectory() as tmpdir:
+    corpusfile = os.path.join(tmpdir, "corpus")
+    with open(corpusfile, 'wb') as corpusf:
+      corpusf.write(corpus)
+    best = None
+    for attempt in range(repeat):
+      with open(corpusfile, 'rb') as corpusf:
+        begin = time.perf_counter()
+        result = subprocess.run([sys.executable, "ocloze.py"] + ocloze_args, stdin=corpusf, stdout=subprocess.PIPE)
+        elapsed = time.perf_counter() - begin
+      if result.returncode != 0:
+        sys.stderr.write("ocloze failed\n")
+        return 1
+      best = (elapsed if best is None else min(best, elapsed))
+  cards = result.stdout.count(b"\n")
+  output.write("%d lines (%.1f MB), %d cards (%.1f MB): %.3fs (%.0f lines/s, %.0f cards/s, %.1f MB/s in)\n" % (lines, len(corpus) / 1e6, cards, len(result.stdout) / 1e6, best, lines / best, cards / best, len(corpus) / 1e6 / best))
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark ocloze's throughput on a synthetic corpus.")
+  parser.add_argument("-n", "--lines", type=int, default=20000, help="the number of lines in the corpus (default: 20000)")
+  parser.add_argument("-w", "--words", type=int, default=60, help="the number of words per line (default: 60)")
+  parser.add_argument("-d", "--density", type=float, default=0.15, help="the probability that a cloze deletion starts before a word (default: 0.15)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  parser.add_argument("-k", "--repeat", type=int, default=3, help="the number of runs, of which the fastest is reported (default: 3)")
+  parser.add_argument("ocloze_args", nargs="*", help="arguments for ocloze (after \"--\")")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.lines, args.words, args.density, args.seed, args.repeat, args.ocloze_args))
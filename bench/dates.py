@@ -0,0 +1,54 @@
+# Benchmark Log Timestamp Decoding
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Compare datetime.strptime() with oboetalib.TDateFormat.Parse() on the
+# timestamps of a synthetic log spanning a few years of daily reviews.
+
+import argparse, datetime, random, sys, time
+import oboetalib
+
+def Main(output, num, days, date_format, seed):
+  rng = random.Random(seed)
+  start = datetime.datetime(2012, 11, 4)
+  stamps = sorted(start + datetime.timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)) for _ in range(num))
+  stamps = [stamp.strftime(date_format) for stamp in stamps]
+
+  # strptime() doesn't understand "%s".
+  if date_format == "%s":
+    strptime = lambda stamp, date_format: datetime.datetime.fromtimestamp(int(stamp))
+  else:
+    strptime = datetime.datetime.strptime
+  begin = time.perf_counter()
+  expected = [strptime(stamp, date_format) for stamp in stamps]
+  strptime_time = time.perf_counter() - begin
+
+  begin = time.perf_counter()
+  parse = oboetalib.TDateFormat(date_format).Parse
+  actual = [parse(stamp) for stamp in stamps]
+  parse_time = time.perf_counter() - begin
+
+  if actual != expected:
+    sys.stderr.write("TDateFormat.Parse() disagrees with strptime()\n")
+    return 1
+  output.write("format: " + date_format + "\n")
+  output.write("records: " + str(num) + " (" + str(len(set(stamps))) + " distinct timestamps)\n")
+  output.write("strptime: %.3fs\n" % strptime_time)
+  output.write("TDateFormat.Parse: %.3fs (%.1fx)\n" % (parse_time, strptime_time / parse_time))
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark log timestamp decoding.")
+  parser.add_argument("-n", "--num-records", type=int, default=1000000, dest="num", help="the number of log records (default: 1000000)")
+  parser.add_argument("-d", "--days", type=int, default=3650, help="the number of days the log spans (default: 3650)")
+  parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the timestamp format (default: %%Y年%%m月%%d日)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.num, args.days, args.date_format, args.seed))
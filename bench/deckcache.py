@@ -0,0 +1,86 @@
+# Benchmark and Check the Parsed-Deck Cache
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Load a synthetic deck (see bench.synth) via oboetalib.LoadDeck() with and
+# without fields, report the times of cache misses and hits, and check the
+# cache's entries: Loads must return the deck's records, hits mustn't rewrite
+# entries, and loads without fields (like osm2 -l's and ocloze -x's) must use
+# an entry with fields if there is one and must never replace it.  Entries are
+# identified by their inode numbers because entries are rewritten by renaming
+# new files over them.
+
+import argparse, csv, os, shutil, sys, tempfile, time
+import oboetalib
+from bench import synth
+
+def Entries(directory):
+  return dict((name, os.stat(os.path.join(directory, name)).st_ino) for name in os.listdir(directory))
+
+def Main(output, cards, width, seed):
+  errors = []
+  def Check(condition, message):
+    if not condition:
+      errors.append(message)
+  times = {}
+  def Load(name, deckfile, with_fields):
+    begin = time.perf_counter()
+    deck = oboetalib.LoadDeck(deckfile, "\t", with_fields)
+    times[name] = time.perf_counter() - begin
+    return deck
+  with tempfile.TemporaryDirectory() as tmpdir:
+    deckfile = os.path.join(tmpdir, "deck")
+    synth.WriteDeck(deckfile, cards, width, seed)
+    with open(deckfile, 'r', newline="") as deckf:
+      expected = [tuple(fields) for fields in csv.reader(deckf, delimiter="\t") if fields]
+    directory = os.path.join(tmpdir, "cache")
+    os.environ["OBOETA_CACHE_DIR"] = directory
+
+    # An entry with fields, then loads without and with fields
+    deck = Load("miss", deckfile, True)
+    Check(deck is not None and list(deck[2]) == expected, "a miss didn't return the deck's records")
+    entries = Entries(directory)
+    Check(len(entries) == 1, "a miss saved %d entries instead of 1" % len(entries))
+    deck = Load("hit", deckfile, True)
+    Check(deck is not None and list(deck[2]) == expected, "a hit didn't return the deck's records")
+    Check(Entries(directory) == entries, "a hit rewrote the cache")
+    deck = Load("ID-only hit", deckfile, False)
+    Check(deck is not None and list(deck[0]) == [fields[0] for fields in expected] and deck[2] is None, "a load without fields didn't return the deck's IDs")
+    Check(Entries(directory) == entries, "a load without fields didn't use the entry with fields")
+    deck = Load("hit after ID-only hit", deckfile, True)
+    Check(deck is not None and list(deck[2]) == expected, "the entry with fields didn't survive a load without fields")
+    Check(Entries(directory) == entries, "a load without fields replaced the entry with fields")
+
+    # An entry without fields, then an entry with fields next to it
+    shutil.rmtree(directory)
+    Load("ID-only miss", deckfile, False)
+    ids_entries = Entries(directory)
+    Check(len(ids_entries) == 1, "a miss without fields saved %d entries instead of 1" % len(ids_entries))
+    Load("ID-only hit", deckfile, False)
+    Check(Entries(directory) == ids_entries, "a hit without fields rewrote the cache")
+    deck = Load("miss after ID-only miss", deckfile, True)
+    Check(deck is not None and list(deck[2]) == expected, "a load with fields used an entry without fields")
+    entries = Entries(directory)
+    Check(len(entries) == 2 and all(entries.get(name, None) == inode for name, inode in ids_entries.items()), "an entry with fields replaced the entry without fields")
+    Load("hit", deckfile, True)
+    Load("ID-only hit", deckfile, False)
+    Check(Entries(directory) == entries, "hits rewrote the cache")
+  for error in errors:
+    sys.stderr.write(error + "\n")
+  output.write("%d cards: %s, %d errors\n" % (cards, ", ".join("%s %.3fs" % (name, seconds) for name, seconds in times.items()), len(errors)))
+  return (1 if errors else 0)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark and check the parsed-deck cache.")
+  parser.add_argument("-c", "--cards", type=int, default=100000, help="the number of cards in the deck (default: 100000)")
+  parser.add_argument("-w", "--field-width", type=int, default=20, dest="width", help="the approximate number of characters in each card's front and back (default: 20)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.cards, args.width, args.seed))
@@ -0,0 +1,63 @@
+# Benchmark oboeta's Time to the First Card
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Pipe synthetic decks of several sizes into oboeta (as a scheduler would) and
+# report how long it takes oboeta to show the first card with and without a
+# shuffle window (-b).  The decks can be written slowly to simulate slow
+# schedulers.  Each session is quit after the first card, so nothing is
+# logged.
+
+import argparse, os, subprocess, sys, tempfile, threading, time
+
+def FirstCardTime(deck, window, delay):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    commandfile = os.path.join(tmpdir, "commands")
+    os.mkfifo(commandfile)
+    logfile = os.path.join(tmpdir, "log")
+    open(logfile, "w").close()
+    begin = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "oboeta.py", "-d", "-b", str(window), commandfile, logfile], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    # Write the deck in chunks of 1000 cards, waiting delay seconds per card.
+    def WriteDeck():
+      try:
+        for start in range(0, len(deck), 1000):
+          process.stdin.write(b"".join(deck[start:start + 1000]))
+          process.stdin.flush()
+          if delay:
+            time.sleep(delay * 1000)
+        process.stdin.close()
+      except BrokenPipeError:
+        pass
+    writer = threading.Thread(target=WriteDeck)
+    writer.start()
+    with open(commandfile, "w") as commandf:
+      process.stdout.readline()
+      elapsed = time.perf_counter() - begin
+      commandf.write("q\n")
+    process.wait()
+    writer.join()
+    return elapsed
+
+def Main(output, sizes, windows, delay):
+  output.write("cards\t" + "\t".join("-b " + str(window) for window in windows) + "\n")
+  for size in sizes:
+    deck = [(str(card) + "\tfront " + str(card) + "\tback " + str(card) + "\n").encode("UTF-8") for card in range(size)]
+    output.write(str(size) + "\t" + "\t".join("%.3fs" % FirstCardTime(deck, window, delay) for window in windows) + "\n")
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark oboeta's time to the first card.")
+  parser.add_argument("-c", "--cards", type=int, action="append", dest="sizes", help="a deck size (may be repeated, default: 1000, 10000, 100000, and 1000000)")
+  parser.add_argument("-b", "--shuffle-window", type=int, action="append", dest="windows", help="a shuffle window size (may be repeated, default: 0 and 64)")
+  parser.add_argument("-t", "--delay", type=float, default=0, help="the number of seconds that the simulated scheduler takes per card (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.sizes or (1000, 10000, 100000, 1000000), args.windows or (0, 64), args.delay))
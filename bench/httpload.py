@@ -0,0 +1,162 @@
+# Load-Test oboeta's Multi-Session HTTP Server
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Start "oboeta serve" with synthetic Leitner-system decks and simulate many
+# users reviewing at once.  Each simulated user starts a session (choosing the
+# decks in turn), reviews all of the session's cards (passing most of them),
+# and repeats.  Users review via the HTML pages (front, back, result) or via
+# the review app's JSON API (-a).  The report contains the numbers of
+# requests and reviewed cards per second, the latencies of the requests that
+# start sessions (which select cards) and of the other requests, and the
+# number of errors.  The logs are checked, too: Each line must be a
+# well-formed record for one of its deck's cards.
+
+import argparse, http.client, json, os, random, socket, subprocess, sys, tempfile, threading, time
+
+def Request(connection, method, path, cookie, body=None):
+  headers = {"Cookie": cookie} if cookie else {}
+  if body is not None:
+    headers["Content-Type"] = "application/json"
+    body = json.dumps(body)
+  connection.request(method, path, body, headers)
+  response = connection.getresponse()
+  data = response.read()
+  if response.status >= 400:
+    raise http.client.HTTPException(method + " " + path + ": " + str(response.status))
+  return response, data
+
+# Review one session's cards via the HTML pages and return the number of
+# reviewed cards.
+def ReviewPages(connection, cookie, rng, latencies):
+  cards = 0
+  path = "/"
+  while True:
+    begin = time.perf_counter()
+    response, data = Request(connection, "GET", path, cookie)
+    latencies.append(time.perf_counter() - begin)
+    if data == b"Done!":
+      return cards
+    if path in ("/", "/pass", "/fail"):
+      path = "/show"
+    else:
+      path = ("/pass" if rng.random() < 0.9 else "/fail")
+      cards += 1
+
+# Review one session's cards via the JSON API, sending the results of all of
+# the fetched cards at once, and return the number of reviewed cards.
+def ReviewAPI(connection, cookie, rng, latencies, batch):
+  cards = 0
+  while True:
+    begin = time.perf_counter()
+    response, data = Request(connection, "GET", "/api/cards?n=" + str(batch), cookie)
+    latencies.append(time.perf_counter() - begin)
+    reply = json.loads(data)
+    if reply["done"]:
+      return cards
+    results = [{"seq": card["seq"], "result": ("pass" if rng.random() < 0.9 else "fail")} for card in reply["cards"]]
+    if results:
+      begin = time.perf_counter()
+      Request(connection, "POST", "/api/results", cookie, {"results": results})
+      latencies.append(time.perf_counter() - begin)
+      cards += len(results)
+
+def User(port, user, decks, sessions, use_api, batch, seed, stats):
+  rng = random.Random(seed + user)
+  starts = []
+  latencies = []
+  cards = 0
+  errors = 0
+  connection = http.client.HTTPConnection("localhost", port)
+  for session in range(sessions):
+    try:
+      begin = time.perf_counter()
+      response, data = Request(connection, "GET", "/start?deck=deck" + str((user + session) % decks) + ".txt", None)
+      starts.append(time.perf_counter() - begin)
+      cookie = response.getheader("Set-Cookie").split(";")[0]
+      if use_api:
+        cards += ReviewAPI(connection, cookie, rng, latencies, batch)
+      else:
+        cards += ReviewPages(connection, cookie, rng, latencies)
+    except (OSError, http.client.HTTPException, ValueError, KeyError, AttributeError) as e:
+      sys.stderr.write("user " + str(user) + ": " + str(e) + "\n")
+      errors += 1
+      connection.close()
+      connection = http.client.HTTPConnection("localhost", port)
+  connection.close()
+  with stats["lock"]:
+    stats["starts"].extend(starts)
+    stats["latencies"].extend(latencies)
+    stats["cards"] += cards
+    stats["errors"] += errors
+
+def CheckLog(logfile, size):
+  errors = 0
+  with open(logfile, 'r', encoding="UTF-8", newline="") as logf:
+    for lineno, line in enumerate(logf, start=1):
+      fields = line.rstrip("\n").split("\t")
+      if not line.endswith("\n") or len(fields) != 3 or not fields[0].isdigit() or not 1 <= int(fields[0]) <= size or fields[2] not in ("+", "-"):
+        sys.stderr.write(logfile + ":" + str(lineno) + ": malformed record: " + repr(line) + "\n")
+        errors += 1
+  return errors
+
+def Main(output, users, sessions, decks, cards, new, use_api, batch, port, seed):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    files = []
+    for deck in range(decks):
+      deckfile = os.path.join(tmpdir, "deck" + str(deck) + ".txt")
+      logfile = os.path.join(tmpdir, "deck" + str(deck) + ".log")
+      with open(deckfile, 'w', encoding="UTF-8") as deckf:
+        deckf.writelines(str(card) + "\tfront " + str(card) + "\tback " + str(card) + "\n" for card in range(1, cards + 1))
+      open(logfile, 'w').close()
+      files += (deckfile, logfile)
+    server = subprocess.Popen([sys.executable, "oboeta.py", "serve", "-p", str(port), "-n", "0", "-e", str(new), "-D", "1", "-D", "2", "-D", "4"] + files, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+      while True:
+        if server.poll() is not None:
+          sys.stderr.write("the server failed to start\n")
+          return 1
+        try:
+          socket.create_connection(("localhost", port)).close()
+          break
+        except OSError:
+          time.sleep(0.05)
+      stats = {"lock": threading.Lock(), "starts": [], "latencies": [], "cards": 0, "errors": 0}
+      threads = [threading.Thread(target=User, args=(port, user, decks, sessions, use_api, batch, seed, stats)) for user in range(users)]
+      begin = time.perf_counter()
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      elapsed = time.perf_counter() - begin
+    finally:
+      server.terminate()
+      server.wait()
+    errors = stats["errors"] + sum(CheckLog(files[deck * 2 + 1], cards) for deck in range(decks))
+  def Latencies(latencies):
+    latencies = sorted(latencies)
+    return "p50 %.1fms p99 %.1fms max %.1fms" % tuple((latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0) for p in (0.5, 0.99, 1))
+  requests = len(stats["starts"]) + len(stats["latencies"])
+  output.write("%d users, %d sessions each, %s: %.3fs, %d requests (%.0f/s), %d cards (%.0f/s), session starts %s, other requests %s, %d errors\n" % (users, sessions, ("JSON API" if use_api else "HTML pages"), elapsed, requests, requests / elapsed, stats["cards"], stats["cards"] / elapsed, Latencies(stats["starts"]), Latencies(stats["latencies"]), errors))
+  return (1 if errors else 0)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Load-test oboeta's multi-session HTTP server (oboeta serve) with many simulated users.")
+  parser.add_argument("-c", "--users", type=int, default=100, help="the number of concurrent simulated users (default: 100)")
+  parser.add_argument("-n", "--sessions", type=int, default=2, help="the number of sessions that each user reviews (default: 2)")
+  parser.add_argument("-k", "--decks", type=int, default=4, help="the number of decks (default: 4)")
+  parser.add_argument("-m", "--cards", type=int, default=1000, help="the number of cards per deck (default: 1000)")
+  parser.add_argument("-e", "--num-new-lines", type=int, default=10, dest="new", help="the number of new cards per session (default: 10)")
+  parser.add_argument("-a", "--api", default=False, action="store_true", dest="use_api", help="review via the JSON API instead of the HTML pages")
+  parser.add_argument("-b", "--batch", type=int, default=8, help="with -a, the number of cards that users fetch at once (default: 8)")
+  parser.add_argument("-p", "--port", type=int, default=13370, help="the server's port (default: 13370)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.users, args.sessions, args.decks, args.cards, args.new, args.use_api, args.batch, args.port, args.seed))
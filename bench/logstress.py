@@ -0,0 +1,78 @@
+# Stress-Test Concurrent Log Writers
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Run many processes that append records to the same log via
+# oboetalib.TLogWriter (as concurrent review sessions do) and then check the
+# log: Every line must be a well-formed record, no record may be lost or
+# duplicated, and each writer's records must be in the order in which it
+# appended them.  Each record's ID names its writer and its sequence number.
+
+import argparse, multiprocessing, os, random, sys, tempfile, time
+import oboetalib
+
+def Write(logfile, writer, records, policy, group_size, seed):
+  rng = random.Random(seed)
+  with oboetalib.TLogWriter(logfile, policy, group_size, 1) as logf:
+    for record in range(records):
+      # Vary the records' lengths so that torn or interleaved lines would
+      # show up as malformed records.
+      logf.Append("w" + str(writer) + "-" + str(record) + "\t2026年01月01日\t" + "+-"[rng.randrange(2)] * rng.randrange(1, 64) + "\n")
+
+def Check(logfile, writers, records):
+  last = [-1] * writers
+  errors = 0
+  with open(logfile, 'r', encoding="UTF-8", newline="") as logf:
+    for lineno, line in enumerate(logf, start=1):
+      fields = line.rstrip("\n").split("\t")
+      try:
+        writer, record = (int(number) for number in fields[0][1:].split("-"))
+        if not line.endswith("\n") or len(fields) != 3 or fields[1] != "2026年01月01日" or fields[2].strip("+-") or not fields[0].startswith("w") or not 0 <= writer < writers:
+          raise ValueError
+      except ValueError:
+        sys.stderr.write(logfile + ":" + str(lineno) + ": malformed record: " + repr(line) + "\n")
+        errors += 1
+        continue
+      if record != last[writer] + 1:
+        sys.stderr.write(logfile + ":" + str(lineno) + ": writer " + str(writer) + "'s record " + str(record) + " follows record " + str(last[writer]) + "\n")
+        errors += 1
+      last[writer] = record
+  for writer, record in enumerate(last):
+    if record != records - 1:
+      sys.stderr.write("writer " + str(writer) + "'s last record is " + str(record) + " instead of " + str(records - 1) + "\n")
+      errors += 1
+  return errors
+
+def Main(output, writers, records, policy, group_size, seed):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    logfile = os.path.join(tmpdir, "log")
+    begin = time.perf_counter()
+    processes = [multiprocessing.Process(target=Write, args=(logfile, writer, records, (policy or oboetalib.log_policies[writer % len(oboetalib.log_policies)]), group_size, seed + writer)) for writer in range(writers)]
+    for process in processes:
+      process.start()
+    for process in processes:
+      process.join()
+    elapsed = time.perf_counter() - begin
+    if any(process.exitcode != 0 for process in processes):
+      sys.stderr.write("a writer failed\n")
+      return 1
+    errors = Check(logfile, writers, records)
+  output.write("%d writers, %d records each: %.3fs (%.0f records/s), %d errors\n" % (writers, records, elapsed, writers * records / elapsed, errors))
+  return (1 if errors else 0)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Stress-test concurrent log writers and check the resulting log.")
+  parser.add_argument("-w", "--writers", type=int, default=16, help="the number of writer processes (default: 16)")
+  parser.add_argument("-n", "--num-records", type=int, default=5000, dest="records", help="the number of records that each writer appends (default: 5000)")
+  parser.add_argument("-l", "--log-policy", default=None, choices=oboetalib.log_policies, dest="policy", help="the writers' log policy (default: the writers use all of the policies)")
+  parser.add_argument("-g", "--group-size", type=int, default=32, help="the number of records in each group commit (default: 32)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.writers, args.records, args.policy, args.group_size, args.seed))
@@ -0,0 +1,210 @@
+# Benchmark the Review Loop's Latency
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Run the README's review pipeline (oboeta, awk, and oboetatty or oboetahttp,
+# connected by named pipes) on a synthetic deck (see bench.synth) and review
+# the whole deck with a scripted user: a fake terminal (a pseudoterminal) that
+# answers oboetatty's prompts or an HTTP client that requests /show and then
+# /pass, /fail, or /0 to /5.  Most cards pass; failed cards come back.  The
+# report contains the number of reviews per second and the latencies of the
+# reviews' round trips (from sending a result to seeing the next card's
+# front, which passes the result through the command pipe, oboeta, and the
+# log and the next card through awk and the card pipe) and of showing the
+# cards' backs (which only involves the front end).  The log is checked, too:
+# Each card's first result must be logged.
+
+import argparse, http.client, os, pty, random, select, shlex, signal, socket, subprocess, sys, tempfile, termios, time
+import oboetalib
+from bench import synth
+
+front_prompt = b"Press \"Enter\" to see the answer."
+result_prompt = b"]? "
+
+# Return the command that reviews deckfile with oboeta and splits its cards
+# as the README's awk script does.  (mawk reads its input in blocks unless
+# it's interactive, so it would hold back the cards.)
+def Pipeline(deckfile, logfile, commandpipe, use_sm2, log_policy, group_size, group_ms):
+  oboeta = [sys.executable, "oboeta.py"] + (["-2"] if use_sm2 else []) + ["-l", log_policy, "-g", str(group_size), "-t", str(group_ms), commandpipe, logfile]
+  try:
+    version = subprocess.run(["awk", "-W", "version"], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=5).stdout
+  except (OSError, subprocess.TimeoutExpired):
+    version = b""
+  awk = ("awk -W interactive" if version.startswith(b"mawk") else "awk")
+  return " ".join(map(shlex.quote, oboeta)) + " <" + shlex.quote(deckfile) + " | " + awk + " -F '\t' '{ print $2; print $3; system(\"\") }'"
+
+def Result(rng, use_sm2):
+  if use_sm2:
+    return rng.choices(range(6), synth.sm2_weights)[0]
+  return rng.random() < synth.leitner_weights[0] / sum(synth.leitner_weights)
+
+# A user who reviews cards on oboetatty's terminal
+class TTerminalUser(object):
+
+  def __init__(self, master, timeout):
+    self.master = master
+    self.timeout = timeout
+    self.output = b""
+    super().__init__()
+
+  # Wait until the terminal shows text.  Returns False if the terminal is
+  # closed first.
+  def WaitFor(self, text):
+    while True:
+      index = self.output.find(text)
+      if index >= 0:
+        self.output = self.output[index + len(text):]
+        return True
+      if not select.select([self.master], [], [], self.timeout)[0]:
+        raise TimeoutError("the terminal shows nothing")
+      try:
+        data = os.read(self.master, 65536)
+      except OSError:
+        data = b""
+      if not data:
+        return False
+      self.output += data
+
+  def Type(self, text):
+    os.write(self.master, text.encode("UTF-8"))
+
+def ReviewOnTerminal(cardpipe, commandpipe, use_sm2, rng, timeout, reviews, shows):
+  master, slave = pty.openpty()
+  attributes = termios.tcgetattr(slave)
+  attributes[3] &= ~termios.ECHO
+  termios.tcsetattr(slave, termios.TCSANOW, attributes)
+  frontend = subprocess.Popen([sys.executable, "oboetatty.py"] + (["-2"] if use_sm2 else []) + [cardpipe, commandpipe], stdin=slave, stdout=slave, stderr=slave)
+  os.close(slave)
+  try:
+    user = TTerminalUser(master, timeout)
+    if not user.WaitFor(front_prompt):
+      raise EOFError("oboetatty quit before the first card")
+    while True:
+      begin = time.perf_counter()
+      user.Type("\n")
+      user.WaitFor(result_prompt)
+      shows.append(time.perf_counter() - begin)
+      result = Result(rng, use_sm2)
+      begin = time.perf_counter()
+      user.Type((str(result) if use_sm2 else "yn"[not result]) + "\n")
+      if not user.WaitFor(front_prompt):
+        return
+      reviews.append(time.perf_counter() - begin)
+  finally:
+    # oboetatty has quit unless something went wrong, in which case closing
+    # the terminal hangs it up.
+    os.close(master)
+    frontend.wait(timeout)
+
+def ReviewInBrowser(port, use_sm2, rng, timeout, reviews, shows):
+  connection = http.client.HTTPConnection("localhost", port, timeout=timeout)
+  def Get(path):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+      raise http.client.HTTPException("GET " + path + ": " + str(response.status))
+    return data
+  try:
+    if Get("/") == b"Done!":
+      raise EOFError("oboetahttp has no cards")
+    while True:
+      begin = time.perf_counter()
+      Get("/show")
+      shows.append(time.perf_counter() - begin)
+      result = Result(rng, use_sm2)
+      begin = time.perf_counter()
+      if Get("/" + (str(result) if use_sm2 else ("pass" if result else "fail"))) == b"Done!":
+        return
+      reviews.append(time.perf_counter() - begin)
+  finally:
+    connection.close()
+
+def CheckLog(logfile, cards, use_sm2):
+  results = ("0", "1", "2", "3", "4", "5") if use_sm2 else ("+", "-")
+  logged = set()
+  errors = 0
+  with open(logfile, 'r', encoding="UTF-8", newline="") as logf:
+    for lineno, line in enumerate(logf, start=1):
+      fields = line.rstrip("\n").split("\t")
+      if not line.endswith("\n") or len(fields) != 3 or not fields[0].isdigit() or not 0 <= int(fields[0]) < cards or fields[2] not in results:
+        sys.stderr.write(logfile + ":" + str(lineno) + ": malformed record: " + repr(line) + "\n")
+        errors += 1
+      else:
+        logged.add(fields[0])
+  if len(logged) != cards:
+    sys.stderr.write(str(cards - len(logged)) + " cards' results weren't logged\n")
+    errors += 1
+  return errors
+
+def Main(output, cards, frontend, use_sm2, log_policy, group_size, group_ms, port, seed, timeout=30):
+  rng = random.Random(seed)
+  reviews = []
+  shows = []
+  with tempfile.TemporaryDirectory() as tmpdir:
+    deckfile = os.path.join(tmpdir, "deck")
+    synth.WriteDeck(deckfile, cards, 20, seed)
+    logfile = os.path.join(tmpdir, "log")
+    open(logfile, 'w').close()
+    cardpipe = os.path.join(tmpdir, "cardpipe")
+    commandpipe = os.path.join(tmpdir, "commandpipe")
+    os.mkfifo(cardpipe, 0o700)
+    os.mkfifo(commandpipe, 0o700)
+    command = Pipeline(deckfile, logfile, commandpipe, use_sm2, log_policy, group_size, group_ms)
+    if frontend == "tty":
+      command += " >" + shlex.quote(cardpipe)
+    else:
+      command += " | " + " ".join(map(shlex.quote, [sys.executable, "oboetahttp.py"] + (["-2"] if use_sm2 else []) + ["-p", str(port)])) + " >" + shlex.quote(commandpipe)
+    pipeline = subprocess.Popen(command, shell=True, start_new_session=True, stderr=subprocess.DEVNULL)
+    try:
+      begin = time.perf_counter()
+      if frontend == "tty":
+        ReviewOnTerminal(cardpipe, commandpipe, use_sm2, rng, timeout, reviews, shows)
+      else:
+        while True:
+          if pipeline.poll() is not None:
+            sys.stderr.write("the pipeline failed to start\n")
+            return 1
+          try:
+            socket.create_connection(("localhost", port)).close()
+            break
+          except OSError:
+            time.sleep(0.05)
+        begin = time.perf_counter()
+        ReviewInBrowser(port, use_sm2, rng, timeout, reviews, shows)
+      elapsed = time.perf_counter() - begin
+      pipeline.wait(timeout)
+    except (OSError, EOFError, http.client.HTTPException, subprocess.TimeoutExpired) as e:
+      sys.stderr.write(frontend + ": " + str(e) + "\n")
+      return 1
+    finally:
+      if pipeline.poll() is None:
+        os.killpg(pipeline.pid, signal.SIGTERM)
+        pipeline.wait()
+    errors = CheckLog(logfile, cards, use_sm2)
+  def Latencies(latencies):
+    latencies = sorted(latencies)
+    return "p50 %.2fms p99 %.2fms max %.2fms" % tuple((latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0) for p in (0.5, 0.99, 1))
+  count = len(reviews) + 1
+  output.write("%s, %s, %s log: %d cards, %d reviews: %.3fs (%.0f reviews/s), review round trips %s, showing backs %s, %d errors\n" % (frontend, ("SM-2" if use_sm2 else "Leitner"), log_policy, cards, count, elapsed, count / elapsed, Latencies(reviews), Latencies(shows), errors))
+  return (1 if errors else 0)
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the latency of the review loop through oboeta and oboetatty or oboetahttp.")
+  parser.add_argument("-c", "--cards", type=int, default=2000, help="the number of cards in the deck (default: 2000)")
+  parser.add_argument("-e", "--front-end", default="tty", choices=("tty", "http"), dest="frontend", help="the front end: oboetatty (tty) or oboetahttp (http) (default: tty)")
+  parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="review with SM-2 grades instead of Leitner results")
+  parser.add_argument("-l", "--log-policy", default="flush-each", choices=oboetalib.log_policies, help="oboeta's log policy (default: flush-each)")
+  parser.add_argument("-g", "--group-size", type=int, default=32, help="with -l group, the maximum number of results in a batch (default: 32)")
+  parser.add_argument("-t", "--group-ms", type=float, default=1000, help="with -l group, the maximum number of milliseconds that a result waits (default: 1000)")
+  parser.add_argument("-p", "--port", type=int, default=13371, help="with -e http, oboetahttp's port (default: 13371)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.cards, args.frontend, args.use_sm2, args.log_policy, args.group_size, args.group_ms, args.port, args.seed))
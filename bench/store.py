@@ -0,0 +1,72 @@
+# Benchmark the Schedulers' Memory Use
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Run osm2's -a and oleitner's -b dump modes (and osm2's -a in low-memory mode)
+# on a synthetic deck and log and report their running times and peak resident
+# set sizes.  Each scheduler runs
+# in its own process so that os.wait4() can report that process's peak RSS.
+
+import argparse, datetime, os, random, subprocess, sys, tempfile, time
+
+def Main(output, cards, records, width, seed, scripts):
+  rng = random.Random(seed)
+  start = datetime.date(2012, 11, 4)
+  with tempfile.TemporaryDirectory() as tmpdir:
+    deckfile = os.path.join(tmpdir, "deck")
+    with open(deckfile, "w") as deckf:
+      for card in range(cards):
+        deckf.write(str(card) + "\tfront " + str(card) + "\tback " + str(card) + " " + "x" * width + "\n")
+
+    # Records are spread over a few years of daily reviews.  Log IDs are drawn
+    # from a slightly larger range than the deck's so that some of them are
+    # missing from the deck.
+    days = sorted(rng.randrange(3650) for _ in range(records))
+    ids = [rng.randrange(cards + cards // 10) for _ in range(records)]
+    stamps = [(start + datetime.timedelta(days=day)).strftime("%Y年%m月%d日") for day in days]
+    sm2file = os.path.join(tmpdir, "sm2.log")
+    with open(sm2file, "w") as logf:
+      for myid, stamp in zip(ids, stamps):
+        logf.write(str(myid) + "\t" + stamp + "\t" + str(rng.randrange(6)) + "\n")
+    leitnerfile = os.path.join(tmpdir, "leitner.log")
+    with open(leitnerfile, "w") as logf:
+      for myid, stamp in zip(ids, stamps):
+        logf.write(str(myid) + "\t" + stamp + "\t" + rng.choice("+-") + "\n")
+
+    commands = {
+      "osm2": (["osm2.py", "-a", sm2file], deckfile),
+      "osm2-low-memory": (["osm2.py", "-a", "-l", sm2file], deckfile),
+      "oleitner": (["oleitner.py", "-b", deckfile, leitnerfile, "1", "2", "3", "5", "8"], None)
+      }
+    output.write("cards: " + str(cards) + ", records: " + str(records) + ", field width: " + str(width) + "\n")
+    for script in scripts:
+      args, stdin = commands[script]
+      with open(stdin or os.devnull, "r") as inputf, open(os.devnull, "w") as devnull:
+        begin = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + args, stdin=inputf, stdout=devnull)
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - begin
+        process.returncode = os.waitstatus_to_exitcode(status)
+      if process.returncode != 0:
+        sys.stderr.write(script + " failed with exit status " + str(process.returncode) + "\n")
+        return 1
+      # ru_maxrss is in kilobytes on Linux.
+      output.write("%s: %.3fs, peak RSS %.1f MiB\n" % (script, elapsed, usage.ru_maxrss / 1024))
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the schedulers' running times and peak memory use.")
+  parser.add_argument("-c", "--cards", type=int, default=300000, help="the number of cards in the deck (default: 300000)")
+  parser.add_argument("-n", "--num-records", type=int, default=1000000, dest="records", help="the number of log records (default: 1000000)")
+  parser.add_argument("-w", "--field-width", type=int, default=0, dest="width", help="the number of characters to add to each card's back (default: 0)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  parser.add_argument("-s", "--scheduler", action="append", choices=("osm2", "osm2-low-memory", "oleitner"), dest="scripts", help="a scheduler to run (may be repeated, default: all)")
+  args = parser.parse_args()
+  sys.exit(Main(sys.stdout, args.cards, args.records, args.width, args.seed, args.scripts or ("osm2", "osm2-low-memory", "oleitner")))
@@ -0,0 +1,193 @@
+# Benchmark the Scripts' Phases
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Run each script on synthetic decks and logs (see bench.synth) of several
+# sizes and report the time, CPU time, and peak RSS of each of its phases as
+# JSON, e.g.:
+#
+#   $ python3 -m bench.suite -o before.json
+#   $ ...
+#   $ python3 -m bench.suite -o after.json -b before.json
+#
+# The phases are:
+#
+#   oleitner and osm2: parse (reading the deck), replay (replaying the log),
+#     select (selecting 1000 due cards and 100 new cards), and write (writing
+#     the whole deck with its scheduling information), in the order in which
+#     the scripts' Main() functions run them
+#   oboeta: parse (reading and shuffling the deck until the first card is
+#     shown) and review (reviewing the whole deck, logging each result)
+#   ocloze: generate (generating the cloze deletions of a corpus with as many
+#     lines as the deck has cards)
+#
+# Each script runs in its own process.  Peak RSS values are the process's peak
+# RSS at the end of the phase, so they include the earlier phases' data.  The
+# deck cache is disabled so that parse phases parse.  -b compares the results
+# with an earlier run's on standard error.
+
+import argparse, json, multiprocessing, os, platform, resource, subprocess, sys, tempfile, time
+from bench import cloze, synth
+
+scripts = ("oleitner", "osm2", "oboeta", "ocloze")
+
+# A file that counts the lines written to it and remembers when (in wall and
+# CPU time) the first one was written
+class TSink(object):
+
+  def __init__(self):
+    self.lines = 0
+    self.first = None
+    self.cpu_first = None
+    super().__init__()
+
+  def write(self, text):
+    if self.first is None:
+      self.first, self.cpu_first = time.perf_counter(), time.process_time()
+    self.lines += text.count("\n")
+    return len(text)
+
+  def flush(self):
+    pass
+
+# Time the phases, which are (name, items, function) tuples, in order.
+def TimePhases(phases):
+  results = []
+  for name, items, function in phases:
+    begin, cpu_begin = time.perf_counter(), time.process_time()
+    function()
+    results.append(Result(name, items, time.perf_counter() - begin, time.process_time() - cpu_begin, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+  return results
+
+def Result(phase, items, seconds, cpu_seconds, peak_rss_kib):
+  return {"phase": phase, "items": items, "seconds": round(seconds, 6), "cpu_seconds": round(cpu_seconds, 6), "items_per_second": round(items / seconds if seconds else 0, 1), "peak_rss_kib": peak_rss_kib}
+
+def RunLeitner(files, cards, records):
+  import oleitner
+  scheduler = oleitner.TScheduler([1, 2, 3, 5, 8], files["leitner"], "\t", "%Y年%m月%d日")
+  with open(os.path.join(files["tmpdir"], "output"), 'w') as output:
+    return TimePhases((
+      ("replay", records, scheduler.Replay),
+      ("parse", cards, lambda: scheduler.ReadDeck(files["deck"])),
+      ("select", cards, lambda: scheduler.WriteSelection(TSink(), 1000, 100, 0)),
+      ("write", cards, lambda: scheduler.WriteAll(output))))
+
+def RunSM2(files, cards, records):
+  import osm2
+  scheduler = osm2.TScheduler(files["sm2"], "\t", "%Y年%m月%d日")
+  try:
+    with open(os.path.join(files["tmpdir"], "output"), 'w') as output:
+      return TimePhases((
+        ("parse", cards, lambda: scheduler.ReadDeck(files["deck"])),
+        ("replay", records, scheduler.Replay),
+        ("select", cards, lambda: scheduler.WriteSelection(TSink(), 1000, 100, 0)),
+        ("write", cards, lambda: scheduler.WriteAll(output))))
+  finally:
+    scheduler.Close()
+
+def RunOboeta(files, cards, records):
+  import oboeta
+  logfile = os.path.join(files["tmpdir"], "review.log")
+  open(logfile, 'w').close()
+  sink = TSink()
+  begin, cpu_begin = time.perf_counter(), time.process_time()
+  if oboeta.Main(files["deck"], logfile, files["commands"], "\t", "%Y年%m月%d日", False, False, sink) != 0:
+    raise RuntimeError("oboeta failed")
+  end, cpu_end = time.perf_counter(), time.process_time()
+  # Both phases happen in one call, so they share a peak RSS.
+  peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return [Result("parse", cards, sink.first - begin, sink.cpu_first - cpu_begin, peak_rss), Result("review", sink.lines, end - sink.first, cpu_end - sink.cpu_first, peak_rss)]
+
+def RunOcloze(files, cards, records):
+  with open(files["corpus"], 'rb') as corpusf, open(os.devnull, 'wb') as devnull:
+    begin = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "ocloze.py", "-b"], stdin=corpusf, stdout=devnull)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - begin
+  if os.waitstatus_to_exitcode(status) != 0:
+    raise RuntimeError("ocloze failed")
+  return [Result("generate", cards, elapsed, usage.ru_utime + usage.ru_stime, usage.ru_maxrss)]
+
+runners = {"oleitner": RunLeitner, "osm2": RunSM2, "oboeta": RunOboeta, "ocloze": RunOcloze}
+
+# Run a script's benchmark in a new process.
+def Run(script, files, cards, records):
+  if script == "ocloze":
+    return RunOcloze(files, cards, records)
+  with multiprocessing.get_context("fork").Pool(1) as pool:
+    return pool.apply(runners[script], (files, cards, records))
+
+# Write the files that the scripts need for a size.
+def WriteFiles(tmpdir, scripts, cards, records, width, days, seed):
+  files = {"tmpdir": tmpdir, "deck": os.path.join(tmpdir, "deck")}
+  synth.WriteDeck(files["deck"], cards, width, seed)
+  if "oleitner" in scripts:
+    files["leitner"] = os.path.join(tmpdir, "leitner.log")
+    synth.WriteLog(files["leitner"], cards, records, False, days, seed)
+  if "osm2" in scripts:
+    files["sm2"] = os.path.join(tmpdir, "sm2.log")
+    synth.WriteLog(files["sm2"], cards, records, True, days, seed)
+  if "oboeta" in scripts:
+    # Most cards pass.  Failed cards come back until they pass.
+    files["commands"] = os.path.join(tmpdir, "commands")
+    with open(files["commands"], 'w') as commandf:
+      commandf.write("".join(("-\n" if command % 7 == 3 else "+\n") for command in range(cards * 2)) + "q\n")
+  if "ocloze" in scripts:
+    files["corpus"] = os.path.join(tmpdir, "corpus")
+    with open(files["corpus"], 'wb') as corpusf:
+      for start in range(0, cards, synth.chunk_size):
+        corpusf.write(cloze.Corpus(min(synth.chunk_size, cards - start), 12, 0.15, seed + start))
+  return files
+
+def Compare(results, baseline):
+  old = {(result["script"], result["phase"], result["records"]): result for result in baseline["results"]}
+  for result in results:
+    before = old.get((result["script"], result["phase"], result["records"]), None)
+    if before is not None:
+      sys.stderr.write("%s %s %d: %.3fs vs. %.3fs (%.2fx), peak RSS %.1f MiB vs. %.1f MiB\n" % (result["script"], result["phase"], result["records"], result["seconds"], before["seconds"], (result["seconds"] / before["seconds"] if before["seconds"] else 0), result["peak_rss_kib"] / 1024, before["peak_rss_kib"] / 1024))
+
+def Main(output, sizes, records_per_card, width, days, seed, scripts, baseline=None):
+  if baseline is not None:
+    try:
+      with open(baseline, 'r') as baselinef:
+        baseline = json.load(baselinef)
+    except (OSError, ValueError) as e:
+      sys.stderr.write("can't read the baseline: " + str(e) + "\n")
+      return 1
+  os.environ["OBOETA_CACHE_DIR"] = ""
+  results = []
+  for records in sizes:
+    cards = max(records // records_per_card, 1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+      files = WriteFiles(tmpdir, scripts, cards, records, width, days, seed)
+      for script in scripts:
+        for result in Run(script, files, cards, records):
+          results.append(dict({"script": script, "records": records, "cards": cards}, **result))
+  json.dump({"python": sys.version, "platform": platform.platform(), "cpus": os.cpu_count(), "records_per_card": records_per_card, "field_width": width, "days": days, "seed": seed, "results": results}, output, indent=1)
+  output.write("\n")
+  if baseline is not None:
+    Compare(results, baseline)
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the scripts' phases on synthetic decks and logs and report the results as JSON.")
+  parser.add_argument("-n", "--num-records", type=int, action="append", dest="sizes", help="a number of log records (may be repeated, default: 10000, 100000, and 1000000)")
+  parser.add_argument("-p", "--records-per-card", type=int, default=4, help="the number of log records per card in the deck (default: 4)")
+  parser.add_argument("-w", "--field-width", type=int, default=20, dest="width", help="the approximate number of characters in each card's front and back (default: 20)")
+  parser.add_argument("-d", "--days", type=int, default=3650, help="the number of days the logs span (default: 3650)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  parser.add_argument("-s", "--script", action="append", choices=scripts, dest="scripts", help="a script to benchmark (may be repeated, default: all)")
+  parser.add_argument("-o", "--output", default=None, help="the file to write the results to (default: standard output)")
+  parser.add_argument("-b", "--baseline", default=None, help="the results of an earlier run to compare the results with")
+  args = parser.parse_args()
+  if args.output is None:
+    sys.exit(Main(sys.stdout, args.sizes or (10000, 100000, 1000000), args.records_per_card, args.width, args.days, args.seed, args.scripts or scripts, args.baseline))
+  with open(args.output, 'w') as output:
+    sys.exit(Main(output, args.sizes or (10000, 100000, 1000000), args.records_per_card, args.width, args.days, args.seed, args.scripts or scripts, args.baseline))
@@ -0,0 +1,77 @@
+# Generate Synthetic Decks and Logs
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# Write a synthetic deck and a synthetic Leitner or SM-2 log for the
+# benchmarks.  The same arguments always produce the same files.  Decks' cards
+# have numeric IDs and fronts and backs of about the specified width.  Logs
+# span the specified number of days in chronological order.  Cards are
+# introduced gradually over that period, so early records are about the first
+# few cards and late records are about any of them.  Some records are about
+# IDs that aren't in the deck (deleted cards).  Leitner results and SM-2
+# grades follow the distributions of a typical review history: Most reviews
+# pass, and SM-2 grades cluster around 4.  Files are written in chunks, so
+# decks and logs can be much bigger than memory.
+
+import argparse, datetime, random, sys
+
+leitner_results = ("+\n", "-\n")
+leitner_weights = (85, 15)
+sm2_grades = ("0\n", "1\n", "2\n", "3\n", "4\n", "5\n")
+sm2_weights = (2, 3, 7, 18, 40, 30)
+chunk_size = 100000
+
+def WriteDeck(path, cards, width, seed, field_sep="\t"):
+  rng = random.Random(seed)
+  letters = "abcdefghijklmnopqrstuvwxyz      "
+  fillers = ["".join(rng.choice(letters) for _ in range(width)) for _ in range(1000)]
+  with open(path, 'w', encoding="UTF-8") as deckf:
+    for start in range(0, cards, chunk_size):
+      deckf.write("".join(str(card) + field_sep + "front " + str(card) + " " + rng.choice(fillers) + field_sep + "back " + str(card) + " " + rng.choice(fillers) + "\n" for card in range(start, min(start + chunk_size, cards))))
+
+def WriteLog(path, cards, records, sm2, days, seed, date_format="%Y年%m月%d日", field_sep="\t"):
+  rng = random.Random(seed)
+  start = datetime.datetime(2012, 11, 4)
+  results, weights = ((sm2_grades, sm2_weights) if sm2 else (leitner_results, leitner_weights))
+  ids = cards + cards // 10
+  # Timestamps are formatted once per day if the format lacks the time of day,
+  # which is much faster than formatting each record's.
+  granularity = (1 if any(directive in date_format for directive in ("%H", "%I", "%M", "%S", "%s", "%f", "%X", "%c", "%T", "%R", "%r", "%p")) else 86400)
+  stamps = {}
+  def Stamp(seconds):
+    seconds -= seconds % granularity
+    stamp = stamps.get(seconds, None)
+    if stamp is None:
+      stamp = (start + datetime.timedelta(seconds=seconds)).strftime(date_format)
+      if granularity != 1:
+        stamps[seconds] = stamp
+    return stamp
+  with open(path, 'w', encoding="UTF-8") as logf:
+    for first in range(0, records, chunk_size):
+      count = min(chunk_size, records - first)
+      times = sorted(first * days * 86400 // records + rng.randrange(max(count * days * 86400 // records, 1)) for _ in range(count))
+      chosen = rng.choices(results, weights, k=count)
+      logf.write("".join(str(rng.randrange(max(ids * (first + record + 1) // records, 1))) + field_sep + Stamp(seconds) + field_sep + result for record, (seconds, result) in enumerate(zip(times, chosen))))
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Generate a synthetic deck and log.")
+  parser.add_argument("-c", "--cards", type=int, default=100000, help="the number of cards in the deck (default: 100000)")
+  parser.add_argument("-n", "--num-records", type=int, default=1000000, dest="records", help="the number of log records (default: 1000000)")
+  parser.add_argument("-2", "--sm2", default=False, action="store_true", help="write SM-2 grades (0-5) instead of Leitner results (+ and -)")
+  parser.add_argument("-w", "--field-width", type=int, default=20, dest="width", help="the approximate number of characters in each card's front and back (default: 20)")
+  parser.add_argument("-d", "--days", type=int, default=3650, help="the number of days the log spans (default: 3650)")
+  parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of the log's timestamps (default: %%Y年%%m月%%d日)")
+  parser.add_argument("-r", "--seed", type=int, default=0, help="the random number generator's seed (default: 0)")
+  parser.add_argument("deckfile", help="the deck to write")
+  parser.add_argument("logfile", help="the log to write")
+  args = parser.parse_args()
+  WriteDeck(args.deckfile, args.cards, args.width, args.seed)
+  WriteLog(args.logfile, args.cards, args.records, args.sm2, args.days, args.seed, args.date_format)
+  sys.exit(0)
@@ -27,3 +27,5 @@ install -m 0555 oboeta.py $1/oboeta
 install -m 0555 oboetahttp.py $1/oboetahttp
 install -m 0555 oboetatty.py $1/oboetatty
 install -m 0555 ocloze.py $1/ocloze
+install -m 0555 oboetaq.py $1/oboetaq
+install -m 0444 oboetalib.py $1/oboetalib.py
@@ -14,11 +14,81 @@
 from argparse import *
 from csv import *
 from datetime import *
+from io import *
 from os.path import *
+from queue import *
 from random import *
 from sys import *
+from threading import *
+import oboetalib
 
-def Main(deckfile, logfile, commandfile, field_sep, date_format, is_dry_run, use_sm2):
+# A bounded random buffer of the cards read from a deck.  A thread reads the
+# cards into a queue; Next() moves the cards that have arrived into the window
+# (waiting only if the window is empty) and returns one of the window's cards
+# chosen at random, or None after the last card.  At most size cards wait in
+# the queue and at most size cards are in the window.  Reading the deck is
+# timed as stats's (an oboetalib.TStats's) parse phase, which overlaps the
+# review (so its CPU time includes the review's), and the number of cards is
+# counted once Next() has seen them all.
+class TCardWindow(object):
+
+  def __init__(self, deckf, field_sep, size, stats):
+    self.cards = Queue(size)
+    self.window = []
+    self.size = size
+    self.done = False
+    self.error = None
+    self.stats = stats
+    self.count = 0
+    reader_thread = Thread(target=self.Read, args=(deckf, field_sep))
+    reader_thread.daemon = True
+    reader_thread.start()
+    super().__init__()
+
+  def Read(self, deckf, field_sep):
+    try:
+      with deckf, self.stats.Phase("parse", "cards") as phase:
+        for fields in reader(deckf, delimiter=field_sep):
+          if len(fields) != 0:
+            self.cards.put([fields[0], field_sep.join(fields), False])
+            self.count += 1
+        phase.items = self.count
+    except Exception as e:
+      self.error = e
+    finally:
+      self.cards.put(None)
+
+  def Next(self):
+    while not self.done and len(self.window) < self.size:
+      try:
+        card = self.cards.get(block=not self.window)
+      except Empty:
+        break
+      if card is None:
+        self.done = True
+        if self.error is not None:
+          raise self.error
+        self.stats.Count("cards", self.count)
+      else:
+        self.window.append(card)
+    if not self.window:
+      return None
+    index = randrange(len(self.window))
+    self.window[index], self.window[-1] = self.window[-1], self.window[index]
+    return self.window.pop()
+
+# A crash might have torn the log's last record.  Repair it before appending
+# records after it.  This is done only when a program starts: A record that
+# another session is appending at the moment would look torn.
+def RepairLog(logfile, field_sep):
+  torn = oboetalib.RecoverLog(logfile, field_sep)
+  if torn is not None:
+    stderr.write("repaired torn record at the end of " + logfile + ": " + repr(torn) + "\n")
+
+# If recover is False, then the caller has already repaired the log (see
+# RepairLog()).
+def Main(deckfile, logfile, commandfile, field_sep, date_format, is_dry_run, use_sm2, output=stdout, log_policy="flush-each", group_size=32, group_ms=1000, shuffle_window=0, stats=None, recover=True):
+  stats = (oboetalib.TStats() if stats is None else stats)
   ret = 0
   if isinstance(deckfile, str) and not exists(deckfile):
     stderr.write("deck file does not exist: " + deckfile + "\n")
@@ -26,40 +96,71 @@ def Main(deckfile, logfile, commandfile, field_sep, date_format, is_dry_run, use
   if not exists(logfile):
     stderr.write("log file does not exist: " + logfile + "\n")
     ret = 1
-  if not exists(commandfile):
+  if isinstance(commandfile, str) and not exists(commandfile):
     stderr.write("command file (pipe?) does not exist: " + commandfile + "\n")
     ret = 1
+  if log_policy not in oboetalib.log_policies:
+    stderr.write("unknown log policy: " + log_policy + "\n")
+    ret = 1
+  if group_size < 1 or group_ms <= 0:
+    stderr.write("nonpositive group size or interval\n")
+    ret = 1
+  if shuffle_window < 0:
+    stderr.write("negative shuffle window\n")
+    ret = 1
   if ret != 0:
     return 1;
 
+  # Cards are read from the deck before the review starts and shuffled, or if
+  # there's a shuffle window, they're reviewed as they arrive (see
+  # TCardWindow).  Failed cards are reviewed again (in random order) after
+  # all of the deck's cards have been reviewed.
   reviewing_cards = []
   failed_cards = []
+  window = None
+  deckf = (open(deckfile, 'r') if isinstance(deckfile, str) else deckfile)
+  if shuffle_window:
+    window = TCardWindow(deckf, field_sep, shuffle_window, stats)
+  else:
+    with deckf, stats.Phase("parse", "cards") as phase:
+      for fields in reader(deckf, delimiter=field_sep):
+        if len(fields) != 0:
+          reviewing_cards.append([fields[0], field_sep.join(fields), False])
+      phase.items = len(reviewing_cards)
+    stats.Count("cards", phase.items)
 
-  deckf = None
-  try:
-    deckf = (open(deckfile, 'r') if isinstance(deckfile, str) else deckfile)
-    for fields in reader(deckf, delimiter=field_sep):
-      if len(fields) != 0:
-        reviewing_cards.append([fields[0], field_sep.join(fields), False])
-  finally:
-    if deckf is not None:
-      deckf.close()
+  def NextCard():
+    nonlocal reviewing_cards, failed_cards
+    if window is not None:
+      card = window.Next()
+      if card is not None:
+        return card
+    if not reviewing_cards:
+      reviewing_cards, failed_cards = failed_cards, reviewing_cards
+      shuffle(reviewing_cards)
+    return (reviewing_cards.pop() if reviewing_cards else None)
+
+  if recover and not is_dry_run:
+    RepairLog(logfile, field_sep)
 
+  date_codec = oboetalib.TDateFormat(date_format)
   def logreview(logf, card, command):
-    logf.write(card[0] + field_sep + datetime.now().strftime(date_format) + field_sep + command)
+    logf.Append(card[0] + field_sep + date_codec.Format(datetime.now()) + field_sep + command)
+    stats.Count("logged results", 1)
 
   sm2_commands = set(str(v) + "\n" for v in range(6))
   shuffle(reviewing_cards)
-  with open(commandfile, 'r') as commandf:
-    with open(logfile, 'a') as logf:
-      while reviewing_cards or failed_cards:
-        if not reviewing_cards:
-          reviewing_cards, failed_cards = failed_cards, reviewing_cards
-          shuffle(reviewing_cards)
-        card = reviewing_cards.pop()
-        stdout.write(card[1] + "\n")
-        stdout.flush()
+  with (open(commandfile, 'r') if isinstance(commandfile, str) else commandfile) as commandf:
+    with oboetalib.TLogWriter(logfile, log_policy, group_size, group_ms) as logf, stats.Phase("review", "reviews", hot=True) as review:
+      review.items = 0
+      while True:
+        card = NextCard()
+        if card is None:
+          break
+        output.write(card[1] + "\n")
+        output.flush()
         command = commandf.readline()
+        review.items += 1
         if use_sm2:
           if command in sm2_commands:
             if not (is_dry_run or card[-1]):
@@ -67,6 +168,7 @@ def Main(deckfile, logfile, commandfile, field_sep, date_format, is_dry_run, use
             if int(command[0:1]) < 3:
               card[-1] = True
               failed_cards.append(card)
+              stats.Count("failed", 1)
           elif command == "q\n":
             return 0
           else:
@@ -82,16 +184,222 @@ def Main(deckfile, logfile, commandfile, field_sep, date_format, is_dry_run, use
               logreview(logf, card, "-\n")
             card[-1] = True
             failed_cards.append(card)
+            stats.Count("failed", 1)
           elif command.lower() == "q\n":
             return 0
           else:
             stderr.write("unrecognized command: " + command + "\n")
             return 2
-        logf.flush()
 
   return 0
 
+# Write each card line written to it to output as two lines: the fields of
+# the card's front side and those of its back side, which are lists of field
+# numbers (starting at 1).  This does what the awk scripts in the README's
+# pipelines do.
+class TCardSides(object):
+
+  def __init__(self, output, field_sep, front, back):
+    self.output = output
+    self.field_sep = field_sep
+    self.sides = (front, back)
+    self.partial = ""
+    super().__init__()
+
+  def write(self, text):
+    lines = (self.partial + text).split("\n")
+    self.partial = lines.pop()
+    for line in lines:
+      fields = line.split(self.field_sep)
+      for side in self.sides:
+        self.output.write(self.field_sep.join(fields[field - 1] for field in side if 0 < field <= len(fields)) + "\n")
+    return len(text)
+
+  def flush(self):
+    self.output.flush()
+
+# Select cards from the deck via the scheduler (osm2 or oleitner) in this
+# process.  Return the scheduler's exit status and the selected lines (a text
+# file).
+def SelectCards(deckfile, logfile, bucketdelays, field_sep, date_format, use_sm2, num, new, checkpoint=None, seed=None):
+  selection = StringIO(newline="")
+  if use_sm2:
+    ret = oboetalib.ImportScript("osm2").Main(selection, num, new, logfile, deckfile, field_sep, date_format, False, checkpoint, seed=seed)
+  else:
+    ret = oboetalib.ImportScript("oleitner").Main(selection, num, new, bucketdelays, logfile, deckfile, field_sep, date_format, False, checkpoint, seed=seed)
+  selection.seek(0)
+  return ret, selection
+
+# Review the selected lines on a new thread.  Return the pipes that the front
+# end reads the cards from and writes its commands to, the thread, and a list
+# that gets Main()'s exit status.  The caller must have repaired the log (see
+# RepairLog()).
+def StartReview(selection, logfile, field_sep, date_format, is_dry_run, use_sm2, front, back, log_policy, group_size, group_ms):
+  cards, commands = oboetalib.TLinePipe(), oboetalib.TLinePipe()
+  results = []
+  def Review():
+    try:
+      results.append(Main(selection, logfile, commands, field_sep, date_format, is_dry_run, use_sm2, TCardSides(cards, field_sep, front, back), log_policy, group_size, group_ms, recover=False))
+    finally:
+      cards.close()
+  reviewer = Thread(target=Review, daemon=True)
+  reviewer.start()
+  return cards, commands, reviewer, results
+
+# Run a whole review in this process: Select cards from the deck with osm2 (if
+# use_sm2 is True) or oleitner, review them with Main(), and show them with
+# oboetatty (or with oboetahttp if port isn't None).  The programs are
+# connected by in-memory pipes instead of named pipes, but what flows through
+# the pipes is the same.
+def Run(deckfile, logfile, bucketdelays, field_sep, date_format, is_dry_run, use_sm2, num, new, checkpoint=None, seed=None, front=(2,), back=(3,), port=None, font_size="20pt", font="sans-serif", log_policy="flush-each", group_size=32, group_ms=1000):
+  if not use_sm2 and not bucketdelays:
+    stderr.write("the Leitner system requires bucket delays\n")
+    return 1
+  if not is_dry_run and exists(logfile):
+    RepairLog(logfile, field_sep)
+  ret, selection = SelectCards(deckfile, logfile, bucketdelays, field_sep, date_format, use_sm2, num, new, checkpoint, seed)
+  if ret != 0:
+    return ret
+
+  # The review runs on its own thread because the front ends want the main
+  # thread (for the terminal's input and for KeyboardInterrupt).
+  cards, commands, reviewer, results = StartReview(selection, logfile, field_sep, date_format, is_dry_run, use_sm2, front, back, log_policy, group_size, group_ms)
+  try:
+    if port is None:
+      ret = oboetalib.ImportScript("oboetatty").Main(cards, commands, field_sep, use_sm2)
+    else:
+      ret = oboetalib.ImportScript("oboetahttp").Main(cards, commands, port, font_size, font, field_sep, use_sm2)
+  finally:
+    commands.close()
+  reviewer.join()
+  return (results[0] if results and results[0] != 0 else ret)
+
+# Serve reviews of several decks to many browsers at once via HTTP (see
+# oboetahttp's Serve()).  decks is a list of (deck file, log file) pairs, which
+# are named after the decks' file names.  Each session gets its own selection
+# of cards from its deck and its own review, which logs to its deck's log.
+def Serve(decks, bucketdelays, field_sep, date_format, is_dry_run, use_sm2, num, new, port, seed=None, front=(2,), back=(3,), font_size="20pt", font="sans-serif", log_policy="flush-each", group_size=32, group_ms=1000, timeout=1800):
+  if not use_sm2 and not bucketdelays:
+    stderr.write("the Leitner system requires bucket delays\n")
+    return 1
+  files = {}
+  for deckfile, logfile in decks:
+    name = basename(deckfile)
+    if name in files:
+      stderr.write("two decks are named " + name + "\n")
+      return 1
+    files[name] = (deckfile, logfile)
+
+  # Logs are repaired once, before any session can append to them.
+  if not is_dry_run:
+    for deckfile, logfile in files.values():
+      if exists(logfile):
+        RepairLog(logfile, field_sep)
+
+  # Each deck's scheduler stays in memory (like the schedulers' daemons do), so
+  # starting a session replays only the records logged since the last
+  # session started.  Selections run one at a time: The schedulers aren't
+  # thread-safe and toggle the garbage collector, and they're CPU-bound, so
+  # running them concurrently wouldn't be faster anyway.
+  scheduler = oboetalib.ImportScript("osm2" if use_sm2 else "oleitner")
+  oboetahttp = oboetalib.ImportScript("oboetahttp")
+  def NewScheduler(logfile):
+    if use_sm2:
+      return lambda: scheduler.TScheduler(logfile, field_sep, date_format, keep_all=True)
+    return lambda: scheduler.TScheduler(bucketdelays, logfile, field_sep, date_format)
+  daemons = dict((name, oboetalib.TDaemon(NewScheduler(logfile), deckfile, logfile)) for name, (deckfile, logfile) in files.items())
+  selecting = Lock()
+  def NewReview(name):
+    selection = StringIO(newline="")
+    with selecting:
+      daemons[name].Refresh()
+      ret = daemons[name].Execute({"command": "select", "num": num, "new": new, "seed": seed}, selection)
+    if ret != 0:
+      stderr.write(selection.getvalue())
+      return None
+    selection.seek(0)
+    cards, commands, reviewer, results = StartReview(selection, files[name][1], field_sep, date_format, is_dry_run, use_sm2, front, back, log_policy, group_size, group_ms)
+    return oboetahttp.TReview(cards, commands, font_size, font, field_sep, use_sm2)
+  try:
+    return oboetahttp.Serve(list(files), NewReview, port, font_size, font, timeout)
+  finally:
+    for daemon in daemons.values():
+      if daemon.scheduler is not None:
+        daemon.scheduler.Close()
+
+def FieldNumbers(text):
+  try:
+    fields = tuple(int(field) for field in text.split(","))
+  except ValueError:
+    raise ArgumentTypeError("invalid list of field numbers: " + text)
+  if not fields or min(fields) < 1:
+    raise ArgumentTypeError("field numbers must be positive: " + text)
+  return fields
+
 if __name__ == "__main__":
+  if argv[1:2] == ["run"]:
+    parser = ArgumentParser(prog="oboeta run", formatter_class=RawDescriptionHelpFormatter, description="""  Select cards from the specified deck, review them, and log the results in
+  one process.  This does what this pipeline does:
+
+    osm2 -i deck log | oboeta commandpipe log | awk '{print $2; print $3}' |
+      oboetahttp >commandpipe
+
+  (or its oleitner and oboetatty equivalents) without named pipes, awk, or
+  extra processes.  Cards are shown on the terminal (like oboetatty) unless
+  -w is given, in which case they're served via HTTP (like oboetahttp).""")
+    parser.add_argument("-n", "--num-old-lines", type=int, default=10, dest="num", help="the maximum number of old cards to review (default: 10)")
+    parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of new cards to review (default: 4)")
+    parser.add_argument("-k", "--checkpoint", default=None, help="the scheduler's checkpoint file (see the schedulers' -k options)")
+    parser.add_argument("-r", "--seed", type=int, default=None, help="the scheduler's random number generator's seed")
+    parser.add_argument("-F", "--front", type=FieldNumbers, default=(2,), help="a comma-separated list of the numbers of the fields shown on the cards' fronts (default: 2)")
+    parser.add_argument("-B", "--back", type=FieldNumbers, default=(3,), help="a comma-separated list of the numbers of the fields shown on the cards' backs (default: 3)")
+    parser.add_argument("-w", "--web", default=False, action="store_true", help="serve the cards via HTTP instead of showing them on the terminal")
+    parser.add_argument("-p", "--port", default=1337, type=int, help="with -w, the HTTP server's port (default: 1337)")
+    parser.add_argument("-d", "--dry-run", default=False, action="store_true", help="don't log the results of the review")
+    parser.add_argument("-l", "--log-policy", default="flush-each", choices=oboetalib.log_policies, help="when review results are written to the log: flush-each writes each result immediately, group writes results in batches (see -g and -t) and fsyncs the log after each batch, and fsync-each writes and fsyncs each result immediately (default: flush-each)")
+    parser.add_argument("-g", "--group-size", type=int, default=32, help="with -l group, the maximum number of results in a batch (default: 32)")
+    parser.add_argument("-t", "--group-ms", type=float, default=1000, help="with -l group, the maximum number of milliseconds that a result waits to be written (default: 1000)")
+    parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log file (uses date/strftime flags, default: %%Y年%%m月%%d日)")
+    parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
+    parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm (osm2) instead of the Leitner system (oleitner)")
+    parser.add_argument("deckfile", help="a CSV-formatted file containing the cards")
+    parser.add_argument("logfile", help="a CSV-formatted file containing records for the deck's lines")
+    parser.add_argument("bucketdelay", type=int, nargs="*", help="the Leitner system's bucket delays (see oleitner)")
+    args = parser.parse_args(argv[2:])
+    exit(Run(args.deckfile, args.logfile, args.bucketdelay, args.field_sep, args.date_format, args.dry_run, args.use_sm2, args.num, args.new, args.checkpoint, args.seed, args.front, args.back, (args.port if args.web else None), log_policy=args.log_policy, group_size=args.group_size, group_ms=args.group_ms))
+
+  if argv[1:2] == ["serve"]:
+    parser = ArgumentParser(prog="oboeta serve", formatter_class=RawDescriptionHelpFormatter, description="""  Serve reviews of the specified decks via HTTP to any number of browsers at
+  once (like oboeta run -w, but for many users).  The index page
+  (http://localhost:<port>/) lists the decks, which are named after their
+  files.  Choosing a deck starts a review session: The server selects cards
+  from the deck for the session, serves them to the browser that chose the
+  deck (which it identifies via a cookie), and logs the results to the deck's
+  log.  Each session has its own cards, so family members or students can
+  review the same deck or different decks at the same time.  Sessions that
+  are idle for too long (-T) are quit.""")
+    parser.add_argument("-n", "--num-old-lines", type=int, default=10, dest="num", help="the maximum number of old cards per session (default: 10)")
+    parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of new cards per session (default: 4)")
+    parser.add_argument("-D", "--bucket-delay", type=int, action="append", dest="bucketdelays", metavar="DELAY", help="a Leitner-system bucket delay (see oleitner, may be repeated)")
+    parser.add_argument("-r", "--seed", type=int, default=None, help="the scheduler's random number generator's seed")
+    parser.add_argument("-F", "--front", type=FieldNumbers, default=(2,), help="a comma-separated list of the numbers of the fields shown on the cards' fronts (default: 2)")
+    parser.add_argument("-B", "--back", type=FieldNumbers, default=(3,), help="a comma-separated list of the numbers of the fields shown on the cards' backs (default: 3)")
+    parser.add_argument("-p", "--port", default=1337, type=int, help="the HTTP server's port (default: 1337)")
+    parser.add_argument("-T", "--session-timeout", type=float, default=1800, dest="timeout", help="the number of seconds after which idle sessions are quit (default: 1800)")
+    parser.add_argument("-d", "--dry-run", default=False, action="store_true", help="don't log the results of the reviews")
+    parser.add_argument("-l", "--log-policy", default="flush-each", choices=oboetalib.log_policies, help="when review results are written to the logs (see oboeta run -h, default: flush-each)")
+    parser.add_argument("-g", "--group-size", type=int, default=32, help="with -l group, the maximum number of results in a batch (default: 32)")
+    parser.add_argument("-t", "--group-ms", type=float, default=1000, help="with -l group, the maximum number of milliseconds that a result waits to be written (default: 1000)")
+    parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log files (uses date/strftime flags, default: %%Y年%%m月%%d日)")
+    parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
+    parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm (osm2) instead of the Leitner system (oleitner)")
+    parser.add_argument("files", nargs="+", metavar="deckfile logfile", help="a CSV-formatted file containing a deck's cards followed by a CSV-formatted file containing records for the deck's lines (may be repeated)")
+    args = parser.parse_args(argv[2:])
+    if len(args.files) % 2:
+      stderr.write("each deck file must be followed by a log file\n")
+      exit(1)
+    exit(Serve(list(zip(args.files[::2], args.files[1::2])), args.bucketdelays, args.field_sep, args.date_format, args.dry_run, args.use_sm2, args.num, args.new, args.port, args.seed, args.front, args.back, log_policy=args.log_policy, group_size=args.group_size, group_ms=args.group_ms, timeout=args.timeout))
+
   parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Review lines from standard input as though they were flashcards
   and log the results.  Both standard input and the specified log file must be
   CSV files with the same field separator character, which is specified via -s.
@@ -143,18 +451,29 @@ output:
     5   quality of review response 5
     q   the user is terminating the quiz
 
-  All other values are erroneous.""")
+  All other values are erroneous.
+
+  "oboeta run" runs a whole review (scheduler, reviewer, and front end) in one
+  process.  See "oboeta run -h".  "oboeta serve" serves reviews of several
+  decks to many browsers at once.  See "oboeta serve -h".""")
   parser.add_argument("-d", "--dry-run", default=False, action="store_true", help="don't log the results of the review")
+  parser.add_argument("-b", "--shuffle-window", type=int, default=0, help="start reviewing as soon as the first cards arrive, shuffling the cards within a window of at most this many cards instead of reading and shuffling the whole deck first (default: 0, which reads the whole deck first)")
+  parser.add_argument("-l", "--log-policy", default="flush-each", choices=oboetalib.log_policies, help="when review results are written to the log: flush-each writes each result immediately, group writes results in batches (see -g and -t) and fsyncs the log after each batch, and fsync-each writes and fsyncs each result immediately (default: flush-each)")
+  parser.add_argument("-g", "--group-size", type=int, default=32, help="with -l group, the maximum number of results in a batch (default: 32)")
+  parser.add_argument("-t", "--group-ms", type=float, default=1000, help="with -l group, the maximum number of milliseconds that a result waits to be written (default: 1000)")
   parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log file (uses date/strftime flags, default: %%Y年%%m月%%d日)")
   parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
   parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm instead of the Leitner system")
   parser.add_argument("commandfile", help="a file (usually a named pipe) providing review commands")
   parser.add_argument("logfile", help="a CSV-formatted file containing records for the deck's lines")
+  oboetalib.AddStatsOptions(parser)
 
   args = parser.parse_args()
+  stats = oboetalib.TStats(args.stats)
   try:
-    ret = Main(stdin, args.logfile, args.commandfile, args.field_sep, args.date_format, args.dry_run, args.use_sm2)
+    ret = Main(stdin, args.logfile, args.commandfile, args.field_sep, args.date_format, args.dry_run, args.use_sm2, stdout, args.log_policy, args.group_size, args.group_ms, args.shuffle_window, stats)
   except KeyboardInterrupt:
     ret = 0
+  stats.Write()
   exit(ret)
 
@@ -12,22 +12,715 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 from argparse import *
+from collections import *
 from csv import *
 from datetime import *
+import email.utils
+import gzip
+import html
+from http.cookies import *
 from http.server import *
 from http.server import SimpleHTTPRequestHandler
+import io
 from itertools import *
+import json
 from os import *
 from os.path import *
+from queue import *
 from random import *
+import re
+import secrets
 from sys import *
 from threading import *
+from time import monotonic
+from urllib.parse import *
 
-if __name__ != "__main__":
-  stderr.write("This is meant to be run as a program, not loaded as a module.\n")
-  exit(1)
+sm2_max = 6
+url_paths = dict(("/" + str(v), str(v) + "\n") for v in range(sm2_max))
+url_paths["/pass"] = "+\n"
+url_paths["/fail"] = "-\n"
+
+# A response body, encoded (and gzip-compressed) once so that it can be sent
+# any number of times.
+class TPage(object):
+
+  __slots__ = ("mime", "body", "gzipped")
+
+  def __init__(self, mime, text):
+    self.mime = mime
+    self.body = bytes(text, encoding="UTF-8")
+    self.gzipped = gzip.compress(self.body, mtime=0)
+    super().__init__()
+
+done_page = TPage("text/plain", "Done!")
+
+# A card: its sequence number (the number of cards read before it), the fields
+# of its front and back sides, and its pre-rendered pages (front and back).
+class TCard(object):
+
+  __slots__ = ("seq", "front", "back", "pages")
+
+  def __init__(self, seq, front, back, pages):
+    self.seq = seq
+    self.front = front
+    self.back = back
+    self.pages = pages
+    super().__init__()
+
+# The state of a review: The cards that were fetched but not graded yet (oldest
+# first), the number of graded cards (which is also the oldest ungraded card's
+# sequence number), whether the prefetcher's cards ran out, and whether the
+# oldest ungraded card's back side is showing.  A prefetcher thread reads the
+# cards and renders their pages ahead of time into pages (None marks the end
+# of the cards).  The HTTP server's request handlers (which run on the
+# server's threads) update the state while holding cond and notify cond when
+# the review ends.
+class TReview(object):
+
+  # the number of cards that are rendered ahead of time, which is also the
+  # number of cards that the review app (/app) tries to keep ahead of the user
+  prefetch = 8
+
+  def __init__(self, cardsource, commandf, font_size, font, field_sep, use_sm2):
+    self.issued = deque()
+    self.graded = 0
+    self.finished = False
+    self.showing_back = False
+    self.commandf = commandf
+    self.cond = Condition()
+    self.fetch_lock = Lock()
+    self.running = True
+    grades = [str(v) for v in (range(sm2_max) if use_sm2 else ("pass", "fail"))]
+    body = """<!DOCTYPE html><html><head><meta charset="UTF-8" /><title>Review</title></head><body style="text-align: center; font: """ + str(font_size) + """ """ + font + """\">"""
+    self.html_head = body + "<div>"
+    self.html_mid = {
+      False: """</div><div><a href="/show">Show</a> &middot; <a href="/quit">Quit</a>""",
+      True: "</div><div>" + " &middot; ".join(("<a href=\"/" + v + "\">" + v.capitalize() + "</a>" for v in chain(grades, ("quit",))))
+     }
+    self.app_page = TPage("text/html", body + """<div id="card"></div><div id="buttons"></div><script>var grades = """ + json.dumps(grades) + """, batch = """ + str(self.prefetch) + """;""" + app_script + """</script></body></html>\r\n""")
+    self.pages = Queue(self.prefetch)
+    prefetcher = Thread(target=self.Prefetch, args=(reader(cardsource, delimiter=field_sep),))
+    prefetcher.daemon = True
+    prefetcher.start()
+    super().__init__()
+
+  # Each card is two lines: its front side and its back side.
+  def Prefetch(self, cards):
+    try:
+      for seq in count():
+        front = next(cards, None)
+        back = next(cards, None)
+        if back is None:
+          break
+        self.pages.put(TCard(seq, front, back, (self.Render(front, None), self.Render(front, back))))
+    finally:
+      self.pages.put(None)
+
+  def Render(self, front, back):
+    return TPage("text/html", self.html_head + "<br />".join(front) + ("<hr />" + "<br />".join(back) if back is not None else "") + self.html_mid[back is not None] + html_tail)
 
-parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Review lines from standard input as though they were flashcards.
+  # Return up to n of the ungraded cards (oldest first).  If fewer than n cards
+  # were fetched, fetch the cards that the prefetcher has ready; if none were
+  # fetched, wait up to timeout seconds (forever if timeout is None) for the
+  # next one.  The card source might not send the next card until it gets the
+  # current card's result, so this doesn't hold cond while it waits.
+  def Fetch(self, n, timeout=None):
+    with self.fetch_lock:
+      while True:
+        with self.cond:
+          if len(self.issued) >= n or self.finished:
+            return list(islice(self.issued, n))
+          wait = not self.issued
+        try:
+          card = self.pages.get(wait, timeout)
+        except Empty:
+          with self.cond:
+            return list(islice(self.issued, n))
+        with self.cond:
+          if card is None:
+            self.finished = True
+          else:
+            self.issued.append(card)
+
+  def Done(self):
+    with self.cond:
+      return self.finished and not self.issued
+
+  # Write the oldest ungraded card's result.  The caller must hold cond.
+  def Grade(self, command):
+    self.commandf.write(command)
+    self.commandf.flush()
+    self.issued.popleft()
+    self.graded += 1
+    self.showing_back = False
+
+  # The caller must hold cond.
+  def Quit(self):
+    self.commandf.write("q\n")
+    self.commandf.flush()
+    stderr.write("Finishing early\n")
+
+  def Stop(self):
+    with self.cond:
+      self.running = False
+      self.cond.notify()
+
+html_tail = "</div></body></html>\r\n"
+
+# A cache of small media files' contents, bounded by the total size of the
+# cached files.  The least recently used files are evicted first.  Entries
+# are keyed by path and checked against the files' current ETags, so edited
+# files are reread.
+class TMediaCache(object):
+
+  def __init__(self, max_file_size, max_size):
+    self.max_file_size = max_file_size
+    self.max_size = max_size
+    self.size = 0
+    self.entries = OrderedDict()
+    self.lock = Lock()
+    super().__init__()
+
+  def Get(self, path, etag):
+    with self.lock:
+      entry = self.entries.get(path)
+      if entry is None or entry[0] != etag:
+        return None
+      self.entries.move_to_end(path)
+      return entry[1]
+
+  def Put(self, path, etag, data):
+    if len(data) > self.max_file_size:
+      return
+    with self.lock:
+      old = self.entries.pop(path, None)
+      if old is not None:
+        self.size -= len(old[1])
+      self.entries[path] = (etag, data)
+      self.size += len(data)
+      while self.size > self.max_size:
+        path, (etag, data) = self.entries.popitem(last=False)
+        self.size -= len(data)
+
+# The review app flips the cards in the browser.  It fetches the next cards
+# (both sides) from /api/cards in batches and sends the results to
+# /api/results in the background.  Each result names its card's sequence
+# number, so the app can resend results whose responses were lost.
+app_script = """
+var cards = [], results = [], seen = -1, showing = false, done = false, syncing = false;
+function Render() {
+  var card = cards[0], buttons = document.getElementById("buttons");
+  document.getElementById("card").innerHTML = (card ? card.front.join("<br />") + (showing ? "<hr />" + card.back.join("<br />") : "") : done ? "Done!" : "Loading...");
+  buttons.textContent = "";
+  if (card)
+    (showing ? grades : ["show"]).concat(["quit"]).forEach(function (name, i) {
+      var link = document.createElement("a");
+      link.href = "#";
+      link.textContent = name.charAt(0).toUpperCase() + name.slice(1);
+      link.onclick = function () { Press(name); return false; };
+      if (i)
+        buttons.appendChild(document.createTextNode(" \\u00b7 "));
+      buttons.appendChild(link);
+     });
+}
+function Press(name) {
+  if (name == "show")
+    showing = true;
+  else {
+    results.push({seq: cards.shift().seq, result: name});
+    showing = false;
+    if (name == "quit") {
+      cards = [];
+      done = true;
+    }
+  }
+  Render();
+  Sync();
+}
+function Call(path, body) {
+  return fetch(path, body ? {method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify(body)} : {}).then(function (response) {
+    if (!response.ok)
+      throw new Error(response.statusText);
+    return response.json();
+   });
+}
+// Send the unacknowledged results (including the ones made while waiting for
+// the server), then fetch cards until a batch of cards is waiting or the
+// server has no new cards ready.
+async function Sync() {
+  if (syncing)
+    return;
+  syncing = true;
+  try {
+    for (;;) {
+      if (results.length) {
+        var count = results.length, reply = await Call("/api/results", {results: results});
+        results = results.filter(function (result) { return result.seq >= reply.graded; });
+        if (reply.done && !done) {
+          done = true;
+          Render();
+        }
+        if (results.length < count)
+          continue;
+      }
+      if (done || cards.length >= batch)
+        break;
+      reply = await Call("/api/cards?n=" + batch);
+      var fresh = reply.cards.filter(function (card) { return card.seq > seen; });
+      fresh.forEach(function (card) { cards.push(card); seen = card.seq; });
+      done = reply.done;
+      if (fresh.length == cards.length || done)
+        Render();
+      if (!fresh.length && !results.length && (reply.cards.length || done))
+        break;
+    }
+  } catch (e) {
+    setTimeout(Sync, 1000);
+  } finally {
+    syncing = false;
+  }
+}
+Render();
+Sync();
+"""
+
+# The handlers speak HTTP/1.1, so browsers keep their connections open between
+# cards.  Headers and bodies are written separately, so Nagle's algorithm is
+# disabled: Otherwise, small bodies could wait for the browser's delayed ACKs.
+class TServer(SimpleHTTPRequestHandler):
+
+  protocol_version = "HTTP/1.1"
+  disable_nagle_algorithm = True
+
+  # the maximum number of cards per /api/cards response
+  max_cards = 100
+
+  # how long /api/cards waits for the next card before it responds with none
+  poll_timeout = 20
+
+  # how many seconds browsers may cache media files without revalidating them
+  media_max_age = 365 * 86400
+
+  def do_GET(self):
+    if self.path.startswith("/media"):
+      self.SendMedia(False)
+      return
+    self.error_content_type = "text/plain"
+    if self.path == "/favicon.ico":
+      self.send_error(404)
+      return
+    path, _, query = self.path.partition("?")
+    if path == "/start" and self.server.sessions is not None:
+      self.StartSession(query)
+      return
+    review = self.Review()
+    if review is None:
+      if path.startswith("/api/"):
+        self.send_error(404)
+      else:
+        self.Send(self.server.index_page)
+      return
+    if not review.running:
+      self.send_error(404)
+      return
+    try:
+      if path == "/app":
+        self.Send(review.app_page)
+      elif path == "/api/cards":
+        self.SendCards(review, query)
+      elif path == "/quit":
+        with review.cond:
+          review.Quit()
+        self.Send(done_page)
+        review.Stop()
+      elif not self.Advance(review):
+        self.send_error(404)
+      else:
+        cards = review.Fetch(1)
+        if cards:
+          self.Send(cards[0].pages[review.showing_back])
+        else:
+          self.Send(done_page)
+          review.Stop()
+    finally:
+      self.EndSession(review)
+
+  # Return the review of this request's session (or the server's only review
+  # if it doesn't have sessions) or None if the request has no session.
+  def Review(self):
+    self.session = None
+    sessions = self.server.sessions
+    if sessions is None:
+      return self.server.review
+    cookies = SimpleCookie()
+    try:
+      cookies.load(self.headers.get("Cookie", ""))
+    except CookieError:
+      return None
+    if sessions.cookie in cookies:
+      self.session = cookies[sessions.cookie].value
+    return sessions.Get(self.session)
+
+  # GET /start?deck=DECK starts a review of the named deck in a new session,
+  # quitting the request's old session (if any), and redirects the browser to
+  # the review (to the review app if app=1 is given, too).
+  def StartSession(self, query):
+    sessions = self.server.sessions
+    params = parse_qs(query)
+    deck = params.get("deck", ("",))[-1]
+    if deck not in sessions.decks:
+      self.send_error(404)
+      return
+    review = self.Review()
+    if review is not None:
+      sessions.End(self.session, True)
+    token = sessions.Start(deck)
+    if token is None:
+      self.send_error(500, "The cards couldn't be selected")
+      return
+    self.send_response(303)
+    self.send_header("Location", ("/app" if params.get("app", ("",))[-1] == "1" else "/"))
+    self.send_header("Set-Cookie", sessions.cookie + "=" + token + "; Path=/; HttpOnly; SameSite=Strict")
+    self.send_header("Content-Length", "0")
+    self.send_header("Cache-Control", "no-store")
+    self.end_headers()
+
+  # Forget the request's session if its review ended.
+  def EndSession(self, review):
+    if self.server.sessions is not None and not review.running:
+      self.server.sessions.End(self.session, False)
+
+  # Update the review's state for this request.  Return False if the request is
+  # invalid.
+  def Advance(self, review):
+    with review.cond:
+      if review.issued:
+        if review.showing_back:
+          path = self.path.lower()
+          if path not in url_paths:
+            return False
+          review.Grade(url_paths[path])
+        else:
+          review.showing_back = True
+    return True
+
+  # GET /api/cards?n=N responds with up to N of the ungraded cards, oldest
+  # first, and whether the review is done.  (It might respond with fewer cards
+  # if the card source hasn't sent them yet.)
+  def SendCards(self, review, query):
+    try:
+      n = min(int(parse_qs(query).get("n", ("1",))[-1]), self.max_cards)
+      if n < 1:
+        raise ValueError
+    except ValueError:
+      self.send_error(400)
+      return
+    cards = review.Fetch(n, self.poll_timeout)
+    done = review.Done()
+    self.SendJSON({"cards": [{"seq": card.seq, "front": card.front, "back": card.back} for card in cards], "graded": review.graded, "done": done})
+    if done:
+      review.Stop()
+
+  # POST /api/results with {"results": [{"seq": SEQ, "result": RESULT}, ...]}
+  # grades cards, where RESULT is "pass", "fail", 0-5, or "quit".  The results
+  # are written in the cards' order.  Results for graded cards are ignored, so
+  # clients can resend results.  Results that follow missing results are
+  # ignored, too.  The response tells how many cards were graded (i.e., the
+  # sequence number of the next card to grade) and whether the review is done.
+  def do_POST(self):
+    review = self.Review()
+    self.error_content_type = "text/plain"
+    if review is None or not review.running or self.path != "/api/results":
+      self.close_connection = True
+      self.send_error(404)
+      return
+    try:
+      self.GradeResults(review)
+    finally:
+      self.EndSession(review)
+
+  def GradeResults(self, review):
+    try:
+      request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", ""))))
+      results = sorted((int(result["seq"]), str(result["result"]).lower()) for result in request["results"])
+      if any(result != "quit" and "/" + result not in url_paths for seq, result in results):
+        raise ValueError
+    except (ValueError, KeyError, TypeError):
+      self.close_connection = True
+      self.send_error(400)
+      return
+    quit = False
+    with review.cond:
+      for seq, result in results:
+        if seq < review.graded:
+          continue
+        if seq == review.graded and result == "quit":
+          review.Quit()
+          quit = True
+          break
+        if seq != review.graded or not review.issued:
+          break
+        review.Grade(url_paths["/" + result])
+      graded = review.graded
+    done = quit or review.Done()
+    self.SendJSON({"graded": graded, "done": done})
+    if done:
+      review.Stop()
+
+  def do_HEAD(self):
+    if self.path.startswith("/media"):
+      self.SendMedia(True)
+    else:
+      super().do_HEAD()
+
+  # Send a media file (or just its headers if head is True).  Files are sent
+  # with strong ETags so that browsers can revalidate them (304 responses) and
+  # single byte ranges are supported (for seeking in audio files).  Small
+  # files come from the server's media cache; other files are sent via
+  # sendfile(), which doesn't copy them through Python.
+  def SendMedia(self, head):
+    path = self.translate_path(self.path)
+    if isdir(path):
+      if head:
+        super().do_HEAD()
+      else:
+        super().do_GET()
+      return
+    try:
+      f = io.open(path, 'rb')
+    except OSError:
+      self.send_error(404, "File not found")
+      return
+    with f:
+      st = fstat(f.fileno())
+      etag = "\"%x-%x-%x\"" % (st.st_ino, st.st_mtime_ns, st.st_size)
+      last_modified = self.date_time_string(st.st_mtime)
+      if self.NotModified(etag, st.st_mtime):
+        self.send_response(304)
+        self.SendMediaHeaders(etag, last_modified)
+        self.end_headers()
+        return
+      size = st.st_size
+      byte_range = self.ByteRange(size, etag, last_modified)
+      if byte_range is False:
+        self.send_response(416)
+        self.send_header("Content-Range", "bytes */" + str(size))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return
+      start, end = (byte_range or (0, size))
+      cache = self.server.media_cache
+      data = None
+      if not head and size <= cache.max_file_size:
+        data = cache.Get(path, etag)
+        if data is None:
+          data = f.read()
+          if len(data) != size:
+            self.close_connection = True
+            self.send_error(500, "File changed")
+            return
+          cache.Put(path, etag, data)
+      self.send_response(206 if byte_range else 200)
+      self.send_header("Content-Type", self.guess_type(path))
+      self.send_header("Content-Length", str(end - start))
+      self.SendMediaHeaders(etag, last_modified)
+      self.send_header("Accept-Ranges", "bytes")
+      if byte_range:
+        self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end - 1, size))
+      self.end_headers()
+      if head:
+        return
+      if data is not None:
+        self.wfile.write(memoryview(data)[start:end])
+      elif end > start:
+        self.connection.sendfile(f, start, end - start)
+
+  def SendMediaHeaders(self, etag, last_modified):
+    self.send_header("ETag", etag)
+    self.send_header("Last-Modified", last_modified)
+    self.send_header("Cache-Control", "public, max-age=" + str(self.media_max_age))
+
+  # Return whether the browser's cached copy of a file with the specified ETag
+  # and modification time is current.
+  def NotModified(self, etag, mtime):
+    if_none_match = self.headers.get("If-None-Match")
+    if if_none_match is not None:
+      return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    if_modified_since = self.headers.get("If-Modified-Since")
+    if if_modified_since is None:
+      return False
+    try:
+      since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError, IndexError, OverflowError):
+      return False
+    if since.tzinfo is None:
+      since = since.replace(tzinfo=timezone.utc)
+    return int(mtime) <= since.timestamp()
+
+  # Return the requested byte range of a file with the specified size, ETag,
+  # and Last-Modified date as (start, end) (where end is exclusive), None if
+  # the whole file should be sent, or False if the range can't be satisfied.
+  # Requests for multiple ranges get the whole file.
+  def ByteRange(self, size, etag, last_modified):
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", self.headers.get("Range", ""))
+    if match is None or self.headers.get("If-Range", etag) not in (etag, last_modified):
+      return None
+    first, last = match.groups()
+    if first:
+      start = int(first)
+      end = (int(last) + 1 if last else size)
+      if last and end <= start:
+        return None
+    elif last:
+      start = max(size - int(last), 0)
+      end = size
+      if not int(last):
+        return False
+    else:
+      return None
+    if start >= size:
+      return False
+    return (start, min(end, size))
+
+  def SendJSON(self, value):
+    self.Send(TPage("application/json", json.dumps(value, ensure_ascii=False)))
+
+  def Send(self, page):
+    gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+    message = (page.gzipped if gzipped else page.body)
+    self.send_response(200)
+    self.send_header("Content-Type", page.mime)
+    self.send_header("Content-Length", str(len(message)))
+    self.send_header("Cache-Control", "no-store")
+    self.send_header("Vary", "Accept-Encoding")
+    if gzipped:
+      self.send_header("Content-Encoding", "gzip")
+    self.end_headers()
+    self.wfile.write(message)
+
+# socketserver's default listen() backlog (5) is too small for many browsers
+# connecting at once: Their extra connections would be retried seconds later
+# or reset.
+class THTTPServer(ThreadingHTTPServer):
+
+  request_queue_size = 1024
+
+# The sessions of a multi-session server (see Serve()), keyed by their cookies'
+# values.  Each session reviews its own selection of cards from the deck of
+# its choice: new_review(deck) selects cards from the named deck and returns
+# a TReview of them (or None if it can't).  Sessions that are idle for more
+# than timeout seconds are quit.
+class TSessions(object):
+
+  cookie = "oboeta-session"
+
+  def __init__(self, decks, new_review, timeout):
+    self.decks = decks
+    self.new_review = new_review
+    self.timeout = timeout
+    self.reviews = {}
+    self.lock = Lock()
+    super().__init__()
+
+  # Start a review of the named deck and return its session's cookie value (or
+  # None if the review can't be started).
+  def Start(self, deck):
+    review = self.new_review(deck)
+    if review is None:
+      return None
+    token = secrets.token_urlsafe(18)
+    with self.lock:
+      self.reviews[token] = [review, monotonic()]
+    return token
+
+  def Get(self, token):
+    with self.lock:
+      session = self.reviews.get(token)
+      if session is None:
+        return None
+      session[1] = monotonic()
+      return session[0]
+
+  # Forget the session, quitting its review first if quit is True.
+  def End(self, token, quit):
+    with self.lock:
+      session = self.reviews.pop(token, None)
+    if session is not None and quit:
+      self.Quit(session[0])
+
+  def Quit(self, review):
+    with review.cond:
+      if review.running:
+        review.Quit()
+    review.Stop()
+
+  # Quit the sessions that have been idle for too long (or all of them).
+  def Expire(self, everything=False):
+    now = monotonic()
+    with self.lock:
+      expired = [token for token, (review, used) in self.reviews.items() if everything or now - used > self.timeout]
+      reviews = [self.reviews.pop(token)[0] for token in expired]
+    for review in reviews:
+      self.Quit(review)
+
+# Serve the cards read from cardsource (a text file) on the specified port
+# until the user quits or the cards run out, writing the results to commandf
+# (likewise).
+def Main(cardsource, commandf, port, font_size, font, field_sep, use_sm2):
+  if port <= 0 or port > 65535:
+    stderr.write("illegal port number\n")
+    return 1
+  review = TReview(cardsource, commandf, font_size, font, field_sep, use_sm2)
+  server = THTTPServer(('', port), TServer)
+  server.review = review
+  server.sessions = None
+  server.media_cache = TMediaCache(64 * 1024, 16 * 1024 * 1024)
+  serverthread = Thread(target=server.serve_forever)
+  serverthread.daemon = True
+  serverthread.start()
+  try:
+    with review.cond:
+      while review.running:
+        review.cond.wait()
+  except KeyboardInterrupt as e:
+    commandf.write("q\n")
+  finally:
+    server.shutdown()
+    server.server_close()
+  return 0
+
+# Serve reviews of the named decks (a list of names) to any number of
+# browsers at once on the specified port until interrupted.  Browsers choose
+# decks on the index page (/) and get sessions (cookies) with their own
+# reviews from new_review (see TSessions).  Sessions that are idle for more
+# than timeout seconds are quit.
+def Serve(decks, new_review, port, font_size, font, timeout=1800):
+  if port <= 0 or port > 65535:
+    stderr.write("illegal port number\n")
+    return 1
+  sessions = TSessions(decks, new_review, timeout)
+  server = THTTPServer(('', port), TServer)
+  server.review = None
+  server.sessions = sessions
+  server.index_page = TPage("text/html", """<!DOCTYPE html><html><head><meta charset="UTF-8" /><title>Review</title></head><body style="text-align: center; font: """ + str(font_size) + """ """ + font + """\">""" + "".join("<div><a href=\"/start?deck=" + html.escape(quote(deck)) + "\">" + html.escape(deck) + "</a> (<a href=\"/start?deck=" + html.escape(quote(deck)) + "&amp;app=1\">app</a>)</div>" for deck in decks) + "</body></html>\r\n")
+  server.media_cache = TMediaCache(64 * 1024, 16 * 1024 * 1024)
+  serverthread = Thread(target=server.serve_forever)
+  serverthread.daemon = True
+  serverthread.start()
+  try:
+    idle = Event()
+    while not idle.wait(min(timeout, 60)):
+      sessions.Expire()
+  except KeyboardInterrupt as e:
+    pass
+  finally:
+    server.shutdown()
+    server.server_close()
+    sessions.Expire(True)
+  return 0
+
+if __name__ == "__main__":
+  parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Review lines from standard input as though they were flashcards.
   This program serves flashcards on the localhost via HTTP: You should
   review the cards through a web browser (http://localhost:<port>).
 
@@ -50,111 +743,17 @@ formatting:
 output:
 
   This program will serve HTML via the specified port (-p option).  Use your
-  web browser to view the cards.""")
-parser.add_argument("-i", "--font-size", default="20pt", help="the font size, including units (default: 20pt)")
-parser.add_argument("-n", "--font", default="sans-serif", help="the font used in rendered HTML (default: sans-serif)")
-parser.add_argument("-p", "--port", default=1337, type=int, help="the HTTP server's port (default: 1337)")
-parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
-parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm instead of the Leitner system")
-
-args = parser.parse_args()
-if args.port <= 0 or args.port > 65535:
-  stderr.write("illegal port number\n")
-  exit(1)
-
-front = None
-back = None
-showing_back = False
-stdinreader = reader(stdin, delimiter=args.field_sep)
-cond = Condition()
-retcode = 0
-running = True
-
-sm2_max = 6
-url_paths = dict(("/" + str(v), str(v) + "\n") for v in range(sm2_max))
-url_paths["/pass"] = "+\n"
-url_paths["/fail"] = "-\n"
-
-html_head = """<!DOCTYPE html><html><head><meta charset="UTF-8" /><title>Review</title></head><body style="text-align: center; font: """ + str(args.font_size) + """ """ + args.font + """\"><div>"""
-html_mid = {
-  False: """</div><div><a href="/show">Show</a> &middot; <a href="/quit">Quit</a>""",
-  True: "</div><div>" + " &middot; ".join(("<a href=\"/" + str(v) + "\">" + str(v).capitalize() + "</a>" for v in chain(range(sm2_max) if args.use_sm2 else ("pass", "fail"), ("quit",))))
- }
-html_tail = "</div></body></html>\r\n"
-
-class TServer(SimpleHTTPRequestHandler):
-  def do_GET(self):
-    global front
-    global back
-    global showing_back
-    global stdinreader
-    global retcode
-    global running
-    if self.path.startswith("/media"):
-      super().do_GET()
-      return
-    self.error_content_type = "text/plain"
-    if running and self.path != "/favicon.ico":
-      if self.path == "/quit":
-        stdout.write("q\n")
-        stdout.flush()
-        stderr.write("Finishing early\n")
-        self.Send("text/plain", "Done!")
-        with cond:
-          running = False
-          cond.notify()
-        return
-      if front is not None:
-        if showing_back:
-          if self.path.lower() in url_paths:
-            stdout.write(url_paths[self.path])
-          else:
-            self.send_error(404)
-            self.end_headers()
-            return
-          stdout.flush()
-          front = None
-        else:
-          showing_back = True
-      if front is None:
-        front = next(stdinreader, None)
-        back = next(stdinreader, None)
-        if front is None or back is None:
-          with cond:
-            running = False
-            cond.notify()
-          self.Send("text/plain", "Done!")
-          return
-        showing_back = False
-      self.Send("text/html", html_head + "<br />".join(front) + ("<hr />" + "<br />".join(back) if showing_back else "") + html_mid[showing_back] + html_tail)
-    else:
-      self.send_error(404)
-      self.end_headers()
-
-  def Send(self, mime, message):
-    message = bytes(message, encoding="UTF-8")
-    self.send_response(200)
-    self.send_header("Content-Type", mime)
-    self.send_header("Content-Length", str(len(message)))
-    self.end_headers()
-    left = len(message)
-    while left:
-      written = self.wfile.write(message)
-      message = message[written:]
-      left -= written
-
-server = HTTPServer(('', args.port), TServer)
-def ServeIt():
-  server.serve_forever()
-serverthread = Thread(target=ServeIt)
-serverthread.daemon = True
-serverthread.start()
-try:
-  with cond:
-    while running:
-      cond.wait()
-except KeyboardInterrupt as e:
-  stdout.write("q\n");
-
-exit(retcode)
+  web browser to view the cards.  http://localhost:<port>/app serves an app
+  that fetches cards in batches and flips them in the browser, which hides
+  network latency.  The app uses a JSON API: GET /api/cards?n=N responds with
+  the next N ungraded cards (at most) and POST /api/results grades cards by
+  their sequence numbers.  Either way, the results are written in the order
+  of the cards.""")
+  parser.add_argument("-i", "--font-size", default="20pt", help="the font size, including units (default: 20pt)")
+  parser.add_argument("-n", "--font", default="sans-serif", help="the font used in rendered HTML (default: sans-serif)")
+  parser.add_argument("-p", "--port", default=1337, type=int, help="the HTTP server's port (default: 1337)")
+  parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
+  parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm instead of the Leitner system")
 
+  args = parser.parse_args()
+  exit(Main(stdin, stdout, args.port, args.font_size, args.font, args.field_sep, args.use_sm2))
@@ -0,0 +1,1198 @@
+# Support Code Shared by the Oboeta Scripts
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+# This module isn't a program: The schedulers import it.  install.sh copies it
+# next to them so that Python finds it on the scripts' path.
+
+import array, cProfile, csv, datetime, fcntl, gc, hashlib, heapq, importlib.machinery, importlib.util, io, json, locale, marshal, math, mmap, multiprocessing, operator, os, pickle, queue, re, resource, shutil, signal, socket, stat, sys, tempfile, threading, time
+
+checkpoint_magic = "oboeta-checkpoint-3"
+fingerprint_size = 4096
+
+# Hash the first few bytes of the log along with the few bytes that precede
+# offset.  If either changes, then someone rewrote the part of the log that a
+# checkpoint summarizes, so the checkpoint is stale.
+def LogFingerprint(logf, offset):
+  size = min(offset, fingerprint_size)
+  hasher = hashlib.sha1()
+  logf.seek(0)
+  hasher.update(logf.read(size))
+  logf.seek(offset - size)
+  hasher.update(logf.read(size))
+  return hasher.hexdigest()
+
+# Read a checkpoint (a CSV file written by SaveCheckpoint()) for logfile.
+# params is a sequence of strings describing the scheduler's configuration;
+# checkpoints written with different parameters are ignored.  Returns a tuple
+# containing the log offset and record number at which replay should resume
+# and the saved per-line rows.  The tuple is (0, 0, ()) if the checkpoint is
+# missing or stale.
+def LoadCheckpoint(path, logfile, field_sep, params):
+  params = list(params)
+  try:
+    with open(path, 'r', newline="") as checkpointf:
+      rows = csv.reader(checkpointf, delimiter=field_sep)
+      header = next(rows, None)
+      if header is None or header[0] != checkpoint_magic or header[1:-3] != params:
+        return 0, 0, ()
+      offset, lineno = int(header[-3]), int(header[-2])
+      with open(logfile, 'rb') as logf:
+        if os.fstat(logf.fileno()).st_size < offset or LogFingerprint(logf, offset) != header[-1]:
+          return 0, 0, ()
+      return offset, lineno, list(rows)
+  except (OSError, ValueError, csv.Error):
+    return 0, 0, ()
+
+# Write a checkpoint summarizing the first offset bytes (lineno records) of
+# logfile.  The file is replaced atomically so that an interrupted run can't
+# leave a half-written checkpoint behind.  Each row's first field must be a
+# line's ID and its last field must be the line's due date in ticks (see
+# DateToTicks()): The rows are sorted by due date so that DueRows() can find the
+# due rows by binary search.
+def SaveCheckpoint(path, logfile, field_sep, params, offset, lineno, rows):
+  with open(logfile, 'rb') as logf:
+    fingerprint = LogFingerprint(logf, offset)
+  tmppath = path + ".tmp"
+  with open(tmppath, 'w', newline="") as checkpointf:
+    csvout = csv.writer(checkpointf, delimiter=field_sep)
+    csvout.writerow([checkpoint_magic] + list(params) + [str(offset), str(lineno), fingerprint])
+    csvout.writerows(sorted(rows, key=_DueOrder))
+  os.replace(tmppath, path)
+
+def _DueOrder(row):
+  return int(row[-1]), row[0]
+
+# Return the checkpoint rows (see SaveCheckpoint()) in rows that are due by the
+# specified ticks, sorted by due date.
+def SelectDueRows(rows, ticks):
+  return sorted((row for row in rows if int(row[-1]) <= ticks), key=_DueOrder)
+
+# Return the rows of the checkpoint at path that are due by the specified
+# ticks, sorted by due date, without reading the rest of the checkpoint: The
+# rows are found by binary-searching the memory-mapped checkpoint.  (If the
+# checkpoint contains quotation marks, then it's parsed by the csv module
+# instead.)  Returns None if the checkpoint is missing or stale or if logfile
+# contains records that the checkpoint doesn't summarize, in which case a
+# scheduler must replay the log (which updates the checkpoint).  Appending
+# records to the log doesn't update the checkpoint, so the first query after
+# any append replays the new records (starting from the checkpoint).
+def DueRows(path, logfile, field_sep, params, ticks):
+  try:
+    with open(path, 'rb') as checkpointf:
+      data = mmap.mmap(checkpointf.fileno(), 0, access=mmap.ACCESS_READ)
+  except (OSError, ValueError):
+    return None
+  try:
+    body = data.find(b"\n") + 1
+    header = next(csv.reader((data[:body].decode("UTF-8"),), delimiter=field_sep), None)
+    if not body or header is None or header[0] != checkpoint_magic or header[1:-3] != list(params):
+      return None
+    offset = int(header[-3])
+    with open(logfile, 'rb') as logf:
+      if os.fstat(logf.fileno()).st_size != offset or LogFingerprint(logf, offset) != header[-1]:
+        return None
+    if data.find(b'"', body) >= 0:
+      return SelectDueRows((row for row in csv.reader(io.StringIO(data[body:].decode("UTF-8"), newline=""), delimiter=field_sep) if row), ticks)
+
+    # The rows in [body, low) are due and the rows in [high, len(data)) aren't.
+    # Both bounds are always at the starts of rows.
+    sep = field_sep.encode("UTF-8")
+    low, high = body, len(data)
+    while low < high:
+      start = max(data.rfind(b"\n", low, (low + high) // 2) + 1, low)
+      end = data.find(b"\n", start)
+      end = (len(data) if end < 0 else end)
+      if int(data[data.rfind(sep, start, end) + len(sep):end]) <= ticks:
+        low = end + 1
+      else:
+        high = start
+    lines = data[body:low].decode("UTF-8").split("\n")
+    if not lines[-1]:
+      lines.pop()
+    return [line.rstrip("\r").split(field_sep) for line in lines]
+  except (OSError, ValueError, UnicodeDecodeError, csv.Error):
+    return None
+  finally:
+    data.close()
+
+# Write due checkpoint rows (see DueRows()) to output: their number if count is
+# True and otherwise their IDs and due dates (formatted by date_codec, a
+# TDateFormat) in CSV format.
+def WriteDueRows(output, rows, count, date_codec, field_sep):
+  if count:
+    output.write(str(len(rows)) + "\n")
+    return
+  csvout = csv.writer(output, delimiter=field_sep, lineterminator="\n")
+  for row in rows:
+    csvout.writerow((row[0], date_codec.FormatTicks(int(row[-1]))))
+
+# Generate the records in logfile starting at the specified byte offset, which
+# must be the start of a line.  Records are generated in blocks: Each item is
+# a pair containing the first record's number and a list of records, each of
+# which is a list of fields.  Record numbers start at lineno.  Callers
+# typically iterate over enumerate(records, start=first_lineno).
+# After the last newline-terminated record is generated,
+# on_complete (if it isn't None) is called with the offset and record number
+# just past that record so that callers can checkpoint their state before a
+# trailing, partially-written line is generated.  If complete_only is True,
+# then that line isn't generated (or decoded) at all.
+#
+# Log records don't need CSV's quoting rules, so the log is memory-mapped and
+# split into lines and fields as bytes; fields are UTF-8-encoded bytes objects
+# that callers decode only if they need to.  If the log contains quotation
+# marks, then it's parsed by the csv module instead, whose fields are encoded
+# so that callers see the same types either way.
+def ScanLog(logfile, field_sep, offset=0, lineno=0, on_complete=None, complete_only=False):
+  with open(logfile, 'rb') as logf:
+    size = os.fstat(logf.fileno()).st_size
+    data = (mmap.mmap(logf.fileno(), 0, access=mmap.ACCESS_READ) if size > offset else b"")
+  try:
+    end = data.rfind(b"\n", offset) + 1 or offset
+    if data.find(b'"', offset) >= 0:
+      blocks = (_ScanCSV(data, field_sep, offset, end),)
+    else:
+      blocks = _ScanBytes(data, field_sep.encode("UTF-8"), offset, end)
+    for block in blocks:
+      yield lineno, block
+      lineno += len(block)
+    if on_complete is not None:
+      on_complete(end, lineno)
+    if end < size and not complete_only:
+      yield lineno, _ScanCSV(data, field_sep, end, size)
+  finally:
+    if isinstance(data, mmap.mmap):
+      data.close()
+
+# Small blocks keep the lists of records short-lived, which keeps the garbage
+# collector from repeatedly scanning them.
+scan_block_size = 1 << 14
+
+# Generate lists of records, each of which holds the records from about
+# scan_block_size bytes of complete lines.
+def _ScanBytes(data, sep, start, end):
+  while start < end:
+    stop = data.rfind(b"\n", start, min(start + scan_block_size, end)) + 1 or data.find(b"\n", start, end) + 1
+    block = data[start:stop]
+    start = stop
+    if b"\r" in block:
+      if block.count(b"\r") != block.count(b"\r\n"):
+        yield _ScanCSV(block, sep.decode("UTF-8"), 0, len(block))
+        continue
+      block = block.replace(b"\r\n", b"\n")
+    lines = block.split(b"\n")
+    lines.pop()
+    yield [(line.split(sep) if line else []) for line in lines]
+
+def _ScanCSV(data, field_sep, start, end):
+  return [[field.encode("UTF-8") for field in fields] for fields in csv.reader(io.StringIO(data[start:end].decode("UTF-8"), newline=""), delimiter=field_sep)]
+
+# Raised by the schedulers' record decoders when a log record is malformed.
+# lineno is the record's number if it's known.
+class TLogError(Exception):
+
+  def __init__(self, message, lineno=None):
+    self.lineno = lineno
+    super().__init__(message)
+
+# Replay the complete records in logfile starting at offset (whose record
+# number is lineno) using jobs worker processes.  The log is split into byte
+# ranges at line boundaries.  Workers decode the records in the ranges and
+# group them by ID into one file per ID partition, and then each worker
+# replays the records of one partition's IDs in log order.  decode(fields)
+# must return None (to skip the record) or a tuple starting with the record's
+# ID, or raise TLogError.  replay(myid, records) receives the rest of each of
+# an ID's tuples in log order and must return the ID's final (picklable)
+# state.
+#
+# Returns a tuple containing the offset and record number just past the
+# replayed records, the replayed IDs in order of first appearance, and a
+# dictionary mapping them to their states.  Callers must replay whatever
+# follows the returned offset (e.g., a partially-written line) themselves.
+# Raises TLogError (with lineno set) for the first malformed record.
+#
+# Logs that contain quotation marks are left entirely to the caller because
+# quoted fields may span lines.  The workers are forked, so decode and replay
+# can be closures.
+def ReplayLogInParallel(logfile, field_sep, offset, lineno, jobs, decode, replay):
+  global _replay_context
+  with open(logfile, 'rb') as logf:
+    size = os.fstat(logf.fileno()).st_size
+    if size <= offset:
+      return offset, lineno, [], {}
+    with mmap.mmap(logf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      end = data.rfind(b"\n", offset) + 1 or offset
+      if data.find(b'"', offset, end) >= 0:
+        return offset, lineno, [], {}
+      ranges = []
+      start = offset
+      step = max((end - offset) // (jobs * 4), 1)
+      while start < end:
+        stop = data.find(b"\n", min(start + step, end) - 1, end) + 1
+        ranges.append((len(ranges), start, stop))
+        start = stop
+
+  with tempfile.TemporaryDirectory(prefix="oboeta") as tmpdir:
+    _replay_context = (logfile, field_sep.encode("UTF-8"), jobs, decode, replay, tmpdir, len(ranges))
+    try:
+      with multiprocessing.get_context("fork").Pool(jobs) as pool:
+        # Stop at the first malformed record, just like serial replay.
+        order = {}
+        for count, error, ids in pool.imap(_DecodeLogRange, ranges):
+          if error is not None:
+            raise TLogError(error, lineno + count)
+          lineno += count
+          order.update(dict.fromkeys(ids))
+        states = {}
+        for partition_states in pool.imap_unordered(_ReplayLogPartition, range(jobs)):
+          states.update(partition_states)
+    finally:
+      _replay_context = None
+  return end, lineno, list(order), states
+
+_replay_context = None
+
+def _DecodeLogRange(byte_range):
+  logfile, sep, jobs, decode, replay, tmpdir, num_ranges = _replay_context
+  index, start, stop = byte_range
+  cards = {}
+  count = 0
+  with open(logfile, 'rb') as logf:
+    with mmap.mmap(logf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      try:
+        for records in _ScanBytes(data, sep, start, stop):
+          for fields in records:
+            record = decode(fields)
+            if record is not None:
+              card_records = cards.get(record[0], None)
+              if card_records is None:
+                cards[record[0]] = [record[1:]]
+              else:
+                card_records.append(record[1:])
+            count += 1
+      except TLogError as e:
+        return count, str(e), ()
+  partitions = [{} for partition in range(jobs)]
+  for myid, records in cards.items():
+    partitions[hash(myid) % jobs][myid] = records
+  for partition, partition_cards in enumerate(partitions):
+    with open(os.path.join(tmpdir, str(index) + "." + str(partition)), 'wb') as partitionf:
+      pickle.dump(partition_cards, partitionf, pickle.HIGHEST_PROTOCOL)
+  return count, None, list(cards)
+
+def _ReplayLogPartition(partition):
+  logfile, sep, jobs, decode, replay, tmpdir, num_ranges = _replay_context
+  cards = {}
+  for index in range(num_ranges):
+    with open(os.path.join(tmpdir, str(index) + "." + str(partition)), 'rb') as partitionf:
+      for myid, records in pickle.load(partitionf).items():
+        if myid in cards:
+          cards[myid].extend(records)
+        else:
+          cards[myid] = records
+  return dict((myid, replay(myid, records)) for myid, records in cards.items())
+
+# Card stores keep dates as "ticks": the number of microseconds since the
+# start of the day before datetime.min, which is day 0 of the proleptic
+# Gregorian calendar.  (See datetime.toordinal().)  Ticks fit in 64-bit
+# integers and preserve datetimes exactly.
+day_ticks = 86400 * 1000000
+
+def DateToTicks(dateandtime):
+  return dateandtime.toordinal() * day_ticks + ((dateandtime.hour * 60 + dateandtime.minute) * 60 + dateandtime.second) * 1000000 + dateandtime.microsecond
+
+def TicksToDate(ticks):
+  days, microseconds = divmod(ticks, day_ticks)
+  return datetime.datetime.fromordinal(days) + datetime.timedelta(microseconds=microseconds)
+
+# Scheduler state for lines (cards) kept in parallel arrays (see the array
+# module) rather than in per-line objects, which keeps large decks compact.
+# Each keyword argument names a column and maps to a tuple containing the
+# column's array typecode and its default value.  Lines are numbered in order
+# of addition: index maps IDs to line numbers, ids holds the lines' IDs, and
+# fields holds the lines' fields (None for lines that aren't in the deck and
+# empty tuples for deck lines whose fields weren't kept).
+class TCardStore(object):
+
+  def __init__(self, **columns):
+    self.index = {}
+    self.ids = []
+    self.fields = []
+    self.defaults = []
+    for name, (typecode, default) in columns.items():
+      column = array.array(typecode)
+      setattr(self, name, column)
+      self.defaults.append((column, default))
+    super().__init__()
+
+  def __len__(self):
+    return len(self.ids)
+
+  # Add a line with default state and return its number.
+  def Add(self, myid, fields=None):
+    line = len(self.ids)
+    self.index[myid] = line
+    self.ids.append(myid)
+    self.fields.append(fields)
+    for column, default in self.defaults:
+      column.append(default)
+    return line
+
+  # Return the number of the line with the specified ID, adding the line if
+  # it doesn't exist.
+  def Get(self, myid):
+    line = self.index.get(myid, None)
+    return (self.Add(myid) if line is None else line)
+
+  # Generate the numbers of the lines that are in the deck.
+  def DeckLines(self):
+    return (line for line, fields in enumerate(self.fields) if fields is not None)
+
+  # Renumber the lines: order lists the current numbers of the lines that are
+  # kept in their new order.  Lines missing from order are removed.
+  def Reorder(self, order):
+    self.ids = [self.ids[line] for line in order]
+    self.fields = [self.fields[line] for line in order]
+    self.index = dict(zip(self.ids, range(len(self.ids))))
+    for column, _ in self.defaults:
+      column[:] = array.array(column.typecode, map(column.__getitem__, order))
+
+# Selectors choose up to capacity of the objects passed to Add() and generate
+# the chosen objects when iterated.  Add()'s overdue argument is the number of
+# ticks by which a line is overdue.  rng is a random.Random (e.g., a seeded
+# one for reproducible runs).
+#
+# TRandomSelector chooses uniformly at random via reservoir sampling.  It uses
+# Li's Algorithm L, which computes how many objects to skip before the next one
+# enters the reservoir, so it makes O(capacity * log(n / capacity)) calls to
+# rng for n objects instead of one per object.  The chosen objects are
+# generated in reservoir order.
+class TRandomSelector(object):
+
+  def __init__(self, capacity, rng):
+    self.capacity = int(capacity)
+    self.sample = []
+    self.rng = rng
+    self.w = 1.0
+    self.skip = 0
+    if not self.capacity:
+      self.Add = (lambda o, overdue=0: None)
+
+  def __iter__(self):
+    return iter(self.sample)
+
+  def Add(self, o, overdue=0):
+    if len(self.sample) < self.capacity:
+      self.sample.append(o)
+      if len(self.sample) == self.capacity:
+        self.Advance()
+    elif self.skip:
+      self.skip -= 1
+    else:
+      self.sample[self.rng.randrange(self.capacity)] = o
+      self.Advance()
+
+  def Advance(self):
+    self.w *= math.exp(math.log(_Uniform(self.rng)) / self.capacity)
+    self.skip = (math.floor(math.log(_Uniform(self.rng)) / math.log1p(-self.w)) if self.w < 1.0 else 0)
+
+# Return a random number in (0, 1).
+def _Uniform(rng):
+  u = rng.random()
+  while u == 0.0:
+    u = rng.random()
+  return u
+
+# TPrioritySelector keeps the objects with the greatest priorities in a bounded
+# heap.  If weighted is False, then the most overdue objects are chosen.
+# Otherwise objects are sampled with probabilities proportional to their
+# weights (one plus the number of days they're overdue) via Efraimidis and
+# Spirakis's A-Res algorithm, whose priorities are u ** (1 / weight) for random
+# u; their logarithms are used instead to avoid underflow.  The chosen objects
+# are generated in order of decreasing priority.  Ties favor objects that were
+# added first.
+class TPrioritySelector(object):
+
+  def __init__(self, capacity, rng, weighted):
+    self.capacity = int(capacity)
+    self.heap = []
+    self.rng = rng
+    self.weighted = weighted
+    self.counter = 0
+    if not self.capacity:
+      self.Add = (lambda o, overdue=0: None)
+
+  def __iter__(self):
+    return (o for _, _, o in sorted(self.heap, reverse=True))
+
+  def Add(self, o, overdue=0):
+    if self.weighted:
+      priority = math.log(_Uniform(self.rng)) / (1 + overdue / day_ticks)
+    else:
+      priority = overdue
+    self.counter -= 1
+    if len(self.heap) < self.capacity:
+      heapq.heappush(self.heap, (priority, self.counter, o))
+    elif (priority, self.counter) > self.heap[0][:2]:
+      heapq.heapreplace(self.heap, (priority, self.counter, o))
+
+selector_modes = ("random", "overdue", "weighted")
+
+# Return a selector for the specified mode (one of selector_modes).
+def NewSelector(mode, capacity, rng):
+  if mode == "random":
+    return TRandomSelector(capacity, rng)
+  return TPrioritySelector(capacity, rng, mode == "weighted")
+
+# Two-pass deck reading: The first pass notes each line's byte offset and the
+# second rereads only the lines it needs (see ReadDeckRecordAt()).
+# OpenDeckBytes() returns a seekable binary file containing deckfile (a path or
+# a text file), the deck's encoding, and whether the caller must close the
+# binary file.  Decks that can't seek (e.g., pipes) are copied to temporary
+# files unless spool is False, in which case OpenDeckBytes() returns None.
+def OpenDeckBytes(deckfile, spool=True):
+  if isinstance(deckfile, str):
+    return open(deckfile, 'rb'), locale.getpreferredencoding(False), True
+  binary = getattr(deckfile, "buffer", None)
+  if binary is not None and binary.seekable():
+    return binary, deckfile.encoding, False
+  if not spool:
+    return None
+  spool = tempfile.TemporaryFile()
+  if binary is not None:
+    shutil.copyfileobj(binary, spool)
+    encoding = deckfile.encoding
+  else:
+    for text in deckfile:
+      spool.write(text.encode("UTF-8"))
+    encoding = "UTF-8"
+  spool.seek(0)
+  return spool, encoding, True
+
+# Generate tuples containing the byte offsets and fields of the CSV records in
+# binary (a seekable binary file) starting at its current position.  Newlines
+# are translated as text files translate them.
+def ReadDeckRecords(binary, encoding, field_sep):
+  position = binary.tell()
+  def Lines():
+    nonlocal position
+    for line in iter(binary.readline, b""):
+      position += len(line)
+      yield line.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+  records = csv.reader(Lines(), delimiter=field_sep)
+  while True:
+    offset = position
+    fields = next(records, None)
+    if fields is None:
+      return
+    yield offset, fields
+
+# Return the fields of the record at the specified byte offset in binary.
+def ReadDeckRecordAt(binary, encoding, field_sep, offset):
+  binary.seek(offset)
+  return next(ReadDeckRecords(binary, encoding, field_sep))[1]
+
+# Parsed-deck cache: Decks rarely change between runs, so LoadDeck() saves
+# parsed decks in a cache directory and loads them from there instead of parsing
+# them again.  Cache entries contain a key and the sizes of three blobs, all of
+# which are serialized by marshal, followed by the blobs: the IDs of the deck's
+# nonempty records, the records' byte offsets, and the records' fields (or None;
+# see LoadDeck()).  (marshal.load() reads files in small pieces, so blobs are
+# read at once and decoded by marshal.loads().)  An entry is used only if its
+# key matches the deck's: The key describes the deck file's identity (device and
+# inode numbers, so decks on standard input work too), size, modification time,
+# encoding, and field separator along with a hash of the deck's first and last
+# few bytes.  The least-recently-used entries are deleted when the directory's
+# size exceeds deck_cache_limit.  The directory is $OBOETA_CACHE_DIR or
+# $XDG_CACHE_HOME/oboeta (~/.cache/oboeta by default); setting OBOETA_CACHE_DIR
+# to an empty string disables the cache.
+deck_cache_magic = "oboeta-deck-cache-1"
+deck_cache_limit = 256 << 20
+
+def DeckCacheDirectory():
+  directory = os.environ.get("OBOETA_CACHE_DIR", None)
+  if directory is None:
+    directory = os.path.join(os.environ.get("XDG_CACHE_HOME", "") or os.path.join(os.path.expanduser("~"), ".cache"), "oboeta")
+  return directory or None
+
+# Return a tuple containing the IDs of the nonempty records of deckfile (a path
+# or a text file positioned at its start), a list of the records' byte offsets,
+# and a list of the records' fields (as tuples) or None if with_fields is
+# False.  Returns None if the deck can't be cached (e.g., because it's a pipe
+# or the cache is disabled); the caller must parse it itself.  If with_fields
+# is False, then an entry with fields is used if there is one, and misses save
+# entries without fields, which have their own paths so that they never
+# replace entries with fields.
+def LoadDeck(deckfile, field_sep, with_fields=True):
+  directory = DeckCacheDirectory()
+  if directory is None:
+    return None
+  deck = OpenDeckBytes(deckfile, spool=False)
+  if deck is None:
+    return None
+  binary, encoding, close_deck = deck
+  try:
+    status = os.fstat(binary.fileno())
+    if not stat.S_ISREG(status.st_mode) or binary.tell() != 0:
+      return None
+    hasher = hashlib.sha1()
+    hasher.update(binary.read(fingerprint_size))
+    binary.seek(max(status.st_size - fingerprint_size, 0))
+    hasher.update(binary.read(fingerprint_size))
+    binary.seek(0)
+    key = (deck_cache_magic, sys.version, status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns, encoding, field_sep, hasher.hexdigest())
+    path = os.path.join(directory, hashlib.sha1(repr(key[:4] + key[6:8]).encode("UTF-8")).hexdigest())
+    paths = ((path,) if with_fields else (path, path + "-ids"))
+
+    # Creating many tuples triggers the garbage collector over and over, but
+    # the tuples can't contain cycles.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      for entry_path in paths:
+        deck = _LoadDeckEntry(entry_path, key, with_fields)
+        if deck is not None:
+          return deck
+    finally:
+      if gc_enabled:
+        gc.enable()
+    ids = []
+    offsets = []
+    records = []
+    for offset, fields in ReadDeckRecords(binary, encoding, field_sep):
+      if len(fields) != 0:
+        ids.append(fields[0])
+        offsets.append(offset)
+        if with_fields:
+          records.append(tuple(fields))
+    records = (records if with_fields else None)
+    _SaveDeck(directory, paths[-1], key, (ids, offsets, records))
+    return ids, offsets, records
+  except OSError:
+    return None
+  finally:
+    if close_deck:
+      binary.close()
+
+# Return the IDs, offsets, and fields (or None if with_fields is False) in the
+# deck cache entry at path or None if the entry is missing, belongs to another
+# key, or lacks the fields.
+def _LoadDeckEntry(path, key, with_fields):
+  try:
+    with open(path, 'rb') as cachef:
+      if marshal.load(cachef) != key:
+        return None
+      ids_size, offsets_size, records_size = marshal.load(cachef)
+      ids = marshal.loads(cachef.read(ids_size))
+      offsets = marshal.loads(cachef.read(offsets_size))
+      records = (marshal.loads(cachef.read(records_size)) if with_fields else None)
+      if with_fields and records is None:
+        return None
+    os.utime(path)
+    return ids, offsets, records
+  except (OSError, EOFError, ValueError, TypeError):
+    return None
+
+# Generate the fields of the nonempty records of deckfile (a path or a text
+# file) via LoadDeck() if possible and by parsing the deck otherwise.
+def ReadDeck(deckfile, field_sep):
+  deck = LoadDeck(deckfile, field_sep)
+  if deck is not None:
+    yield from deck[2]
+    return
+  deckf = (open(deckfile, 'r') if isinstance(deckfile, str) else deckfile)
+  try:
+    for fields in csv.reader(deckf, delimiter=field_sep):
+      if len(fields) != 0:
+        yield fields
+  finally:
+    if deckf is not deckfile:
+      deckf.close()
+
+# Write a deck cache entry and then trim the cache.  Failures are ignored
+# because the cache is only an optimization.
+def _SaveDeck(directory, path, key, items):
+  try:
+    os.makedirs(directory, exist_ok=True)
+    fd, tmppath = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, 'wb') as cachef:
+        blobs = [marshal.dumps(item) for item in items]
+        marshal.dump(key, cachef)
+        marshal.dump(tuple(map(len, blobs)), cachef)
+        for blob in blobs:
+          cachef.write(blob)
+      os.replace(tmppath, path)
+    except:
+      os.unlink(tmppath)
+      raise
+    entries = []
+    for name in os.listdir(directory):
+      status = os.stat(os.path.join(directory, name))
+      entries.append((status.st_mtime, status.st_size, name))
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, name in sorted(entries):
+      if size <= deck_cache_limit:
+        break
+      os.unlink(os.path.join(directory, name))
+      size -= entry_size
+  except OSError:
+    pass
+
+# Scheduler daemons: Serve() loads a deck and a log (both paths) into a
+# scheduler and then answers requests via a Unix domain socket at socket_path
+# until it's interrupted or terminated.  new_scheduler() must return a new,
+# empty scheduler with the following attributes (see osm2.TScheduler and
+# oleitner.TScheduler):
+#
+#   offset: the offset just past the log's replayed records
+#   date_codec: a TDateFormat for the log's timestamps
+#   ReadDeck(deckfile): reads (or rereads) the deck
+#   Replay(complete_only): replays records that haven't been replayed yet
+#   WriteAll(output), WriteLines(output, ids), WriteSelection(output, num,
+#     new, seed, priority), and WriteDue(output, due_ticks, count): write the
+#     output of the scheduler's commands
+#   Close(): releases the scheduler's resources
+#
+# The deck and the log are checked for changes (via their sizes and
+# modification times) every poll seconds and before each request.  Records
+# appended to the log are replayed and changed decks are reread.  If the log's
+# replayed records change, then everything is reloaded.
+#
+# Requests are lines containing JSON objects whose "command" members are
+# "select" (with "num", "new", "seed", and "priority" members), "all",
+# "lines" (with an "ids" member), or "due" (with "due_by" and "count"
+# members).  Responses consist of a line containing an exit status followed by
+# the command's output or an error message.  (See oboetaq.)
+def Serve(socket_path, new_scheduler, deckfile, logfile, poll):
+  daemon = TDaemon(new_scheduler, deckfile, logfile)
+  daemon.Refresh()
+  if daemon.error is not None:
+    sys.stderr.write(daemon.error + "\n")
+  try:
+    if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+      os.unlink(socket_path)
+  except OSError:
+    pass
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  try:
+    server.bind(socket_path)
+    server.listen()
+    server.settimeout(poll)
+    while True:
+      try:
+        connection, _ = server.accept()
+      except socket.timeout:
+        daemon.Refresh()
+        continue
+      with connection:
+        daemon.Handle(connection)
+  except KeyboardInterrupt:
+    return 0
+  finally:
+    server.close()
+    try:
+      os.unlink(socket_path)
+    except OSError:
+      pass
+    if daemon.scheduler is not None:
+      daemon.scheduler.Close()
+
+def _FileStamp(path):
+  status = os.stat(path)
+  return status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns
+
+# A scheduler kept up to date with its deck and its log (see Serve()).
+# Refresh() replays the records appended to the log since the last refresh
+# and Execute(request, output) executes a request (a dictionary like Serve()'s
+# requests' JSON objects) and returns its exit status.  Besides Serve(),
+# "oboeta serve" uses these to select cards for its sessions.
+class TDaemon(object):
+
+  def __init__(self, new_scheduler, deckfile, logfile):
+    self.new_scheduler = new_scheduler
+    self.deckfile = deckfile
+    self.logfile = logfile
+    self.scheduler = None
+    self.error = None
+    self.deck_stamp = None
+    self.log_stamp = None
+    self.fingerprint = None
+    super().__init__()
+
+  # Bring the scheduler up to date.  Errors are saved in self.error and
+  # reported to clients.  The scheduler is discarded after errors because its
+  # state might be partially updated, so the next change reloads everything.
+  def Refresh(self):
+    try:
+      deck_stamp, log_stamp = _FileStamp(self.deckfile), _FileStamp(self.logfile)
+    except OSError:
+      return
+    if (deck_stamp, log_stamp) == (self.deck_stamp, self.log_stamp):
+      return
+    deck_changed = (deck_stamp != self.deck_stamp)
+    self.deck_stamp, self.log_stamp = deck_stamp, log_stamp
+    try:
+      with open(self.logfile, 'rb') as logf:
+        if self.scheduler is not None and (os.fstat(logf.fileno()).st_size < self.scheduler.offset or LogFingerprint(logf, self.scheduler.offset) != self.fingerprint):
+          self.scheduler.Close()
+          self.scheduler = None
+      if self.scheduler is None:
+        self.scheduler = self.new_scheduler()
+        self.scheduler.ReadDeck(self.deckfile)
+      elif deck_changed:
+        self.scheduler.ReadDeck(self.deckfile)
+      self.scheduler.Replay(True)
+      with open(self.logfile, 'rb') as logf:
+        self.fingerprint = LogFingerprint(logf, self.scheduler.offset)
+      self.error = None
+    except TLogError as e:
+      self.error = self.logfile + ":" + str(e.lineno) + ": " + str(e)
+    except (OSError, ValueError, csv.Error) as e:
+      self.error = str(e)
+    if self.error is not None and self.scheduler is not None:
+      self.scheduler.Close()
+      self.scheduler = None
+
+  def Handle(self, connection):
+    output = io.StringIO()
+    try:
+      with connection.makefile('rb') as requests:
+        request = json.loads(requests.readline())
+      self.Refresh()
+      status = self.Execute(request, output)
+    except (OSError, ValueError, TypeError, KeyError) as e:
+      output = io.StringIO("invalid request: " + str(e) + "\n")
+      status = 2
+    try:
+      connection.sendall((str(status) + "\n" + output.getvalue()).encode("UTF-8"))
+    except OSError:
+      pass
+
+  def Execute(self, request, output):
+    if self.error is not None or self.scheduler is None:
+      output.write((self.error or "the daemon isn't ready") + "\n")
+      return 3
+    command = request["command"]
+    if command == "select":
+      if request.get("priority", "random") not in selector_modes:
+        raise ValueError("unknown priority " + str(request["priority"]))
+      self.scheduler.WriteSelection(output, int(request["num"]), int(request["new"]), request.get("seed", None), request.get("priority", "random"))
+    elif command == "all":
+      self.scheduler.WriteAll(output)
+    elif command == "lines":
+      self.scheduler.WriteLines(output, [str(myid) for myid in request["ids"]])
+    elif command == "due":
+      due_by = request.get("due_by", "now")
+      due_ticks = (DateToTicks(datetime.datetime.now()) if due_by == "now" else self.scheduler.date_codec.ParseTicks(due_by))
+      self.scheduler.WriteDue(output, due_ticks, bool(request.get("count", False)))
+    else:
+      raise ValueError("unknown command " + str(command))
+    return 0
+
+# Log writers append records (lines ending in newlines) to logs.  Several
+# writers (e.g., review sessions in different processes) can append to the
+# same log: Each writer buffers its own records and commits them in batches
+# while holding an exclusive advisory lock (see flock(2)) on the log, and each
+# batch is written by a single write() to a file descriptor opened with
+# O_APPEND.  So batches never interleave and each writer's records stay in
+# order.  (A log's last record might have been torn by a crash.  Writers don't
+# repair it because another program might still be appending it: Call
+# RecoverLog() once when starting to write instead.)  The policy (one of
+# log_policies) chooses when batches are committed:
+#
+#   flush-each: each record is committed as soon as it's appended
+#   group: records are buffered and committed together (and then fsynced)
+#     when group_size records are pending or group_ms milliseconds after the
+#     first of them was appended, whichever comes first
+#   fsync-each: each record is committed and fsynced as soon as it's appended
+#
+# Close() commits pending records.
+log_policies = ("flush-each", "group", "fsync-each")
+
+class TLogWriter(object):
+
+  def __init__(self, logfile, policy="flush-each", group_size=32, group_ms=1000):
+    self.policy = policy
+    self.group_size = group_size
+    self.group_ms = group_ms
+    self.pending = []
+    self.lock = threading.Lock()
+    self.timer = None
+    self.logf = open(logfile, 'ab', buffering=0)
+    super().__init__()
+
+  def Append(self, record):
+    with self.lock:
+      self.pending.append(record)
+      if self.policy != "group" or len(self.pending) >= self.group_size:
+        self._Commit()
+      elif self.timer is None:
+        self.timer = threading.Timer(self.group_ms / 1000, self.Flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+  def Flush(self):
+    with self.lock:
+      self._Commit()
+
+  def Close(self):
+    if self.logf is not None:
+      self.Flush()
+      self.logf.close()
+      self.logf = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.Close()
+
+  def _Commit(self):
+    if self.timer is not None:
+      self.timer.cancel()
+      self.timer = None
+    if not self.pending:
+      return
+    data = "".join(self.pending).encode("UTF-8")
+    self.pending = []
+    fd = self.logf.fileno()
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+      while data:
+        data = data[os.write(fd, data):]
+      if self.policy != "flush-each":
+        os.fsync(fd)
+    finally:
+      fcntl.flock(fd, fcntl.LOCK_UN)
+
+# Repair a log whose last record was torn by a crash, i.e., whose last line
+# lacks a newline.  If the line looks complete (it has three fields and the
+# last one isn't empty), then only the newline is missing, so it's appended.
+# Otherwise the line is truncated.  Returns the torn line (or None if the log
+# didn't need repairs).
+def RecoverLog(logfile, field_sep):
+  with open(logfile, 'a+b', buffering=0) as logf:
+    fcntl.flock(logf.fileno(), fcntl.LOCK_EX)
+    size = logf.seek(0, os.SEEK_END)
+    if size == 0:
+      return None
+    logf.seek(size - 1)
+    if logf.read(1) == b"\n":
+      return None
+    start = size
+    while start > 0:
+      block = max(start - 65536, 0)
+      logf.seek(block)
+      newline = logf.read(start - block).rfind(b"\n")
+      if newline >= 0:
+        start = block + newline + 1
+        break
+      start = block
+    logf.seek(start)
+    torn = logf.read().decode("UTF-8", errors="replace")
+    fields = torn.split(field_sep)
+    if len(fields) == 3 and fields[2].strip():
+      logf.write(b"\n")
+    else:
+      logf.truncate(start)
+    return torn
+
+# Statistics for the scripts' --stats options: Scripts time their phases with
+# TStats.Phase(), which returns a TPhase (a context manager whose items
+# attribute can be set to the number of things that the phase processed), and
+# record counts (e.g., of deck lines) with TStats.Count().  Write() reports the
+# phases' wall and CPU times (including those of child processes that exited
+# during them) and rates, the counts, and the peak RSS on standard error, as
+# text or (if the format is "json") as a JSON object on one line.  Counts that
+# take work to compute should only be computed if enabled is True.
+#
+# If $OBOETA_PROFILE names a file, then each script's hot phase (or the phase
+# named by $OBOETA_PROFILE_PHASE) runs under cProfile and the profile is saved
+# in the file (see the pstats module) whether or not statistics are reported.
+stats_formats = ("text", "json")
+
+# Add --stats and --stats=json options (whose destination is stats) to an
+# argparse parser.  (An optional argument would swallow positional arguments
+# that follow --stats.)
+def AddStatsOptions(parser):
+  parser.add_argument("--stats", default=None, action="store_const", const="text", help="report the times of the program's phases, counts of what it processed, and its peak memory use on standard error")
+  parser.add_argument("--stats=json", action="store_const", const="json", dest="stats", help="like --stats, but as a JSON object")
+
+class TStats(object):
+
+  def __init__(self, format=None):
+    self.format = format
+    self.enabled = (format is not None)
+    self.phases = []
+    self.counts = {}
+    self.profile = os.environ.get("OBOETA_PROFILE", "") or None
+    self.profile_phase = os.environ.get("OBOETA_PROFILE_PHASE", "") or None
+    super().__init__()
+
+  # unit describes the phase's items (e.g., "log records").  hot marks the
+  # phase that's profiled by default.
+  def Phase(self, name, unit=None, hot=False):
+    return TPhase(self, name, unit, (name == self.profile_phase if self.profile_phase is not None else hot))
+
+  def Count(self, name, value):
+    self.counts[name] = self.counts.get(name, 0) + value
+
+  def Write(self, output=None):
+    if not self.enabled:
+      return
+    output = (sys.stderr if output is None else output)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+    children_peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+    if self.format == "json":
+      phases = [{"phase": phase.name, "seconds": round(phase.seconds, 6), "cpu_seconds": round(phase.cpu_seconds, 6), "items": phase.items, "unit": phase.unit, "items_per_second": (round(phase.items / phase.seconds, 1) if phase.items is not None and phase.seconds else None)} for phase in self.phases]
+      output.write(json.dumps({"phases": phases, "counts": self.counts, "peak_rss_kib": peak_rss, "children_peak_rss_kib": children_peak_rss}, ensure_ascii=False) + "\n")
+    else:
+      for phase in self.phases:
+        output.write("%s: %.3fs (%.3fs CPU)" % (phase.name, phase.seconds, phase.cpu_seconds))
+        if phase.items is not None:
+          output.write(", %d %s" % (phase.items, phase.unit))
+          if phase.seconds:
+            output.write(" (%.0f/s)" % (phase.items / phase.seconds))
+        output.write("\n")
+      for name, value in self.counts.items():
+        output.write(name + ": " + str(value) + "\n")
+      output.write("peak RSS: %.1f MiB" % (peak_rss / 1024) + (" (children: %.1f MiB)" % (children_peak_rss / 1024) if children_peak_rss else "") + "\n")
+    output.flush()
+
+class TPhase(object):
+
+  def __init__(self, stats, name, unit, profile):
+    self.stats = stats
+    self.name = name
+    self.unit = unit
+    self.items = None
+    self.profiler = (cProfile.Profile() if profile and stats.profile is not None else None)
+    super().__init__()
+
+  def __enter__(self):
+    self.begin = time.perf_counter()
+    self.cpu_begin = sum(os.times()[:4])
+    if self.profiler is not None:
+      try:
+        self.profiler.enable()
+      except ValueError:
+        # Another thread's phase is being profiled.
+        self.profiler = None
+    return self
+
+  def __exit__(self, *exc_info):
+    if self.profiler is not None:
+      self.profiler.disable()
+      self.profiler.dump_stats(self.stats.profile)
+    self.seconds = time.perf_counter() - self.begin
+    self.cpu_seconds = sum(os.times()[:4]) - self.cpu_begin
+    self.stats.phases.append(self)
+
+# In-process pipelines (see oboeta's run command) connect the scripts' Main()
+# functions with TLinePipes instead of named pipes.  A TLinePipe is a
+# thread-safe, in-memory text file that one thread writes lines to and another
+# reads lines from.  Lines become readable when their newlines are written.
+# After close(), readline() returns "" (like it does at the end of a file) once
+# the remaining lines are read.
+class TLinePipe(object):
+
+  def __init__(self):
+    self.lines = queue.Queue()
+    self.partial = ""
+    self.eof = False
+    super().__init__()
+
+  def write(self, text):
+    lines = (self.partial + text).split("\n")
+    self.partial = lines.pop()
+    for line in lines:
+      self.lines.put(line + "\n")
+    return len(text)
+
+  def flush(self):
+    pass
+
+  def readline(self):
+    if self.eof:
+      return ""
+    line = self.lines.get()
+    if line is None:
+      self.eof = True
+      return ""
+    return line
+
+  def __iter__(self):
+    return iter(self.readline, "")
+
+  def close(self):
+    if self.partial:
+      self.lines.put(self.partial)
+      self.partial = ""
+    self.lines.put(None)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+# Import the script called name (e.g., "osm2") from the directory containing
+# this module.  install.sh installs the scripts without their .py extensions,
+# so the import system can't find them by itself.
+def ImportScript(name):
+  if name in sys.modules:
+    return sys.modules[name]
+  directory = os.path.dirname(os.path.abspath(__file__))
+  for path in (os.path.join(directory, name + ".py"), os.path.join(directory, name)):
+    if os.path.isfile(path):
+      loader = importlib.machinery.SourceFileLoader(name, path)
+      module = importlib.util.module_from_spec(importlib.util.spec_from_loader(name, loader))
+      sys.modules[name] = module
+      try:
+        loader.exec_module(module)
+      except:
+        del sys.modules[name]
+        raise
+      return module
+  raise ImportError("can't find the " + name + " script in " + directory, name=name)
+
+# A compiled date/timestamp format (see strftime(3)).  Parse() decodes log
+# timestamps (strings or UTF-8-encoded bytes) and Format() encodes them.
+# ParseTicks() and FormatTicks() do the same for ticks (see DateToTicks()).
+# Logs contain very few distinct timestamps (one per day with the default
+# format), so all of them remember recent results.  Formats consisting only of
+# fixed-width numeric fields (%Y, %m, %d, %H, %M, %S, %f, and %y) and literal
+# text, which includes the default format and ISO 8601 formats such as
+# %Y-%m-%dT%H:%M:%S, are decoded by a single regular expression match instead
+# of by datetime.strptime().  "%s" means seconds since the epoch.
+# Anything else (including timestamps that don't fit the fast paths, such as
+# months lacking leading zeros) falls back on strptime(), so the results and
+# error messages are the same as strptime()'s.
+class TDateFormat(object):
+
+  memo_size = 1 << 16
+  widths = {"Y": 4, "y": 2, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2, "f": 6}
+  date_directives = frozenset("Yymd")
+  defaults = (1900, 1, 1, 0, 0, 0, 0)
+
+  def __init__(self, date_format):
+    self.format = date_format
+    self.parsed = {}
+    self.parsed_ticks = {}
+    self.formatted = {}
+    self.pattern = None
+    self.pick = None
+    self.short_year = False
+    self.date_only = False
+    if date_format == "%s":
+      self.Decode = self.DecodeEpoch
+      self.Encode = self.EncodeEpoch
+    elif self.Compile():
+      self.Decode = self.DecodeFixed
+
+  # Try to translate the format into a regular expression matching fixed-width
+  # numeric fields and literal text.  Returns True if that succeeded.
+  def Compile(self):
+    pattern = []
+    directives = []
+    index = 0
+    while index < len(self.format):
+      c = self.format[index]
+      if c != "%":
+        pattern.append(re.escape(c))
+        index += 1
+        continue
+      directive = self.format[index + 1:index + 2]
+      index += 2
+      if directive == "%":
+        pattern.append("%")
+      elif directive in self.widths and directive not in directives:
+        directives.append(directive)
+        pattern.append("([0-9]{" + str(self.widths[directive]) + "})")
+      else:
+        return False
+    if "Y" in directives and "y" in directives:
+      return False
+    # Decoded fields are followed by the defaults that strptime() uses so that
+    # a single itemgetter can pick datetime()'s arguments.
+    if "y" in directives:
+      directives[directives.index("y")] = "Y"
+      self.short_year = True
+    self.pattern = re.compile("".join(pattern))
+    self.pick = operator.itemgetter(*((directives.index(directive) if directive in directives else len(directives) + index) for index, directive in enumerate("YmdHMSf")))
+    self.date_only = set(directives) <= self.date_directives
+    return True
+
+  def Parse(self, text):
+    dateandtime = self.parsed.get(text, None)
+    if dateandtime is None:
+      dateandtime = self.Decode(text if isinstance(text, str) else text.decode("UTF-8"))
+      if len(self.parsed) >= self.memo_size:
+        self.parsed.clear()
+      self.parsed[text] = dateandtime
+    return dateandtime
+
+  def Format(self, dateandtime):
+    if not self.date_only:
+      return self.Encode(dateandtime)
+    key = dateandtime.toordinal()
+    text = self.formatted.get(key, None)
+    if text is None:
+      text = self.Encode(dateandtime)
+      if len(self.formatted) >= self.memo_size:
+        self.formatted.clear()
+      self.formatted[key] = text
+    return text
+
+  def ParseTicks(self, text):
+    ticks = self.parsed_ticks.get(text, None)
+    if ticks is None:
+      ticks = DateToTicks(self.Parse(text))
+      if len(self.parsed_ticks) >= self.memo_size:
+        self.parsed_ticks.clear()
+      self.parsed_ticks[text] = ticks
+    return ticks
+
+  def FormatTicks(self, ticks):
+    if self.date_only:
+      text = self.formatted.get(ticks // day_ticks, None)
+      if text is not None:
+        return text
+    return self.Format(TicksToDate(ticks))
+
+  def Decode(self, text):
+    return datetime.datetime.strptime(text, self.format)
+
+  def Encode(self, dateandtime):
+    return dateandtime.strftime(self.format)
+
+  def DecodeFixed(self, text):
+    match = self.pattern.fullmatch(text)
+    if match is not None:
+      values = self.pick(tuple(map(int, match.groups())) + self.defaults)
+      if self.short_year:
+        values = (values[0] + (2000 if values[0] <= 68 else 1900),) + values[1:]
+      try:
+        return datetime.datetime(*values)
+      except ValueError:
+        pass
+    return datetime.datetime.strptime(text, self.format)
+
+  def DecodeEpoch(self, text):
+    try:
+      return datetime.datetime.fromtimestamp(int(text))
+    except (ValueError, OverflowError, OSError):
+      raise ValueError("time data " + repr(text) + " does not match format '%s'") from None
+
+  def EncodeEpoch(self, dateandtime):
+    return str(int(dateandtime.timestamp()))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Query a Scheduler Daemon
+# Written in 2026 by 伴上段
+#
+# To the extent possible under law, the author(s) have dedicated all copyright
+# and related and neighboring rights to this software to the public domain
+# worldwide. This software is distributed without any warranty.
+#
+# You should have received a copy of the CC0 Public Domain Dedication along
+# with this software. If not, see
+# <http://creativecommons.org/publicdomain/zero/1.0/>.
+
+from argparse import *
+import json
+import socket
+from sys import *
+
+parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Send a request to a scheduler daemon (osm2 -S or oleitner -S) via the
+  specified Unix domain socket and print its response.
+
+  Daemons keep their decks and logs in memory and replay only the records
+  appended to their logs since their last requests, so queries are answered
+  without rereading the deck and the log.  By default, this program selects
+  lines like the scheduler would.
+
+output:
+
+  This program writes the daemon's output on standard output in the format of
+  the scheduler's corresponding options.  If the daemon reports an error, then
+  its message is written on standard error and this program exits with the
+  daemon's exit status.""", epilog="""examples:
+
+  $ osm2 -S /tmp/oboeta.sock -i flashcards.txt flashcards.log &
+  $ oboetaq /tmp/oboeta.sock
+
+    Start a daemon for flashcards.txt and flashcards.log and select at most 10
+    old lines and at most 4 new lines from it.
+
+  $ oboetaq -a /tmp/oboeta.sock
+
+    Dump all of the deck's lines and their states.
+
+  $ oboetaq -i 42 -i 43 /tmp/oboeta.sock
+
+    Dump the states of the lines with IDs 42 and 43.""")
+parser.add_argument("-n", "--num-old-lines", type=int, default=10, dest="num", help="the maximum number of old lines to select (default: 10)")
+parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of new lines to select (default: 4)")
+parser.add_argument("-r", "--seed", type=int, default=None, help="the random number generator's seed, which makes selections reproducible")
+parser.add_argument("-p", "--priority", default="random", choices=("random", "overdue", "weighted"), help="how to select old lines (see the schedulers' -p options, default: random)")
+group = parser.add_mutually_exclusive_group()
+group.add_argument("-a", "--show-all", default=False, action="store_true", help="dump all of the deck's lines and their states (like osm2 -a and oleitner -b)")
+group.add_argument("-i", "--id", action="append", default=None, dest="ids", help="dump the state of the line with the specified ID (may be repeated)")
+group.add_argument("-d", "--due-by", default=None, metavar="DATE", help="print the IDs and due dates of the lines that are due by DATE or by now if DATE is \"now\"")
+parser.add_argument("-c", "--count", default=False, action="store_true", help="like -d, but print the number of due lines instead (due by now unless -d is given)")
+parser.add_argument("socket", help="the daemon's Unix domain socket")
+
+args = parser.parse_args()
+if args.num < 0:
+  stderr.write("negative number of old lines\n")
+  exit(1)
+if args.new < 0:
+  stderr.write("negative number of new lines\n")
+  exit(1)
+
+if args.due_by is not None or args.count:
+  request = {"command": "due", "due_by": args.due_by or "now", "count": args.count}
+elif args.show_all:
+  request = {"command": "all"}
+elif args.ids is not None:
+  request = {"command": "lines", "ids": args.ids}
+else:
+  request = {"command": "select", "num": args.num, "new": args.new, "seed": args.seed, "priority": args.priority}
+
+# Responses consist of a status line followed by the daemon's output.
+try:
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+    connection.connect(args.socket)
+    connection.sendall(json.dumps(request).encode("UTF-8") + b"\n")
+    connection.shutdown(socket.SHUT_WR)
+    with connection.makefile('rb') as response:
+      status = int(response.readline())
+      payload = response.read()
+except (OSError, ValueError) as e:
+  stderr.write(args.socket + ": " + str(e) + "\n")
+  exit(1)
+(stdout if status == 0 else stderr).buffer.write(payload)
+exit(status)
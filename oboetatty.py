@@ -18,7 +18,64 @@ from csv import *
 from os.path import *
 from sys import *
 
-parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Review lines from the specified source file as though they were flashcards.
+# Review the cards read from cardsource (a path or a text file), writing the
+# results to commandfile (likewise).  Both are closed afterwards.
+def Main(cardsource, commandfile, field_sep, use_sm2):
+  ret = 0
+  if isinstance(cardsource, str) and not exists(cardsource):
+    stderr.write("card source (pipe?) does not exist: " + cardsource + "\n")
+    ret = 1
+  if isinstance(commandfile, str) and not exists(commandfile):
+    stderr.write("command file (pipe?) does not exist: " + commandfile + "\n")
+    ret = 1
+  if ret:
+    return ret
+
+  front = None
+  input_prompt = "Correct [" + "/".join(str(v) for v in (range(sm2_num_responses) if use_sm2 else "Yn")) + "]? "
+  sm2_values = "".join(str(v) for v in range(sm2_num_responses))
+  with (open(cardsource, 'r') if isinstance(cardsource, str) else cardsource) as cardf:
+    with (open(commandfile, 'w') if isinstance(commandfile, str) else commandfile) as commandf:
+      try:
+        for card in reader(cardf, delimiter=field_sep):
+          if front is None:
+            front = card
+            continue
+          stdout.write("\n" + "\n".join(front))
+          front = None
+          input("\nPress \"Enter\" to see the answer.")
+          stdout.write("\n" + "\n".join(card))
+          while True:
+            answer = input(input_prompt).lower().strip()
+            if answer == "q" or answer == "quit":
+              commandf.write("q\n")
+              commandf.flush()
+              return 0
+            elif use_sm2:
+              if answer in sm2_values:
+                commandf.write(answer + "\n")
+                commandf.flush()
+                break
+            else:
+              if answer == "y" or answer == "yes" or answer == "":
+                commandf.write("+\n")
+                commandf.flush()
+                break
+              elif answer == "n" or answer == "no":
+                commandf.write("-\n")
+                commandf.flush()
+                break
+            stdout.write("Please enter one of the choices (or 'q' to quit).")
+      except EOFError:
+        stdout.write("\nFinishing early")
+        commandf.write("q\n")
+      except KeyboardInterrupt:
+        stdout.write("\nFinishing early")
+        commandf.write("q\n")
+  return 0
+
+if __name__ == "__main__":
+  parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Review lines from the specified source file as though they were flashcards.
   This program serves flashcards on the localhost via HTTP: You should
   review the cards through a web browser (http://localhost:<port>).
 
@@ -49,61 +106,10 @@ output:
   the user must enter an integer in the range [0,5], where 0 means total memory
   blackout and 5 means "Piece of cake!"  In any case, entering Q terminates the
   quiz.  Responses are case-insensitive.""")
-parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
-parser.add_argument("cardsource", help="a file (usually a named pipe) from which cards are read")
-parser.add_argument("commandfile", help="a file (usually a named pipe) to which user results will be written")
-parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm instead of the Leitner system")
-
-args = parser.parse_args()
-ret = 0
-if not exists(args.cardsource):
-  stderr.write("command file (pipe?) does not exist: " + args.commandfile + "\n")
-  ret = 1
-if not exists(args.commandfile):
-  stderr.write("command file (pipe?) does not exist: " + args.commandfile + "\n")
-  ret = 1
-if ret:
-  exit(ret)
-
-front = None
-input_prompt = "Correct [" + "/".join(str(v) for v in (range(sm2_num_responses) if args.use_sm2 else "Yn")) + "]? "
-sm2_values = "".join(str(v) for v in range(sm2_num_responses))
-with open(args.cardsource, 'r') as cardsource:
-  with open(args.commandfile, 'w') as commandf:
-    try:
-      for card in reader(cardsource, delimiter=args.field_sep):
-        if front is None:
-          front = card
-          continue
-        stdout.write("\n" + "\n".join(front))
-        front = None
-        input("\nPress \"Enter\" to see the answer.")
-        stdout.write("\n" + "\n".join(card))
-        while True:
-          answer = input(input_prompt).lower().strip()
-          if answer == "q" or answer == "quit":
-            commandf.write("q\n")
-            commandf.flush()
-            exit(0)
-          elif args.use_sm2:
-            if answer in sm2_values:
-              commandf.write(answer + "\n")
-              commandf.flush()
-              break
-          else:
-            if answer == "y" or answer == "yes" or answer == "":
-              commandf.write("+\n")
-              commandf.flush()
-              break
-            elif answer == "n" or answer == "no":
-              commandf.write("-\n")
-              commandf.flush()
-              break
-          stdout.write("Please enter one of the choices (or 'q' to quit).")
-    except EOFError:
-      stdout.write("\nFinishing early")
-      commandf.write("q\n")
-    except KeyboardInterrupt:
-      stdout.write("\nFinishing early")
-      commandf.write("q\n")
+  parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
+  parser.add_argument("cardsource", help="a file (usually a named pipe) from which cards are read")
+  parser.add_argument("commandfile", help="a file (usually a named pipe) to which user results will be written")
+  parser.add_argument("-2", "--use-sm2", default=False, action="store_true", help="use the SM-2 algorithm instead of the Leitner system")
 
+  args = parser.parse_args()
+  exit(Main(args.cardsource, args.commandfile, args.field_sep, args.use_sm2))
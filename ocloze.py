@@ -12,9 +12,14 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 from argparse import *
+import collections
+import csv
 import hashlib
-from io import *
+import multiprocessing
+import os
+import re
 from sys import *
+import oboetalib
 
 parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Generate cloze deletions from standard input's lines.
 
@@ -42,7 +47,9 @@ formatting:
   a single flashcard.  Flashcards cannot be split across multiple lines.  Cloze
   deletions are delimited by matching pairs of curly braces ('{' and '}').
   Cloze deletions may nest.  Curly braces can be escaped with
-  single backslashes (\\).  Lines lacking curly braces are ignored.
+  single backslashes (\\), as can backslashes themselves (\\\\ is a single
+  backslash).  Other backslashes are copied as they are.  Lines lacking
+  clozes are ignored.
 
   NOTE: This program treats lines from standard input as lines: It doesn't
   interpret them in any special way.  Thus it's possible to make cloze deletions
@@ -64,71 +71,221 @@ output:
   generated cards, but choosing a hash function with a large digest (e.g.,
   SHA-256) will make such collisions extremely improbable.  Paranoid users
   can use other programs (such as a combination of sort(1), cut(1), and uniq(1))
-  to detect duplicates.""")
+  to detect duplicates.
+
+incremental generation:
+
+  -x DECK makes this program skip cards whose IDs are already in DECK (a deck
+  generated by this program), so that sources can be run through it again
+  after they grow.  The deck's IDs are cached (see oboeta's deck cache).
+
+  -w FILE makes this program remember how much of standard input (which must
+  be a file) it processed in FILE and start after that point the next time
+  that it's run with FILE, so that only lines appended to standard input since
+  then are processed.  (An incomplete last line, which might still be being
+  written, is skipped until its newline arrives.)  If the processed part of
+  standard input changes, then it's processed again from the start.""")
 parser.add_argument("-e", "--elision-text", default="(...)", help="the text that replaces clozed sections (default: (...))")
 parser.add_argument("-f", "--hash-func", default="sha256", help="the Python hashlib hash function to use to generate cloze card IDs (default: sha256)")
 parser.add_argument("-s", "--field-sep", default="\t", help="the output CSV field separator (default: \\t)")
+parser.add_argument("-j", "--jobs", type=int, default=1, help="the number of processes that generate cloze deletions in parallel (default: 1)")
+parser.add_argument("-x", "--existing", default=None, metavar="DECK", help="skip cards whose IDs are in DECK")
+parser.add_argument("-w", "--watermark", default=None, metavar="FILE", help="process only the lines that were appended to standard input since the last run with FILE")
+parser.add_argument("-b", "--buffered", default=False, action="store_true", help="don't flush standard output after each line's cloze deletions (or with -j, after each chunk's)")
+oboetalib.AddStatsOptions(parser)
 
 args = parser.parse_args()
+stats = oboetalib.TStats(args.stats)
 
 if args.hash_func not in hashlib.__dict__:
   stderr.write("unrecognized hash function: " + args.hash_func + "\n")
   exit(1)
 hash_class = hashlib.__dict__[args.hash_func]
+if args.jobs < 1:
+  stderr.write("nonpositive number of jobs\n")
+  exit(1)
+
+# The IDs of the cards that aren't generated
+existing = frozenset()
+if args.existing is not None:
+  try:
+    with stats.Phase("index", "IDs") as phase:
+      deck = oboetalib.LoadDeck(args.existing, args.field_sep, with_fields=False)
+      if deck is None:
+        existing = frozenset(fields[0] for fields in oboetalib.ReadDeck(args.existing, args.field_sep))
+      else:
+        existing = frozenset(deck[0])
+      phase.items = len(existing)
+    stats.Count("existing IDs", len(existing))
+  except (OSError, csv.Error) as e:
+    stderr.write("can't read the existing deck: " + str(e) + "\n")
+    exit(1)
+
+# Watermarks are CSV files containing a single row: watermark_magic, the
+# parameters that affect the generated cards, and the offset, line number, and
+# fingerprint (see oboetalib.LogFingerprint()) of the end of the processed
+# part of standard input.
+watermark_magic = "ocloze-watermark-1"
+watermark_params = [args.hash_func, args.elision_text]
+
+# Return the offset and line number at which processing should resume.
+def LoadWatermark(path, binary):
+  try:
+    with open(path, 'r', newline="") as watermarkf:
+      row = next(csv.reader(watermarkf, delimiter=args.field_sep), None)
+    if row is None or row[0] != watermark_magic or row[1:-3] != watermark_params:
+      return 0, 0
+    offset, lineno = int(row[-3]), int(row[-2])
+    if os.fstat(binary.fileno()).st_size < offset or oboetalib.LogFingerprint(binary, offset) != row[-1]:
+      return 0, 0
+    return offset, lineno
+  except (OSError, ValueError, csv.Error):
+    return 0, 0
+
+# Save the watermark atomically.
+def SaveWatermark(path, binary, offset, lineno):
+  fingerprint = oboetalib.LogFingerprint(binary, offset)
+  tmppath = path + ".tmp"
+  with open(tmppath, 'w', newline="") as watermarkf:
+    csv.writer(watermarkf, delimiter=args.field_sep).writerow([watermark_magic] + watermark_params + [str(offset), str(lineno), fingerprint])
+  os.replace(tmppath, path)
+
+start = lineno = 0
+if args.watermark is not None:
+  if not stdin.buffer.seekable():
+    stderr.write("-w requires standard input to be a file\n")
+    exit(1)
+  start, lineno = LoadWatermark(args.watermark, stdin.buffer)
+  stdin.buffer.seek(start)
+  stats.Count("lines before the watermark", lineno)
+
+# Cloze deletions' delimiters and escape sequences (backslashes followed by
+# curly braces or backslashes)
+tokens = re.compile(r"\\[\\{}]|[{}]")
+
+class TClozeError(Exception):
+
+  def __init__(self, col, message):
+    self.col = col
+    super().__init__(message)
+
+# Split a line into its text (without the clozes' delimiters and with escape
+# sequences replaced by the characters that they escape) and the spans of its
+# clozes within the text as [start, end] lists (in the order in which the
+# clozes open) in a single pass.
+def Tokenize(line):
+  pieces = []
+  spans = []
+  opened = []
+  pos = length = 0
+  for token in tokens.finditer(line):
+    start = token.start()
+    if start > pos:
+      pieces.append(line[pos:start])
+      length += start - pos
+    symbol = token.group()
+    if symbol == '{':
+      opened.append(len(spans))
+      spans.append([length, length])
+    elif symbol == '}':
+      if not opened:
+        raise TClozeError(start + 1, "cloze termination symbol found outside cloze")
+      spans[opened.pop()][1] = length
+    else:
+      pieces.append(symbol[1])
+      length += 1
+    pos = token.end()
+  if opened:
+    raise TClozeError(len(line), str(len(opened)) + " clozes not closed")
+  pieces.append(line[pos:].replace("\n", ""))
+  return "".join(pieces), spans
+
+# Return the output lines for a line's clozes.  Each one is assembled from
+# slices of the line's text.
+def ClozeLines(line):
+  text, spans = Tokenize(line)
+  lines = []
+  for start, end in spans:
+    masked = text[:start] + args.elision_text + text[end:]
+    myid = hash_class(masked.encode("UTF-8")).hexdigest()
+    if myid not in existing:
+      lines.append(myid + args.field_sep + masked + args.field_sep + text[start:end] + "\n")
+  return lines
+
+# Return the encoded output lines for a chunk of lines (the first of which is
+# line number lineno) up to the first malformed line and a (lineno, col,
+# message) tuple describing the malformed line (or None).
+def ClozeChunk(lineno, lines):
+  clozes = []
+  for lineno, line in enumerate(lines, start=lineno):
+    if '{' not in line and '}' not in line:
+      continue
+    try:
+      clozes += ClozeLines(line)
+    except TClozeError as e:
+      return "".join(clozes).encode(stdout.encoding, stdout.errors), (lineno, e.col, str(e))
+  return "".join(clozes).encode(stdout.encoding, stdout.errors), None
+
+def ReportError(lineno, col, message):
+  stderr.write(str(lineno) + ":" + str(col) + ": " + message + "\n")
+  exit(2)
+
+line = ""
+first_lineno = lineno
+cards = 0
+with stats.Phase("generate", "lines", hot=True) as phase:
+  if args.jobs == 1:
+    for lineno, line in enumerate(stdin, start=lineno + 1):
+      # With -w, an incomplete last line is left for the next run.
+      if args.watermark is not None and not line.endswith("\n"):
+        break
+      if '{' not in line and '}' not in line:
+        continue
+      try:
+        clozes = ClozeLines(line)
+      except TClozeError as e:
+        ReportError(lineno, e.col, str(e))
+      stdout.write("".join(clozes))
+      cards += len(clozes)
+      if not args.buffered:
+        stdout.flush()
+  else:
+    # Read standard input in chunks of lines, generate their cloze deletions
+    # in forked worker processes, and write the results in input order.  Only
+    # a couple of chunks per worker are read ahead of the writer, so big
+    # corpora don't have to fit in memory.
+    with multiprocessing.get_context("fork").Pool(args.jobs) as pool:
+      pending = collections.deque()
+      while True:
+        lines = stdin.readlines(1 << 18)
+        if lines:
+          complete = (lines[:-1] if args.watermark is not None and not lines[-1].endswith("\n") else lines)
+          pending.append(pool.apply_async(ClozeChunk, (lineno + 1, complete)))
+          lineno += len(lines)
+          line = lines[-1]
+        while pending and (not lines or len(pending) > args.jobs * 2):
+          clozes, error = pending.popleft().get()
+          stdout.buffer.write(clozes)
+          cards += clozes.count(b"\n")
+          if error is not None:
+            stdout.buffer.flush()
+            ReportError(*error)
+          if not args.buffered:
+            stdout.buffer.flush()
+        if not lines:
+          break
+  phase.items = lineno - first_lineno
+stats.Count("lines", phase.items)
+stats.Count("cards", cards)
 
-for lineno, line in enumerate(stdin, start=1):
-  cloze_num = 0
-  components = []   # list of strings, integers (cloze opening markers), and None values (cloze ending markers)
-  clozes = []       # list of clozes in any order
-  textbuf = StringIO()
-  for col, c in enumerate(line, start=1):
-    if c == '{':
-      val = textbuf.getvalue()
-      if val:
-        textbuf = StringIO()
-        components.append(val)
-      cloze = len(clozes) + 1
-      cloze_num += 1
-      components.append(cloze)
-      clozes.append(cloze)
-    elif c == '}':
-      if cloze_num == 0:
-        stderr.write(str(lineno) + ":" + str(col) + ": cloze termination symbol found outside cloze\n")
-        exit(2)
-      val = textbuf.getvalue()
-      if val:
-        textbuf = StringIO()
-        components.append(val)
-      components.append(None)
-      cloze_num -= 1
-    elif c != '\n':
-      textbuf.write(c)
-  if cloze_num != 0:
-    stderr.write(str(lineno) + ":" + str(col) + ": " + str(cloze_num) + " clozes not closed\n")
-    exit(2)
-  if clozes:
-    textbuf = textbuf.getvalue()
-    if textbuf:
-      components.append(textbuf)
-    for masked_cloze in clozes:
-      textbuf = StringIO()
-      clozebuf = StringIO()
-      for component in components:
-        if cloze_num:
-          if isinstance(component, int):
-            cloze_num += 1
-          elif component is None:
-            cloze_num -= 1
-          else:
-            clozebuf.write(component)
-        elif component is masked_cloze:
-          cloze_num = 1
-          textbuf.write(args.elision_text)
-        elif isinstance(component, str):
-          textbuf.write(component)
-      textbuf = textbuf.getvalue()
-      hasher = hash_class()
-      hasher.update(bytes(textbuf, encoding="UTF-8"))
-      stdout.write(hasher.hexdigest() + args.field_sep + textbuf + args.field_sep + clozebuf.getvalue() + "\n")
-      stdout.flush()
+if args.watermark is not None:
+  # Save the watermark before an incomplete last line (which wasn't
+  # processed).
+  end = stdin.buffer.tell()
+  if line and not line.endswith("\n"):
+    end -= len(line.encode(stdin.encoding, stdin.errors))
+    lineno -= 1
+  stdout.flush()
+  SaveWatermark(args.watermark, stdin.buffer, end, lineno)
 
+stats.Write()
@@ -12,28 +12,7 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import argparse, csv, datetime, itertools, os.path, random, sys
-
-class TRandomSelector(object):
-
-  def __init__(self, capacity):
-    self.capacity = int(capacity)
-    self.sample = []
-    self.counter = 0
-    if not self.capacity:
-      self.Add = (lambda me: None)
-
-  def __iter__(self):
-    for selected in self.sample:
-      yield selected
-
-  def Add(self, o):
-    self.counter += 1
-    if self.counter <= self.capacity:
-      self.sample.append(o)
-    else:
-      tag = random.randint(0, self.counter)
-      if tag < self.capacity:
-        self.sample[tag] = o
+import oboetalib
 
 class TBucket(object):
 
@@ -47,35 +26,274 @@ class TBucket(object):
     self.time_offset = time_offset
     super().__init__()
 
-  def Add(self, line, dateandtime):
-    line.date = dateandtime + self.time_offset
+  def Add(self, lines, line, ticks):
+    lines.bucket[line] = self.id
+    lines.date[line] = ticks + self.time_offset
     self.size += 1
 
   def RemoveOne(self):
     self.size -= 1
 
-class TLine(object):
-
-  __slots__ = ("id", "date", "bucket", "fields")
-
-  def __init__(self, myid, dateandtime, bucket, fields=None):
-    self.id = myid
-    self.date = dateandtime
-    self.bucket = bucket
-    self.fields = fields
+# The lines' states: Each line has a bucket ID (-1 for lines without log
+# records) and a due date in ticks (see oboetalib.DateToTicks()).  Bucket IDs
+# are stored as signed bytes, so there can be at most 127 buckets.
+class TLines(oboetalib.TCardStore):
+
+  max_buckets = 127
+
+  def __init__(self, buckets):
+    self.buckets = buckets
+    super().__init__(bucket=("b", -1), date=("q", 0))
+
+  def Demote(self, line, ticks):
+    bucket = self.buckets[self.bucket[line]]
+    bucket.RemoveOne()
+    bucket.first.Add(self, line, ticks)
+
+  def Promote(self, line, ticks):
+    bucket = self.buckets[self.bucket[line]]
+    bucket.RemoveOne()
+    bucket.next.Add(self, line, ticks)
+
+# The scheduler: the lines and their progress through the buckets.  Main()
+# loads a log and a deck into a TScheduler once, but daemons (see
+# oboetalib.Serve()) keep one around and feed it changes to the deck and the
+# log.  The lines are kept in the order in which Main() adds them: lines with
+# log records in the order of their first records, then the deck's other lines
+# in the deck's order.  (Daemons read the deck before the log, so they renumber
+# the lines afterwards to restore that order.)
+class TScheduler(object):
+
+  def __init__(self, bucketdelays, logfile, field_sep, date_format, checkpoint=None, jobs=1):
+    # Create the list of buckets from the client-specified delays.
+    bucket = TBucket(0, None, None, 0)
+    self.first_bucket = bucket
+    bucket.next = bucket
+    bucket.first = bucket
+    self.buckets = [bucket]
+    for bucket_id, delay in enumerate(bucketdelays, start=1):
+      bucket.next = TBucket(bucket_id, self.first_bucket, None, delay * oboetalib.day_ticks)
+      bucket = bucket.next
+      bucket.next = bucket
+      self.buckets.append(bucket)
+    self.lines = TLines(self.buckets)
+    self.logfile = logfile
+    self.field_sep = field_sep
+    self.date_codec = oboetalib.TDateFormat(date_format)
+    self.params = ("leitner", date_format, " ".join(str(delay) for delay in bucketdelays))
+    self.checkpoint = checkpoint
+    self.jobs = jobs
+    self.offset = 0
+    self.lineno = 0
+    self.replayed = False
+
+    # While there are lines without log records, the lines that get their
+    # first records are appended to appeared so that Replay() can renumber
+    # them.
+    self.track_appearances = False
+    self.appeared = []
     super().__init__()
 
-  def Demote(self, dateandtime):
-    self.bucket.RemoveOne()
-    self.bucket = self.bucket.first
-    self.bucket.Add(self, dateandtime)
-
-  def Promote(self, dateandtime):
-    self.bucket.RemoveOne()
-    self.bucket = self.bucket.next
-    self.bucket.Add(self, dateandtime)
+  def Close(self):
+    pass
+
+  # Renumber the lines so that the line numbered i becomes order[i]'s line.
+  # Lines missing from order are dropped.
+  def Renumber(self, order):
+    if len(order) != len(self.lines) or any(line != new_line for new_line, line in enumerate(order)):
+      self.lines.Reorder(order)
+
+  # Process the lines from the deck, replacing the lines from the previous
+  # deck (if any).  Match each line with its record in the lines store (if
+  # such a record exists).  Lines lacking log entries are marked as "new" by
+  # leaving their bucket IDs at -1.
+  def ReadDeck(self, deckfile):
+    lines = self.lines
+    now = oboetalib.DateToTicks(datetime.datetime.now())
+    for line in list(lines.DeckLines()):
+      lines.fields[line] = None
+    order = []
+    for fields in oboetalib.ReadDeck(deckfile, self.field_sep):
+      line = lines.index.get(fields[0], None)
+      if line is None:
+        line = lines.Add(fields[0])
+        lines.date[line] = now
+      if lines.fields[line] is None and lines.bucket[line] < 0:
+        order.append(line)
+      lines.fields[line] = fields
+    self.Renumber([line for line in range(len(lines)) if lines.bucket[line] >= 0] + order)
+    self.track_appearances = (len(order) != 0)
+
+  # GetLine() returns the number of the line with the specified ID, adding it
+  # if necessary, for a log record.  Lines without log records are moved into
+  # the first bucket.
+  def GetLine(self, myid):
+    lines = self.lines
+    line = lines.index.get(myid, None)
+    if line is None:
+      line = lines.Add(myid)
+    elif lines.bucket[line] >= 0:
+      return line
+    lines.bucket[line] = self.first_bucket.id
+    if self.track_appearances:
+      self.appeared.append(line)
+    return line
+
+  # SetLine() makes the line with the specified ID (adding it if necessary)
+  # belong to the specified bucket with the specified due date.  It restores
+  # lines from checkpoints and from parallel replays.
+  def SetLine(self, myid, bucket_id, ticks):
+    line = self.lines.index.get(myid, None)
+    if line is not None and self.lines.bucket[line] >= 0:
+      self.buckets[self.lines.bucket[line]].RemoveOne()
+    else:
+      line = self.GetLine(myid)
+    bucket = self.buckets[bucket_id]
+    bucket.Add(self.lines, line, ticks - bucket.time_offset)
+
+  # Checkpoint rows contain the lines' numbers so that LoadCheckpoint()'s rows,
+  # which are sorted by due date, can be put back in the lines' order.
+  def CheckpointRows(self):
+    lines = self.lines
+    return ((lines.ids[line], str(lines.bucket[line]), str(line), str(lines.date[line])) for line in range(len(lines)) if lines.bucket[line] >= 0)
+
+  # Decode a log record into a tuple containing its ID, date (in ticks), and
+  # whether it represents a pass.
+  def DecodeRecord(self, fields):
+    if len(fields) != 3:
+      raise oboetalib.TLogError("invalid number of fields: " + str(len(fields)))
+    myid, timestamp, mutation = fields
+    try:
+      ticks = self.date_codec.ParseTicks(timestamp)
+    except ValueError as e:
+      raise oboetalib.TLogError("invalid date format: " + str(e))
+    if mutation == b'+':
+      return myid.decode("UTF-8"), ticks, True
+    elif mutation == b'-':
+      return myid.decode("UTF-8"), ticks, False
+    raise oboetalib.TLogError("invalid mutation in third field: must be + or -")
+
+  # Replay one line's records (a worker does this during parallel replays).
+  def ReplayLine(self, myid, records):
+    line = self.GetLine(myid)
+    for ticks, passed in records:
+      if passed:
+        self.lines.Promote(line, ticks)
+      else:
+        self.lines.Demote(line, ticks)
+    return self.lines.bucket[line], self.lines.date[line]
+
+  # Replay the log records that haven't been replayed yet, adding a line for
+  # each new unique ID encountered and tracking its progress as it hops across
+  # buckets.  The first replay restores the lines saved in the checkpoint (if
+  # any) so that only log records appended since the checkpoint was written
+  # need to be replayed, and if there are multiple jobs, then most of the log
+  # is replayed in parallel.  If complete_only is True, then a trailing,
+  # partially-written line isn't replayed.  Raises oboetalib.TLogError (with
+  # lineno set) for malformed records.
+  def Replay(self, complete_only=False):
+    offset, lineno = self.offset, self.lineno
+    try:
+      if not self.replayed:
+        self.replayed = True
+        if self.checkpoint is not None:
+          offset, lineno, rows = oboetalib.LoadCheckpoint(self.checkpoint, self.logfile, self.field_sep, self.params)
+          for myid, bucket_id, _, ticks in sorted(rows, key=lambda row: int(row[2])):
+            self.SetLine(myid, int(bucket_id), int(ticks))
+          self.offset = offset
+        if self.jobs > 1:
+          offset, lineno, order, states = oboetalib.ReplayLogInParallel(self.logfile, self.field_sep, offset, lineno, self.jobs, self.DecodeRecord, self.ReplayLine)
+          for myid in order:
+            self.SetLine(myid, *states[myid])
+
+      # Save a checkpoint after the last complete record if anything new was
+      # replayed.
+      checkpoint_offset = self.offset
+      def OnComplete(end, end_lineno):
+        self.RenumberAppearances()
+        if self.checkpoint is not None and end != checkpoint_offset:
+          oboetalib.SaveCheckpoint(self.checkpoint, self.logfile, self.field_sep, self.params, end, end_lineno, self.CheckpointRows())
+        self.offset, self.lineno = end, end_lineno
+      lines = self.lines
+      for first_lineno, records in oboetalib.ScanLog(self.logfile, self.field_sep, offset, lineno, OnComplete, complete_only):
+        for lineno, fields in enumerate(records, start=first_lineno):
+          try:
+            myid, ticks, passed = self.DecodeRecord(fields)
+          except oboetalib.TLogError as e:
+            e.lineno = lineno
+            raise
+          line = lines.index.get(myid, None)
+          if line is None or lines.bucket[line] < 0:
+            line = self.GetLine(myid)
+          if passed:
+            lines.Promote(line, ticks)
+          else:
+            lines.Demote(line, ticks)
+    finally:
+      self.RenumberAppearances()
+
+  # Renumber the lines in appeared, which just got their first log records, so
+  # that they follow the other lines with log records.
+  def RenumberAppearances(self):
+    lines = self.lines
+    appeared, self.appeared = self.appeared, []
+    if appeared:
+      new_lines = set(appeared)
+      self.Renumber([line for line in range(len(lines)) if lines.bucket[line] >= 0 and line not in new_lines] + appeared + [line for line in range(len(lines)) if lines.bucket[line] < 0])
+
+  # Write all of the deck's lines to output with their bucket numbers prefixed
+  # to them.
+  def WriteAll(self, output):
+    lines = self.lines
+    for line in lines.DeckLines():
+      output.write(self.field_sep.join(itertools.chain((str(lines.bucket[line]),), lines.fields[line])) + "\n")
+
+  # Write the deck's lines with the specified IDs to output like WriteAll().
+  def WriteLines(self, output, ids):
+    lines = self.lines
+    for myid in ids:
+      line = lines.index.get(myid, None)
+      if line is not None and lines.fields[line] is not None:
+        output.write(self.field_sep.join(itertools.chain((str(lines.bucket[line]),), lines.fields[line])) + "\n")
+
+  # Select due lines that have already been reviewed (i.e., lines with records
+  # in the log file) according to priority (see oboetalib.selector_modes) and
+  # randomly select new lines (lines lacking such records).  Combine the
+  # results and write them to output.  The selection and the output are
+  # timed as separate phases of stats (an oboetalib.TStats).
+  def WriteSelection(self, output, num, new, seed=None, priority="random", stats=None):
+    stats = (oboetalib.TStats() if stats is None else stats)
+    lines = self.lines
+    now = oboetalib.DateToTicks(datetime.datetime.now())
+    rng = random.Random(seed)
+    due_selector, new_selector = oboetalib.NewSelector(priority, num, rng), oboetalib.TRandomSelector(new, rng)
+    with stats.Phase("select", "deck lines") as select_phase:
+      for line in lines.DeckLines():
+        if lines.date[line] <= now:
+          if lines.bucket[line] >= 0:
+            due_selector.Add(line, now - lines.date[line])
+          else:
+            new_selector.Add(line)
+      selection = list(itertools.chain(due_selector, new_selector))
+    with stats.Phase("write", "lines") as phase:
+      for line in selection:
+        output.write(self.field_sep.join(lines.fields[line]) + "\n")
+      phase.items = len(selection)
+    if stats.enabled:
+      due = [line for line in lines.DeckLines() if lines.date[line] <= now]
+      select_phase.items = sum(1 for line in lines.DeckLines())
+      stats.Count("due", sum(1 for line in due if lines.bucket[line] >= 0))
+      stats.Count("new", sum(1 for line in due if lines.bucket[line] < 0))
+      stats.Count("selected", len(selection))
+
+  # Write the IDs and due dates of the lines with log records that are due by
+  # the specified ticks (or their number if count is True) to output.
+  def WriteDue(self, output, due_ticks, count):
+    oboetalib.WriteDueRows(output, oboetalib.SelectDueRows(self.CheckpointRows(), due_ticks), count, self.date_codec, self.field_sep)
+
+def Main(output, num, new, bucketdelays, logfile, deckfile, field_sep, date_format, show_buckets, checkpoint=None, jobs=1, due_by=None, count=False, seed=None, priority="random", serve=None, poll=1.0, stats=None):
+  stats = (oboetalib.TStats() if stats is None else stats)
 
-def Main(output, num, new, bucketdelays, logfile, deckfile, field_sep, date_format, show_buckets):
   # Check arguments for illegal values.
   ret = 0
   if num < 0:
@@ -90,75 +308,68 @@ def Main(output, num, new, bucketdelays, logfile, deckfile, field_sep, date_form
   if not os.path.exists(logfile):
     sys.stderr.write("The log " + logfile + " does not exist.\n")
     ret = 2
+  if jobs < 1:
+    sys.stderr.write("The number of jobs must be positive.\n")
+    ret = 2
   if any(bucket <= 0 for bucket in bucketdelays):
     sys.stderr.write("Zero and negative bucket delays are not allowed.\n")
     ret = 2
+  if len(bucketdelays) >= TLines.max_buckets:
+    sys.stderr.write("There can be at most " + str(TLines.max_buckets - 1) + " bucket delays.\n")
+    ret = 2
+  if (due_by is not None or count) and checkpoint is None:
+    sys.stderr.write("-d and -c require a checkpoint (-k).\n")
+    ret = 2
   if ret != 0:
     return ret
-
-  # Create the list of buckets from the client-specified delays.
-  bucket = TBucket(0, None, None, datetime.timedelta(days=0))
-  first_bucket = bucket
-  bucket.next = bucket
-  bucket.first = bucket
-  for bucket_id, delay in enumerate(bucketdelays, start=1):
-    bucket.next = TBucket(bucket_id, first_bucket, None, datetime.timedelta(days=delay))
-    bucket = bucket.next
-    bucket.next = bucket
-
-  # Process the log file.  Create a TLine for each new unique ID encountered
-  # and track its progress as it hops across buckets.
-  lines = {}
-  with open(logfile, 'r') as logf:
-    for lineno, fields in enumerate(csv.reader(logf, delimiter=field_sep)):
-      if len(fields) != 3:
-        sys.stderr.write(logfile + ":" + str(lineno) + ": invalid number of fields: " + str(len(fields)) + "\n")
-        return 3
-      try:
-        date_time = datetime.datetime.strptime(fields[1], date_format)
-      except ValueError as e:
-        sys.stderr.write(logfile + ":" + str(lineno) + ": invalid date format: " + str(e) + "\n")
-        return 3
-      entry = lines.get(fields[0], None)
-      if entry is None:
-        entry = TLine(fields[0], None, first_bucket)
-        lines[fields[0]] = entry 
-      if fields[2] == '+':
-        entry.Promote(date_time)
-      elif fields[2] == '-':
-        entry.Demote(date_time)
-      else:
-        sys.stderr.write(logfile + ":" + str(lineno) + ": invalid mutation in third field: must be + or -\n")
-        return 3
-
-  # Process the lines from the deck.  Match each line with its record in the
-  # lines dictionary (if such a record exists).  Lines lacking log entries are
-  # marked as "new" by setting their buckets to None.
-  now = datetime.datetime.now()
-  with open(deckfile, 'r') as deckf:
-    for lineno, fields in enumerate(csv.reader(deckf, delimiter=field_sep)):
-      if len(fields) == 0:
-        continue
-      if fields[0] not in lines:
-        lines[fields[0]] = TLine(fields[0], now, None, fields)
-      else:
-        lines[fields[0]].fields = fields
+  if serve is not None:
+    return oboetalib.Serve(serve, lambda: TScheduler(bucketdelays, logfile, field_sep, date_format, checkpoint, jobs), deckfile, logfile, poll)
+
+  # Answer due-date queries from the checkpoint if it's up to date.  Otherwise
+  # the log is replayed as usual (which updates the checkpoint) and the query
+  # is answered afterwards.
+  scheduler = TScheduler(bucketdelays, logfile, field_sep, date_format, checkpoint, jobs)
+  if count and due_by is None:
+    due_by = "now"
+  if due_by is not None:
+    try:
+      due_ticks = (oboetalib.DateToTicks(datetime.datetime.now()) if due_by == "now" else scheduler.date_codec.ParseTicks(due_by))
+    except ValueError as e:
+      sys.stderr.write("Invalid due date: " + str(e) + "\n")
+      return 2
+    rows = oboetalib.DueRows(checkpoint, logfile, field_sep, scheduler.params, due_ticks)
+    if rows is not None:
+      oboetalib.WriteDueRows(output, rows, count, scheduler.date_codec, field_sep)
+      return 0
+
+  # Process the log file, then the deck.
+  try:
+    with stats.Phase("replay", "log records", hot=True) as phase:
+      lineno = scheduler.lineno
+      scheduler.Replay()
+      phase.items = scheduler.lineno - lineno
+  except oboetalib.TLogError as e:
+    sys.stderr.write(logfile + ":" + str(e.lineno) + ": " + str(e) + "\n")
+    return 3
+  if due_by is not None:
+    scheduler.WriteDue(output, due_ticks, count)
+    return 0
+  with stats.Phase("parse", "deck lines") as phase:
+    scheduler.ReadDeck(deckfile)
+  if stats.enabled:
+    lines = scheduler.lines
+    phase.items = sum(1 for line in lines.DeckLines())
+    stats.Count("deck lines", phase.items)
+    stats.Count("log lines", scheduler.lineno)
+    stats.Count("unmatched IDs", len(lines) - phase.items)
 
   # Early out: If we only need to show the lines and their bucket numbers, then
   # do so now and exit.
   if show_buckets:
-    for line in lines.values():
-      output.write(field_sep.join(itertools.chain((str(line.bucket.id if line.bucket is not None else "-1"),), line.fields)) + "\n")
-    return 0
-
-  # Randomly select due lines that have already been reviewed (i.e., lines with
-  # records in the log file) and new lines (lines lacking such records).
-  # Combine the results and write them to output.
-  due_selector, new_selector = TRandomSelector(num), TRandomSelector(new)
-  for line in (line for line in lines.values() if line.date <= now and line.fields is not None):
-    (due_selector if line.bucket else new_selector).Add(line)
-  for line in itertools.chain(due_selector, new_selector):
-    output.write(field_sep.join(line.fields) + "\n")
+    with stats.Phase("write", "lines"):
+      scheduler.WriteAll(output)
+  else:
+    scheduler.WriteSelection(output, num, new, seed, priority, stats)
   return 0
 
 if __name__ == "__main__":
@@ -238,17 +449,34 @@ output:
     Same as the first example, but skip line selection and dump all lines from
     flashcards.txt to stdout with their bucket numbers prefixed to them.
     (-1 indicates that the line has no records in the log file.)
+
+  $ oleitner -k flashcards.ckpt flashcards.txt flashcards.log 1 3 7 14
+
+    Same as the first example, but save the scheduler's state in
+    flashcards.ckpt so that later runs only replay the records appended to
+    flashcards.log since the last run.
 """)
   parser.add_argument("-n", "--num-lines", type=int, default=10, dest="num", help="the maximum number of lines with log records to select (default: 10)")
   parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of lines without log records to select (default: 4)")
   parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
   parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log file (uses date/strftime flags, default: %%Y年%%m月%%d日)")
+  parser.add_argument("-k", "--checkpoint", default=None, help="a file in which to save the scheduler's state between runs so that only newly-appended log records are replayed (the file is ignored and rewritten if the log's older records change)")
+  parser.add_argument("-j", "--jobs", type=int, default=1, help="the number of processes that replay the log in parallel (default: 1)")
   parser.add_argument("-b", "--show-buckets", default=False, action="store_true", help="just dump the lines to standard output along with their current bucket numbers (the bucket number is the first field of each line in the output, -1 for lines without log entries)")
+  parser.add_argument("-r", "--seed", type=int, default=None, help="the random number generator's seed, which makes selections reproducible (default: seed from the operating system)")
+  parser.add_argument("-p", "--priority", default="random", choices=oboetalib.selector_modes, help="how to select due lines with log records: random chooses uniformly at random, overdue chooses the most overdue lines, and weighted chooses randomly but favors overdue lines (default: random)")
+  parser.add_argument("-d", "--due-by", default=None, metavar="DATE", help="instead of selecting lines, print the IDs and due dates of the lines with log records (including those that are no longer in the deck) that are due by DATE or by now if DATE is \"now\"; requires -k: the checkpoint's rows are sorted by due date, so if the log hasn't changed since the checkpoint was written, then only the checkpoint's due rows are read (otherwise the log's new records are replayed first)")
+  parser.add_argument("-c", "--count", default=False, action="store_true", help="like -d, but print the number of due lines instead (due by now unless -d is given)")
+  parser.add_argument("-S", "--serve", default=None, metavar="SOCKET", help="run as a daemon that keeps the deck and the log in memory, watches them for changes, and answers oboetaq's requests via the specified Unix domain socket")
+  parser.add_argument("-P", "--poll", type=float, default=1.0, help="with -S, the number of seconds between checks for changes to the deck and the log (default: 1)")
   parser.add_argument("deckfile", help="a CSV-formatted file containing scheduled lines")
   parser.add_argument("logfile", help="a CSV-formatted file containing records for the deck's lines")
   parser.add_argument("bucketdelay", type=int, nargs="+", help="the number of days to add to a line's due date when it's moved to the corresponding Leitner bucket")
+  oboetalib.AddStatsOptions(parser)
 
   args = parser.parse_args()
-  ret = Main(sys.stdout, args.num, args.new, args.bucketdelay, args.logfile, args.deckfile, args.field_sep, args.date_format, args.show_buckets)
+  stats = oboetalib.TStats(args.stats)
+  ret = Main(sys.stdout, args.num, args.new, args.bucketdelay, args.logfile, args.deckfile, args.field_sep, args.date_format, args.show_buckets, args.checkpoint, args.jobs, args.due_by, args.count, args.seed, args.priority, args.serve, args.poll, stats)
+  stats.Write()
   sys.exit(ret)
 
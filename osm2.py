@@ -11,7 +11,8 @@
 # with this software. If not, see
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
-# The core SM-2 algorithm is in TLine.Respond().
+# The core SM-2 algorithm is in TLines.Respond().  RespondAll() is a vectorized
+# copy of it for NumPy arrays.  (NumPy is optional.)
 
 from argparse import *
 from csv import *
@@ -21,8 +22,470 @@ from math import *
 from os.path import *
 from random import *
 from sys import *
+import operator
+import oboetalib
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
-parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Select CSV-formatted lines from standard input and the specified log file
+# The lines' states: Each line has an interval number, an interval (in days),
+# an easiness factor, and a due date in ticks (see oboetalib.DateToTicks()).
+# Lines without log records are due at zero_ticks (the earliest datetime).  If
+# offsets is True, then the lines also have the byte offsets of their records
+# in the deck.
+class TLines(oboetalib.TCardStore):
+
+  zero_ticks = oboetalib.DateToTicks(datetime.min)
+
+  def __init__(self, offsets=False):
+    columns = dict(intervalnum=("i", 1), interval=("i", 1), ef=("d", 2.5), due=("q", self.zero_ticks))
+    if offsets:
+      columns["offset"] = ("q", -1)
+    super().__init__(**columns)
+
+  def Respond(self, line, q, ticks):
+    if q < 3:
+      self.intervalnum[line] = 1
+      self.interval[line] = 1
+      self.due[line] = ticks + oboetalib.day_ticks
+    else:
+      self.intervalnum[line] += 1
+      self.due[line] = ticks + self.interval[line] * oboetalib.day_ticks
+      self.interval[line] = (6 if self.intervalnum[line] == 2 else ceil(self.interval[line] + self.ef[line]))
+    self.ef[line] = max(self.ef[line] + 0.1 - (5 - q) * (0.08 + 0.02 * (5 - q)), 1.3)
+
+# Apply TLines.Respond() to many lines at once.  The arguments are equal-length
+# NumPy arrays containing the lines' interval numbers, intervals, easiness
+# factors, and quality of review responses.  Returns the new interval numbers,
+# intervals, and easiness factors along with the numbers of days that
+# TLines.Respond() would add to the review dates.  The floating-point operations
+# are the same as TLines.Respond()'s, so the results are identical.
+def RespondAll(intervalnum, interval, ef, q):
+  failed = (q < 3)
+  days = numpy.where(failed, 1, interval)
+  intervalnum = numpy.where(failed, 1, intervalnum + 1)
+  interval = numpy.where(failed, 1, numpy.where(intervalnum == 2, 6, numpy.ceil(interval + ef).astype(numpy.int64)))
+  penalty = 5 - q
+  ef = numpy.maximum(ef + 0.1 - penalty * (0.08 + 0.02 * penalty), 1.3)
+  return intervalnum, interval, ef, days
+
+# Replay the complete records in logfile starting at offset (whose record
+# number is lineno) with RespondAll().  The records are loaded into columns
+# (line number, review date index, and quality of review response) and sorted
+# stably by line, and then the k-th records of all lines are replayed
+# together.  parse_ticks decodes timestamps, decode_record and get_line are
+# Main()'s DecodeRecord() and GetLine(), and the results are written to lines
+# (a TLines) through NumPy views of its columns.  Returns the offset and record
+# number just past the replayed records; callers must replay whatever follows
+# them (e.g., a partially-written line) themselves.  Raises oboetalib.TLogError
+# (with lineno set) for the first malformed record.
+def ReplayWithNumPy(logfile, field_sep, offset, lineno, parse_ticks, decode_record, get_line, lines):
+  # Each distinct ID, timestamp, and response is decoded once.  -1 marks IDs
+  # that get_line() can't find and malformed timestamps and responses.
+  ids = {}
+  stamps = []
+  dates = {}
+  responses = {}
+  def AddID(myid):
+    line = get_line(myid.decode("UTF-8"))
+    ids[myid] = (-1 if line is None else line)
+  def AddDate(timestamp):
+    try:
+      stamps.append(parse_ticks(timestamp))
+      dates[timestamp] = len(stamps) - 1
+    except ValueError:
+      dates[timestamp] = -1
+  def AddResponse(response):
+    try:
+      q = int(response)
+    except ValueError:
+      q = -1
+    responses[response] = (q if 0 <= q <= 5 else -1)
+
+  # Called to find the first malformed record in a block, which raises the
+  # appropriate TLogError.
+  def CheckRecords(first_lineno, records):
+    for lineno, fields in enumerate(records, start=first_lineno):
+      try:
+        decode_record(fields)
+      except oboetalib.TLogError as e:
+        e.lineno = lineno
+        raise
+
+  line_columns = []
+  date_columns = []
+  q_columns = []
+  complete = []
+  get_ids = operator.itemgetter(0)
+  get_timestamps = operator.itemgetter(1)
+  get_responses = operator.itemgetter(2)
+  for first_lineno, records in oboetalib.ScanLog(logfile, field_sep, offset, lineno, lambda end, end_lineno: complete.append((end, end_lineno)), complete_only=True):
+    if not records:
+      continue
+    if set(map(len, records)) != {3}:
+      CheckRecords(first_lineno, records)
+    for myid in set(map(get_ids, records)).difference(ids):
+      AddID(myid)
+    for timestamp in set(map(get_timestamps, records)).difference(dates):
+      AddDate(timestamp)
+    for response in set(map(get_responses, records)).difference(responses):
+      AddResponse(response)
+    line_column = numpy.fromiter(map(ids.__getitem__, map(get_ids, records)), dtype=numpy.int64, count=len(records))
+    date_column = numpy.fromiter(map(dates.__getitem__, map(get_timestamps, records)), dtype=numpy.int64, count=len(records))
+    q_column = numpy.fromiter(map(responses.__getitem__, map(get_responses, records)), dtype=numpy.int64, count=len(records))
+    known = (line_column >= 0)
+    if not (numpy.all(date_column[known] >= 0) and numpy.all(q_column[known] >= 0)):
+      CheckRecords(first_lineno, records)
+    line_columns.append(line_column[known])
+    date_columns.append(date_column[known])
+    q_columns.append(q_column[known])
+  line_column = numpy.concatenate(line_columns or [numpy.zeros(0, dtype=numpy.int64)])
+  if len(line_column) == 0:
+    return complete[0]
+
+  # Sort the lines by their numbers of records (most first) so that the lines
+  # that have k-th records are always a prefix of the lines.
+  date_column = numpy.concatenate(date_columns)
+  q_column = numpy.concatenate(q_columns)
+  order = numpy.argsort(line_column, kind="stable")
+  counts = numpy.bincount(line_column, minlength=len(lines))
+  starts = numpy.cumsum(counts) - counts
+  by_count = numpy.argsort(-counts, kind="stable")
+  sorted_counts = counts[by_count]
+  starts = starts[by_count]
+  by_count = by_count[sorted_counts > 0]
+
+  # The views must be released before lines grows because arrays can't be
+  # resized while they're exported.
+  views = [numpy.frombuffer(column, dtype=column.typecode) for column in (lines.intervalnum, lines.interval, lines.ef, lines.due)]
+  intervalnum_view, interval_view, ef_view, due_view = views
+  intervalnum = intervalnum_view[by_count].astype(numpy.int64)
+  interval = interval_view[by_count].astype(numpy.int64)
+  ef = ef_view[by_count]
+  days = numpy.zeros(len(by_count), dtype=numpy.int64)
+  last = numpy.zeros(len(by_count), dtype=numpy.int64)
+  for k in range(int(sorted_counts[0])):
+    n = int(numpy.count_nonzero(sorted_counts > k))
+    records = order[starts[:n] + k]
+    intervalnum[:n], interval[:n], ef[:n], days[:n] = RespondAll(intervalnum[:n], interval[:n], ef[:n], q_column[records])
+    last[:n] = records
+  intervalnum_view[by_count] = intervalnum
+  interval_view[by_count] = interval
+  ef_view[by_count] = ef
+  due_view[by_count] = numpy.array(stamps, dtype=numpy.int64)[date_column[last]] + days * oboetalib.day_ticks
+  del views, intervalnum_view, interval_view, ef_view, due_view
+  return complete[0]
+
+# The scheduler: the deck's lines and their progress through the log.  Main()
+# loads a deck and a log into a TScheduler once, but daemons (see
+# oboetalib.Serve()) keep one around and feed it changes to the deck and the
+# log.  If keep_all is True, then lines are kept for every ID in the log
+# rather than just the deck's IDs.  (Checkpoints must describe every ID in the
+# log, not just those in the deck, because later decks might contain more
+# lines, and daemons' decks change.)
+class TScheduler(object):
+
+  def __init__(self, logfile, field_sep, date_format, checkpoint=None, jobs=1, engine="auto", low_memory=False, keep_all=False):
+    self.logfile = logfile
+    self.field_sep = field_sep
+    self.date_codec = oboetalib.TDateFormat(date_format)
+    self.params = ("sm2", date_format)
+    self.checkpoint = checkpoint
+    self.jobs = jobs
+    self.engine = engine
+    self.low_memory = low_memory
+    self.keep_all = (keep_all or checkpoint is not None)
+    self.unmatched = None
+    self.lines = TLines(low_memory)
+    self.offset = 0
+    self.lineno = 0
+    self.replayed = False
+    self.deck_bytes = None
+    self.encoding = None
+    self.close_deck = False
+    super().__init__()
+
+  def Close(self):
+    if self.close_deck:
+      self.deck_bytes.close()
+    self.deck_bytes = None
+    self.close_deck = False
+
+  # Process the lines from the deck, replacing the lines from the previous
+  # deck (if any).  (If multiple lines have the same ID, then the last line's
+  # fields win.)  In low-memory mode, only the lines' byte offsets are kept,
+  # and the fields of the lines that are printed are read again afterwards.
+  # The deck's lines are renumbered if necessary so that they come first in
+  # the deck's order.
+  def ReadDeck(self, deckfile):
+    self.Close()
+    lines = self.lines
+    for line in list(lines.DeckLines()):
+      lines.fields[line] = None
+    order = []
+    if self.low_memory:
+      deck = oboetalib.LoadDeck(deckfile, self.field_sep, with_fields=False)
+      self.deck_bytes, self.encoding, self.close_deck = oboetalib.OpenDeckBytes(deckfile)
+      if deck is None:
+        records = ((fields[0], offset) for offset, fields in oboetalib.ReadDeckRecords(self.deck_bytes, self.encoding, self.field_sep) if len(fields) != 0)
+      else:
+        records = zip(deck[0], deck[1])
+      for myid, offset in records:
+        line = lines.Get(myid)
+        if lines.fields[line] is None:
+          order.append(line)
+        lines.fields[line] = ()
+        lines.offset[line] = offset
+    else:
+      for fields in oboetalib.ReadDeck(deckfile, self.field_sep):
+        line = lines.Get(fields[0])
+        if lines.fields[line] is None:
+          order.append(line)
+        lines.fields[line] = fields
+    if any(line != new_line for new_line, line in enumerate(order)):
+      lines.Reorder(order + [line for line in range(len(lines)) if lines.fields[line] is None])
+
+  # GetLine() returns the number of the line with the specified ID.  If the ID
+  # isn't in the deck and keep_all is True, then the line is added without
+  # fields.  Otherwise GetLine() returns None (and adds the ID to unmatched if
+  # it's a set).
+  def GetLine(self, myid):
+    line = self.lines.index.get(myid, None)
+    if line is None:
+      if self.keep_all:
+        line = self.lines.Add(myid)
+      elif self.unmatched is not None:
+        self.unmatched.add(myid)
+    return line
+
+  # SetLine() restores a line's state from a checkpoint or a parallel replay.
+  def SetLine(self, myid, intervalnum, interval, ef, ticks):
+    line = self.GetLine(myid)
+    if line is not None:
+      self.lines.intervalnum[line] = intervalnum
+      self.lines.interval[line] = interval
+      self.lines.ef[line] = ef
+      self.lines.due[line] = ticks
+
+  def CheckpointRows(self):
+    lines = self.lines
+    return ((lines.ids[line], str(lines.intervalnum[line]), str(lines.interval[line]), repr(lines.ef[line]), str(lines.due[line])) for line in range(len(lines)) if lines.due[line] != TLines.zero_ticks)
+
+  # Decode a log record into a tuple containing its ID, date (in ticks), and
+  # quality of review response.  Records for lines that GetLine() can't find
+  # are skipped without being checked.
+  def DecodeRecord(self, fields):
+    if len(fields) != 3:
+      raise oboetalib.TLogError("invalid number of fields: " + str(len(fields)))
+    myid, timestamp, response = fields
+    myid = myid.decode("UTF-8")
+    if self.GetLine(myid) is None:
+      return None
+    try:
+      ticks = self.date_codec.ParseTicks(timestamp)
+    except ValueError as e:
+      raise oboetalib.TLogError("invalid date format: " + str(e))
+    try:
+      q = int(response)
+    except ValueError:
+      raise oboetalib.TLogError("invalid quality response: " + response.decode("UTF-8"))
+    if q < 0 or q > 5:
+      raise oboetalib.TLogError("invalid quality response: " + response.decode("UTF-8"))
+    return myid, q, ticks
+
+  # Replay one line's records (a worker does this during parallel replays).
+  def ReplayLine(self, myid, records):
+    line = self.GetLine(myid)
+    for q, ticks in records:
+      self.lines.Respond(line, q, ticks)
+    return self.lines.intervalnum[line], self.lines.interval[line], self.lines.ef[line], self.lines.due[line]
+
+  # Replay the log records that haven't been replayed yet.  The first replay
+  # restores the lines saved in the checkpoint (if any) so that only log
+  # records appended since the checkpoint was written need to be replayed, and
+  # if there are multiple jobs, then most of the log is replayed in parallel.
+  # Otherwise it's replayed by ReplayWithNumPy() if NumPy is available and the
+  # engine allows it.  If complete_only is True, then a trailing,
+  # partially-written line isn't replayed.  Raises oboetalib.TLogError (with
+  # lineno set) for malformed records.
+  def Replay(self, complete_only=False):
+    offset, lineno = self.offset, self.lineno
+    if not self.replayed:
+      self.replayed = True
+      if self.checkpoint is not None:
+        offset, lineno, rows = oboetalib.LoadCheckpoint(self.checkpoint, self.logfile, self.field_sep, self.params)
+        for myid, intervalnum, interval, ef, ticks in rows:
+          self.SetLine(myid, int(intervalnum), int(interval), float(ef), int(ticks))
+        self.offset = offset
+      if self.jobs > 1:
+        offset, lineno, order, states = oboetalib.ReplayLogInParallel(self.logfile, self.field_sep, offset, lineno, self.jobs, self.DecodeRecord, self.ReplayLine)
+        for myid in order:
+          self.SetLine(myid, *states[myid])
+      elif self.engine == "numpy" or (self.engine == "auto" and numpy is not None):
+        offset, lineno = ReplayWithNumPy(self.logfile, self.field_sep, offset, lineno, self.date_codec.ParseTicks, self.DecodeRecord, self.GetLine, self.lines)
+
+    # Save a checkpoint after the last complete record if anything new was
+    # replayed.
+    checkpoint_offset = self.offset
+    def OnComplete(end, end_lineno):
+      if self.checkpoint is not None and end != checkpoint_offset:
+        oboetalib.SaveCheckpoint(self.checkpoint, self.logfile, self.field_sep, self.params, end, end_lineno, self.CheckpointRows())
+      self.offset, self.lineno = end, end_lineno
+    for first_lineno, records in oboetalib.ScanLog(self.logfile, self.field_sep, offset, lineno, OnComplete, complete_only):
+      for lineno, fields in enumerate(records, start=first_lineno):
+        try:
+          record = self.DecodeRecord(fields)
+        except oboetalib.TLogError as e:
+          e.lineno = lineno
+          raise
+        if record is not None:
+          myid, q, ticks = record
+          self.lines.Respond(self.lines.index[myid], q, ticks)
+
+  def Row(self, line):
+    lines = self.lines
+    fields = lines.fields[line]
+    if self.low_memory:
+      fields = oboetalib.ReadDeckRecordAt(self.deck_bytes, self.encoding, self.field_sep, lines.offset[line])
+    return tuple(chain(fields, (lines.intervalnum[line], lines.interval[line], lines.ef[line], self.date_codec.FormatTicks(lines.due[line]))))
+
+  # Write all of the deck's lines to output.
+  def WriteAll(self, output):
+    csvout = writer(output, delimiter=self.field_sep)
+    for line in self.lines.DeckLines():
+      csvout.writerow(self.Row(line))
+
+  # Write the deck's lines with the specified IDs to output.
+  def WriteLines(self, output, ids):
+    csvout = writer(output, delimiter=self.field_sep)
+    for myid in ids:
+      line = self.lines.index.get(myid, None)
+      if line is not None and self.lines.fields[line] is not None:
+        csvout.writerow(self.Row(line))
+
+  # Write up to num old lines and new new lines that are due to output.  Old
+  # lines are selected according to priority (see oboetalib.selector_modes).
+  # New lines are selected randomly.  The selection and the output are timed
+  # as separate phases of stats (an oboetalib.TStats).
+  def WriteSelection(self, output, num, new, seed=None, priority="random", stats=None):
+    stats = (oboetalib.TStats() if stats is None else stats)
+    lines = self.lines
+    now = oboetalib.DateToTicks(datetime.now())
+    rng = Random(seed)
+    new_chooser = oboetalib.TRandomSelector(new, rng)
+    old_chooser = oboetalib.NewSelector(priority, num, rng)
+    with stats.Phase("select", "deck lines") as select_phase:
+      for line in lines.DeckLines():
+        due = lines.due[line]
+        if due == TLines.zero_ticks:
+          new_chooser.Add(line)
+        elif due <= now:
+          old_chooser.Add(line, now - due)
+      selection = list(chain(new_chooser, old_chooser))
+    with stats.Phase("write", "lines") as phase:
+      csvout = writer(output, delimiter=self.field_sep)
+      for line in selection:
+        csvout.writerow(self.Row(line))
+      phase.items = len(selection)
+    if stats.enabled:
+      dues = [lines.due[line] for line in lines.DeckLines()]
+      select_phase.items = len(dues)
+      stats.Count("due", sum(1 for due in dues if due != TLines.zero_ticks and due <= now))
+      stats.Count("new", sum(1 for due in dues if due == TLines.zero_ticks))
+      stats.Count("selected", len(selection))
+
+  # Write the IDs and due dates of the lines that are due by the specified
+  # ticks (or their number if count is True) to output.
+  def WriteDue(self, output, due_ticks, count):
+    oboetalib.WriteDueRows(output, oboetalib.SelectDueRows(self.CheckpointRows(), due_ticks), count, self.date_codec, self.field_sep)
+
+def Main(output, num, new, logfile, deckfile, field_sep, date_format, show_all, checkpoint=None, jobs=1, engine="auto", low_memory=False, due_by=None, count=False, seed=None, priority="random", serve=None, poll=1.0, stats=None):
+  stats = (oboetalib.TStats() if stats is None else stats)
+
+  # Check arguments for illegal values.
+  ret = 0
+  if num < 0:
+    stderr.write("negative number of old lines\n")
+    ret = 1
+  if new < 0:
+    stderr.write("negative number of new lines\n")
+    ret = 1
+  if jobs < 1:
+    stderr.write("nonpositive number of jobs\n")
+    ret = 1
+  if engine == "numpy" and numpy is None:
+    stderr.write("the numpy engine requires NumPy\n")
+    ret = 1
+  if not exists(logfile):
+    stderr.write(logfile + " does not exist.\n")
+    ret = 1
+  if (due_by is not None or count) and checkpoint is None:
+    stderr.write("-d and -c require a checkpoint (-k)\n")
+    ret = 1
+  if serve is not None and not isinstance(deckfile, str):
+    stderr.write("-S requires a deck file (-i)\n")
+    ret = 1
+  if ret != 0:
+    return ret
+
+  # Daemons keep lines for all of the IDs in the log because their decks might
+  # change.
+  if serve is not None:
+    return oboetalib.Serve(serve, lambda: TScheduler(logfile, field_sep, date_format, checkpoint, jobs, engine, low_memory, keep_all=True), deckfile, logfile, poll)
+
+  # Answer due-date queries from the checkpoint if it's up to date.  Otherwise
+  # the log is replayed as usual (which updates the checkpoint) and the query
+  # is answered afterwards.  Due-date queries don't need the deck.
+  scheduler = TScheduler(logfile, field_sep, date_format, checkpoint, jobs, engine, low_memory)
+  if count and due_by is None:
+    due_by = "now"
+  if due_by is not None:
+    try:
+      due_ticks = (oboetalib.DateToTicks(datetime.now()) if due_by == "now" else scheduler.date_codec.ParseTicks(due_by))
+    except ValueError as e:
+      stderr.write("invalid due date: " + str(e) + "\n")
+      return 1
+    rows = oboetalib.DueRows(checkpoint, logfile, field_sep, scheduler.params, due_ticks)
+    if rows is not None:
+      oboetalib.WriteDueRows(output, rows, count, scheduler.date_codec, field_sep)
+      return 0
+  # Unmatched IDs aren't counted during parallel replays.
+  if stats.enabled and jobs == 1:
+    scheduler.unmatched = set()
+  try:
+    deck_lines = 0
+    if due_by is None:
+      with stats.Phase("parse", "deck lines") as phase:
+        scheduler.ReadDeck(deckfile)
+      if stats.enabled:
+        deck_lines = phase.items = sum(1 for line in scheduler.lines.DeckLines())
+        stats.Count("deck lines", deck_lines)
+    try:
+      with stats.Phase("replay", "log records", hot=True) as phase:
+        lineno = scheduler.lineno
+        scheduler.Replay()
+        phase.items = scheduler.lineno - lineno
+    except oboetalib.TLogError as e:
+      stderr.write(logfile + ":" + str(e.lineno) + ": " + str(e) + "\n")
+      return 3
+    if stats.enabled:
+      stats.Count("log lines", scheduler.lineno)
+      if scheduler.unmatched is not None:
+        stats.Count("unmatched IDs", len(scheduler.lines) - deck_lines + len(scheduler.unmatched))
+    if due_by is not None:
+      scheduler.WriteDue(output, due_ticks, count)
+    elif show_all:
+      with stats.Phase("write", "lines"):
+        scheduler.WriteAll(output)
+    else:
+      scheduler.WriteSelection(output, num, new, seed, priority, stats)
+    return 0
+  finally:
+    scheduler.Close()
+
+if __name__ == "__main__":
+  parser = ArgumentParser(formatter_class=RawDescriptionHelpFormatter, description="""  Select CSV-formatted lines from standard input and the specified log file
   according to the SuperMemo 2 (SM-2) algorithm.
 
   This program is useful for scheduling reviews of flashcards stored within
@@ -68,116 +531,27 @@ output:
     4. the line's due date.
 
   All but (4) are described in the SM-2 link mentioned above.""")
-parser.add_argument("-n", "--num-lines", type=int, default=10, dest="num", help="the maximum number of lines with log records to select (default: 30)")
-parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of lines without log records to select (default: 10)")
-parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
-parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log file and output (uses date/strftime flags, default: %%Y年%%m月%%d日)")
-parser.add_argument("-a", "--show-all", default=False, action="store_true", help="dump all lines to standard output regardless of whether they're due")
-parser.add_argument("logfile", help="a CSV-formatted file containing records for the deck's lines")
-
-args = parser.parse_args()
+  parser.add_argument("-n", "--num-lines", type=int, default=10, dest="num", help="the maximum number of lines with log records to select (default: 30)")
+  parser.add_argument("-e", "--num-new-lines", type=int, default=4, dest="new", help="the maximum number of lines without log records to select (default: 10)")
+  parser.add_argument("-s", "--field-sep", default="\t", help="the CSV field separator (default: \\t)")
+  parser.add_argument("-f", "--date-format", default="%Y年%m月%d日", help="the format of dates/timestamps in the log file and output (uses date/strftime flags, default: %%Y年%%m月%%d日)")
+  parser.add_argument("-a", "--show-all", default=False, action="store_true", help="dump all lines to standard output regardless of whether they're due")
+  parser.add_argument("-j", "--jobs", type=int, default=1, help="the number of processes that replay the log in parallel (default: 1)")
+  parser.add_argument("-g", "--engine", default="auto", choices=("auto", "numpy", "scalar"), help="how to replay the log when -j is 1: numpy replays all lines' reviews together with NumPy arrays, scalar replays them one at a time, and auto uses numpy if NumPy is installed (default: auto)")
+  parser.add_argument("-l", "--low-memory", default=False, action="store_true", help="keep only the lines' IDs and byte offsets in memory and reread the lines that are printed (standard input is copied to a temporary file if it isn't seekable)")
+  parser.add_argument("-k", "--checkpoint", default=None, help="a file in which to save the scheduler's state between runs so that only newly-appended log records are replayed (the file is ignored and rewritten if the log's older records change)")
+  parser.add_argument("-r", "--seed", type=int, default=None, help="the random number generator's seed, which makes selections reproducible (default: seed from the operating system)")
+  parser.add_argument("-p", "--priority", default="random", choices=oboetalib.selector_modes, help="how to select old lines: random chooses uniformly at random, overdue chooses the most overdue lines, and weighted chooses randomly but favors overdue lines (default: random)")
+  parser.add_argument("-d", "--due-by", default=None, metavar="DATE", help="instead of selecting lines, print the IDs and due dates of the reviewed lines (including those that are no longer in the deck) that are due by DATE or by now if DATE is \"now\"; requires -k: the checkpoint's rows are sorted by due date, so if the log hasn't changed since the checkpoint was written, then only the checkpoint's due rows are read (otherwise the log's new records are replayed first)")
+  parser.add_argument("-c", "--count", default=False, action="store_true", help="like -d, but print the number of due lines instead (due by now unless -d is given)")
+  parser.add_argument("-i", "--deck", default=None, help="read the deck from the specified file instead of from standard input")
+  parser.add_argument("-S", "--serve", default=None, metavar="SOCKET", help="run as a daemon that keeps the deck (which must be given via -i) and the log in memory, watches them for changes, and answers oboetaq's requests via the specified Unix domain socket")
+  parser.add_argument("-P", "--poll", type=float, default=1.0, help="with -S, the number of seconds between checks for changes to the deck and the log (default: 1)")
+  parser.add_argument("logfile", help="a CSV-formatted file containing records for the deck's lines")
+  oboetalib.AddStatsOptions(parser)
 
-class TLine(object):
-
-  __slots__ = ("fields", "duedate", "interval", "intervalnum", "ef")
-
-  def __init__(self, fields, dateandtime):
-    self.fields = fields
-    self.duedate = dateandtime
-    self.interval = 1
-    self.intervalnum = 1
-    self.ef = 2.5
-    super().__init__()
-
-  def Respond(self, q, now):
-    if q < 3:
-      self.intervalnum = 1
-      self.interval = 1
-      self.duedate = now + timedelta(days=self.interval)
-    else:
-      self.intervalnum += 1
-      self.duedate = now + timedelta(days=self.interval)
-      self.interval = (6 if self.intervalnum == 2 else ceil(self.interval + self.ef))
-    self.ef = max(self.ef + 0.1 - (5 - q) * (0.08 + 0.02 * (5 - q)), 1.3)
-
-# Check arguments for illegal values.
-ret = 0
-if args.num < 0:
-  sys.stderr.write("negative number of old lines\n")
-  ret = 1
-if args.new < 0:
-  sys.stderr.write("negative number of new lines\n")
-  ret = 1
-if not exists(args.logfile):
-  stderr.write(args.logfile + " does not exist.\n")
-  ret = 1
-if ret != 0:
+  args = parser.parse_args()
+  stats = oboetalib.TStats(args.stats)
+  ret = Main(stdout, args.num, args.new, args.logfile, (stdin if args.deck is None else args.deck), args.field_sep, args.date_format, args.show_all, args.checkpoint, args.jobs, args.engine, args.low_memory, args.due_by, args.count, args.seed, args.priority, args.serve, args.poll, stats)
+  stats.Write()
   exit(ret)
-
-# Process the lines from stdin.
-zerodate = datetime.min
-now = datetime.now()
-lines = {}
-for lineno, fields in enumerate(reader(stdin, delimiter=args.field_sep)):
-  if len(fields) != 0:
-    lines[fields[0]] = TLine(fields, zerodate)
-
-# Process the log file.
-with open(args.logfile, 'r') as logf:
-  for lineno, fields in enumerate(reader(logf, delimiter=args.field_sep)):
-    if len(fields) != 3:
-      stderr.write(args.logfile + ":" + str(lineno) + ": invalid number of fields: " + str(len(fields)) + "\n")
-      exit(3)
-    entry = lines.get(fields[0], None)
-    if entry is not None:
-      try:
-        logdate = datetime.strptime(fields[1], args.date_format)
-      except ValueError as e:
-        stderr.write(args.logfile + ":" + str(lineno) + ": invalid date format: " + str(e) + "\n")
-        exit(3)
-      try:
-        q = int(fields[2])
-      except ValueError:
-        stderr.write(args.logfile + ":" + str(lineno) + ": invalid quality response: " + fields[2] + "\n")
-        exit(3)
-      if q < 0 or q > 5:
-        stderr.write(args.logfile + ":" + str(lineno) + ": invalid quality response: " + fields[2] + "\n")
-        exit(3)
-      entry.Respond(q, logdate)
-
-csvout = writer(stdout, delimiter=args.field_sep)
-if args.show_all:
-  for line in lines.values():
-    csvout.writerow(tuple(chain(line.fields, (line.intervalnum, line.interval, line.ef, line.duedate.strftime(args.date_format)))))
-  exit(0)
-
-class TRandomSelector(object):
-
-  def __init__(self, capacity):
-    self.capacity = int(capacity)
-    self.sample = []
-    self.counter = 0
-    if not self.capacity:
-      self.Add = (lambda me: None)
-
-  def __iter__(self):
-    for selected in self.sample:
-      yield selected
-
-  def Add(self, o):
-    self.counter += 1
-    if self.counter <= self.capacity:
-      self.sample.append(o)
-    else:
-      tag = randint(0, self.counter)
-      if tag < self.capacity:
-        self.sample[tag] = o
-
-new_chooser = TRandomSelector(args.new)
-old_chooser = TRandomSelector(args.num)
-for line in lines.values():
-  if line.duedate <= now:
-    (new_chooser if line.duedate is zerodate else old_chooser).Add(line)
-for line in chain(new_chooser, old_chooser):
-  csvout.writerow(tuple(chain(line.fields, (line.intervalnum, line.interval, line.ef, line.duedate.strftime(args.date_format)))))
-